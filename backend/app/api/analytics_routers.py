@@ -46,6 +46,10 @@ def platforms(
 def top_posts(limit: int = 10, db: Session = Depends(get_db)):
     return AnalyticsService.top_posts(db, limit=limit)
 
+@router.get("/hashtags", dependencies=[Depends(require_roles(["admin","staff"]))])
+def hashtags(limit: int = 20, prefix: Optional[str] = None, db: Session = Depends(get_db)):
+    return AnalyticsService.hashtags(db, limit=min(max(limit, 1), 200), prefix=prefix)
+
 @router.get("/export", dependencies=[Depends(require_roles(["admin","staff"]))])
 def export_csv(db: Session = Depends(get_db)):
     buf = io.StringIO()
@@ -1,12 +1,14 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
 from app.schemas.channel_schemas import ChannelCreateIn, ChannelUpdateIn, ChannelOut, ChannelTokenIn
 from app.repositories import channel_repo
 from app.api.deps import require_roles
-from app.schemas.common import ChannelPlatformEnum
+from app.schemas.common import ChannelPlatformEnum, CursorPage
+from app.core.pagination import estimate_count
+from app.models.channel_models import Channel
 
 role_dep = lambda: Depends(require_roles(["admin","staff"]))
 
@@ -16,6 +18,21 @@ router = APIRouter(prefix="/channels", tags=["channels"])
 def list_channels(platform: Optional[ChannelPlatformEnum] = None, q: Optional[str] = None, db: Session = Depends(get_db), _=role_dep()):
     return channel_repo.list(db, platform=platform, q=q)
 
+@router.get("/page", response_model=CursorPage[ChannelOut])
+def list_channels_page(
+    platform: Optional[ChannelPlatformEnum] = None,
+    q: Optional[str] = None,
+    only_active: bool = True,
+    limit: int = Query(100, ge=1, le=200),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+    db: Session = Depends(get_db),
+    _=role_dep(),
+):
+    items, next_cursor = channel_repo.list_page(db, platform=platform, q=q, only_active=only_active, limit=limit, cursor=cursor)
+    total = estimate_count(db, Channel.__tablename__) if with_total and not (platform or q) else None
+    return {"items": items, "next_cursor": next_cursor, "total_estimate": total}
+
 @router.post("/", response_model=ChannelOut)
 def create_channel(body: ChannelCreateIn, db: Session = Depends(get_db), _=role_dep()):
     exist = channel_repo.get_by_platform_external(db, body.platform, body.external_id)
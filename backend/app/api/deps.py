@@ -18,6 +18,7 @@ from app.services.youtube_service import YouTubeService
 from app.services.media_service import MediaService
 from app.services.schedule_service import ScheduleService
 from app.services.template_service import TemplateService
+from app.services.search_service import SearchService
 
 
 
@@ -62,6 +63,9 @@ def get_schedule_service() -> ScheduleService:
 def get_template_service() -> TemplateService:
     return TemplateService()
 
+def get_search_service() -> SearchService:
+    return SearchService()
+
 
 
 def get_bearer_token(authorization: str = Header(None)) -> str:
@@ -79,6 +83,13 @@ def get_current_user_id(token: str = Depends(get_bearer_token)) -> int:
         raise HTTPException(401, "Invalid token")
     return int(sub)
 
+def get_current_roles(token: str = Depends(get_bearer_token)) -> List[str]:
+    try:
+        data = jwt.decode(token, _settings.JWT_SECRET, algorithms=[_settings.JWT_ALG])
+    except Exception:
+        raise HTTPException(401, "Invalid token")
+    return data.get("roles") or []
+
 def require_roles(required: List[str]):
     def _inner(token: str = Depends(get_bearer_token)):
         try:
@@ -0,0 +1,37 @@
+# Hashtag: autocomplete + danh sách post theo tag (đọc từ bảng hashtags/post_hashtags)
+
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.api.deps import require_roles
+from app.schemas.common import CursorPage
+from app.schemas.post_schemas import PostOut
+from app.schemas.hashtag_schemas import HashtagSuggestion
+from app.services.hashtag_service import HashtagService
+
+router = APIRouter(prefix="/hashtags", tags=["hashtags"])
+
+def get_service() -> HashtagService:
+    return HashtagService()
+
+@router.get("/autocomplete", response_model=List[HashtagSuggestion], dependencies=[Depends(require_roles(["admin", "staff"]))])
+def autocomplete(
+    q: str,
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    svc: HashtagService = Depends(get_service),
+):
+    return svc.autocomplete(db, q, limit=limit)
+
+@router.get("/{tag}/posts", response_model=CursorPage[PostOut], dependencies=[Depends(require_roles(["admin", "staff"]))])
+def posts_by_tag(
+    tag: str,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    svc: HashtagService = Depends(get_service),
+):
+    return svc.posts_page(db, tag, limit=limit, cursor=cursor)
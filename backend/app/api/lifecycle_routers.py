@@ -0,0 +1,29 @@
+# Vòng đời file trên storage: báo cáo dung lượng thu hồi được, chạy GC, tra ai đang dùng 1 file
+
+
+from typing import Any, Dict, List
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+from app.api.deps import require_roles
+from app.services.lifecycle_service import LifecycleService
+
+router = APIRouter(prefix="/storage-lifecycle", tags=["storage"])
+
+def get_service() -> LifecycleService:
+    return LifecycleService()
+
+@router.get("/report", dependencies=[Depends(require_roles(["admin"]))])
+async def lifecycle_report(svc: LifecycleService = Depends(get_service)) -> Dict[str, Any]:
+    """Quét như GC nhưng không xoá: tổng / đang dùng / thu hồi được (byte)."""
+    return await svc.report()
+
+@router.post("/gc", dependencies=[Depends(require_roles(["admin"]))])
+async def run_gc(svc: LifecycleService = Depends(get_service)) -> Dict[str, Any]:
+    return await svc.run()
+
+@router.get("/references", dependencies=[Depends(require_roles(["admin"]))])
+def key_references(key: str, db: Session = Depends(get_db),
+                   svc: LifecycleService = Depends(get_service)) -> Dict[str, List[str]]:
+    return {"key": key, "owners": svc.owners(db, key)}
@@ -1,12 +1,15 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, status, UploadFile, File
+from fastapi import APIRouter, Depends, status, UploadFile, File, Query, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 
 
 from app.api.deps import get_media_service, require_roles
 from app.services.media_service import MediaService
-from app.schemas.media_schemas import MediaAssetOut, MediaUpdateIn
+from app.schemas.media_schemas import MediaAssetOut, MediaUpdateIn, MediaFromHashIn
+from app.schemas.common import CursorPage
+from app.core import media_delivery
+from app.services.derivative_service import DerivativeService
 
 router = APIRouter(prefix="/media", tags=["media"])
 
@@ -19,11 +22,23 @@ async def upload_media(files: List[UploadFile] = File(...), db: Session = Depend
         results.append(result)
     return results
 
+@router.post("/from-hash", response_model=MediaAssetOut, status_code=status.HTTP_201_CREATED,
+            dependencies=[Depends(require_roles(["admin","staff"]))])
+async def create_media_from_hash(body: MediaFromHashIn, db: Session = Depends(get_db), svc: MediaService = Depends(get_media_service)):
+    """Nội dung đã có trên server (cùng sha256) -> tạo asset ngay; 404 thì client upload bình thường."""
+    return await svc.create_from_hash(db=db, sha256=body.sha256, filename=body.filename, mime_type=body.mime_type)
+
 @router.get("/", response_model=List[MediaAssetOut], dependencies=[Depends(require_roles(["admin","staff"]))])
 async def list_media(type_filter: Optional[str] = None, time_filter: Optional[str] = None, q: Optional[str] = None,
                     db: Session = Depends(get_db), svc: MediaService = Depends(get_media_service)):
     return await svc.list(db=db, type_filter=type_filter, time_filter=time_filter, q=q)
 
+@router.get("/page", response_model=CursorPage[MediaAssetOut], dependencies=[Depends(require_roles(["admin","staff"]))])
+async def list_media_page(type_filter: Optional[str] = None, q: Optional[str] = None, mime: Optional[str] = None,
+                          limit: int = Query(60, ge=1, le=200), cursor: Optional[str] = None, with_total: bool = False,
+                          db: Session = Depends(get_db), svc: MediaService = Depends(get_media_service)):
+    return await svc.list_page(db=db, type_filter=type_filter, q=q, mime=mime, limit=limit, cursor=cursor, with_total=with_total)
+
 @router.get("/stats", dependencies=[Depends(require_roles(["admin","staff"]))])
 async def media_stats(db: Session = Depends(get_db), svc: MediaService = Depends(get_media_service)):
     return await svc.stats(db)
@@ -32,6 +47,15 @@ async def media_stats(db: Session = Depends(get_db), svc: MediaService = Depends
 async def get_media(asset_id: int, db: Session = Depends(get_db), svc: MediaService = Depends(get_media_service)):
     return await svc.get(db=db, asset_id=asset_id)
 
+# public giống /storage: thẻ <img> không gửi được Authorization header -> dùng MediaAssetOut.thumb_url
+# (version + chữ ký): đúng version -> immutable; không có chữ ký hợp lệ thì chỉ phục vụ bản đã có trong cache
+@router.get("/{asset_id}/thumb", include_in_schema=False)
+async def media_thumbnail(asset_id: int, request: Request, w: int = Query(320, ge=16, le=4096), fmt: str = "jpg",
+                          v: Optional[str] = None, sig: Optional[str] = None,
+                          db: Session = Depends(get_db), svc: MediaService = Depends(get_media_service)):
+    path, current = await svc.thumbnail(db=db, asset_id=asset_id, width=w, fmt=fmt, version=v, sig=sig)
+    return media_delivery.deliver_file(request, str(path), key=DerivativeService().cache_key(path), immutable=current)
+
 @router.put("/{asset_id}", response_model=MediaAssetOut, dependencies=[Depends(require_roles(["admin","staff"]))])
 async def update_media(asset_id: int, body: MediaUpdateIn, db: Session = Depends(get_db), svc: MediaService = Depends(get_media_service)):
     return await svc.update(db=db, asset_id=asset_id, payload=body)
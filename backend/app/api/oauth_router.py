@@ -1,12 +1,15 @@
 from typing import Optional, Dict
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import RedirectResponse, HTMLResponse
-import httpx, os, secrets, base64, hashlib, time, urllib.parse as url
+import httpx, os, secrets, base64, hashlib, urllib.parse as url
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 
 from app.core.database import get_db
+from app.core import oauth_state
+from app.services.facebook_service import FacebookService
 from app.repositories import channel_repo
+from app.services.token_refresh_service import TokenRefreshService, TokenRefreshError
 from dotenv import load_dotenv, find_dotenv
 
 router = APIRouter(prefix="/oauth", tags=["oauth"])
@@ -47,9 +50,6 @@ OAUTH_CFG: Dict[str, Dict] = {
     },
 }
 
-STATE_MEM: Dict[str, Dict] = {}
-STATE_TTL = 600  # giây
-
 # HELPERS
 
 def _pkce_pair():
@@ -73,12 +73,6 @@ def _validate_cfg_or_400(provider: str, cfg: Dict):
                 detail="YOUTUBE_REDIRECT_URI phải là http://localhost... (dev) hoặc HTTPS domain (prod)."
             )
 
-def _clean_expired_states():
-    now = time.time()
-    for k in list(STATE_MEM.keys()):
-        if now - STATE_MEM[k].get("ts", 0) > STATE_TTL:
-            STATE_MEM.pop(k, None)
-
 
 @router.get("/{provider}/start")
 async def oauth_start(provider: str):
@@ -87,7 +81,6 @@ async def oauth_start(provider: str):
         raise HTTPException(404, "Provider not supported")
     _validate_cfg_or_400(provider, cfg)
 
-    _clean_expired_states()
     state = secrets.token_urlsafe(24)
 
     params = {
@@ -108,11 +101,11 @@ async def oauth_start(provider: str):
 
     if cfg["use_pkce"]:
         verifier, challenge = _pkce_pair()
-        STATE_MEM[state] = {"verifier": verifier, "provider": provider, "ts": time.time()}
+        await oauth_state.save(state, {"verifier": verifier, "provider": provider})
         params["code_challenge"] = challenge
         params["code_challenge_method"] = "S256"
     else:
-        STATE_MEM[state] = {"provider": provider, "ts": time.time()}
+        await oauth_state.save(state, {"provider": provider})
 
     url_auth = f'{cfg["auth_url"]}?{url.urlencode(params)}'
     # print(f"[OAUTH START] {provider}: {url_auth}")  # bật nếu cần debug
@@ -132,8 +125,9 @@ async def oauth_callback(
             status_code=400,
         )
 
-    rec = STATE_MEM.pop(state, None)
-    if not rec or rec.get("provider") != provider or (time.time() - rec.get("ts", 0)) > STATE_TTL:
+    # state/verifier lưu ở Redis (TTL) -> callback về worker nào cũng được
+    rec = await oauth_state.consume(state)
+    if not rec or rec.get("provider") != provider:
         return HTMLResponse("<h3>State không hợp lệ hoặc đã hết hạn.</h3>", status_code=400)
 
     cfg = OAUTH_CFG.get(provider)
@@ -238,102 +232,67 @@ async def _handle_facebook_callback(db: Session, cfg: Dict, short_lived_token_js
         )
         r_long.raise_for_status()
         t_long = r_long.json()
-        user_token_ll = t_long["access_token"]
-        expires_in = int(t_long.get("expires_in") or 0)
-        user_expires_at = datetime.utcnow() + timedelta(seconds=expires_in) if expires_in else None
-
-        # 2) Lấy danh sách Pages (mỗi page có page access token riêng)
-        r_pages = await client.get(
-            "https://graph.facebook.com/v23.0/me/accounts",
-            params={
-                "access_token": user_token_ll,
-                "fields": "id,name,access_token,picture{url}",
-                "limit": 200,
-            },
+    user_token_ll = t_long["access_token"]
+    expires_in = int(t_long.get("expires_in") or 0)
+    user_expires_at = datetime.utcnow() + timedelta(seconds=expires_in) if expires_in else None
+
+    # 2) Lấy toàn bộ Pages (mỗi page có page access token riêng) + IG gắn với page
+    #    qua field expansion, theo cursor -> ~1 request / 100 pages thay vì 2-3 request / page
+    fb = FacebookService()
+    # không có page token -> bỏ qua page này
+    pages = [p for p in await fb.list_pages(user_token_ll) if p.get("access_token")]
+
+    # 3) IG chưa trả username/avatar qua expansion -> đọc lại bằng PAGE TOKEN, gộp chung batch
+    links = [(p, FacebookService.page_instagram(p)) for p in pages]
+    missing = [(p, ig) for p, ig in links if ig and not ig.get("username")]
+    if missing:
+        results = await fb.get_objects(
+            user_token_ll,
+            [(ig["id"], "username,profile_picture_url", p["access_token"]) for p, ig in missing],
         )
-        r_pages.raise_for_status()
-        pages = (r_pages.json() or {}).get("data", [])
-
-        saved_fb = 0
-        saved_ig = 0
-
-        for p in pages:
-            page_id = p["id"]
-            page_name = p.get("name") or "Facebook Page"
-            page_token = p.get("access_token")
-            avatar = (((p.get("picture") or {}).get("data")) or {}).get("url")
-
-            if not page_token:
-                # không có page token -> bỏ qua page này
-                continue
-
-            # 2a) Upsert Facebook channel (TOKEN = PAGE TOKEN)
-            from app.repositories import channel_repo
-            channel_repo.upsert(
-                db, "facebook", page_id,
-                defaults={
-                    "name": page_name,
-                    "username": page_name,
-                    "avatar_url": avatar,
-                    "access_token": page_token,
-                    "channel_metadata": {
-                        "source": "facebook_oauth",
-                        "user_expires_at": user_expires_at.isoformat() if user_expires_at else None
-                    },
-                    "is_active": True,
-                }
-            )
-            saved_fb += 1
-
-            # 3) Tìm IG user id gắn với Page
-            r_ig_link = await client.get(
-                f"https://graph.facebook.com/v23.0/{page_id}",
-                params={
-                    "access_token": page_token,  # dùng PAGE TOKEN để đọc IG link
-                    "fields": "instagram_business_account,connected_instagram_account"
-                },
-            )
-            # Nếu page không liên kết IG, tiếp tục page khác
-            if r_ig_link.status_code >= 400:
-                continue
-            ig_link = r_ig_link.json() or {}
-            ig_obj = ig_link.get("instagram_business_account") or ig_link.get("connected_instagram_account")
-            ig_id = (ig_obj or {}).get("id")
-            if not ig_id:
-                continue
-
-            # 3a) Lấy username/avatar IG (nếu có quyền)
-            ig_username = None
-            ig_avatar = None
-            r_ig_info = await client.get(
-                f"https://graph.facebook.com/v23.0/{ig_id}",
-                params={"access_token": page_token, "fields": "username,profile_picture_url"},
-            )
-            if r_ig_info.status_code < 400:
-                j5 = r_ig_info.json() or {}
-                ig_username = j5.get("username") or None
-                ig_avatar = j5.get("profile_picture_url") or None
-
-            # 3b) Upsert Instagram channel
-            #     LƯU PAGE TOKEN vào access_token, và metadata.page_id để tra cứu nhanh
-            channel_repo.upsert(
-                db, "instagram", ig_id,
-                defaults={
-                    "name": ig_username or page_name,
-                    "username": ig_username or page_name,
-                    "avatar_url": ig_avatar,
-                    "access_token": page_token,  # IG Graph cần PAGE TOKEN
-                    "channel_metadata": {"page_id": page_id, "source": "facebook_oauth"},
-                    "is_active": True,
-                }
-            )
-            saved_ig += 1
-
-        # 4) Commit tất cả thay đổi
-        db.commit()
+        for (_, ig), r in zip(missing, results):
+            if r["ok"]:
+                ig.update({k: v for k, v in r["body"].items() if k in ("username", "profile_picture_url")})
+
+    # 4) Upsert tất cả channel trong 1 transaction
+    rows = []
+    for p, ig in links:
+        page_id = p["id"]
+        page_name = p.get("name") or "Facebook Page"
+        page_token = p["access_token"]
+        # 4a) Facebook channel (TOKEN = PAGE TOKEN)
+        rows.append({
+            "platform": "facebook", "external_id": page_id,
+            "name": page_name,
+            "username": page_name,
+            "avatar_url": (((p.get("picture") or {}).get("data")) or {}).get("url"),
+            "access_token": page_token,
+            "channel_metadata": {
+                "source": "facebook_oauth",
+                "user_expires_at": user_expires_at.isoformat() if user_expires_at else None
+            },
+            "is_active": True,
+        })
+        # Nếu page không liên kết IG, tiếp tục page khác
+        if not ig:
+            continue
+        # 4b) Instagram channel
+        #     LƯU PAGE TOKEN vào access_token, và metadata.page_id để tra cứu nhanh
+        ig_username = ig.get("username") or None
+        rows.append({
+            "platform": "instagram", "external_id": ig["id"],
+            "name": ig_username or page_name,
+            "username": ig_username or page_name,
+            "avatar_url": ig.get("profile_picture_url") or None,
+            "access_token": page_token,  # IG Graph cần PAGE TOKEN
+            "channel_metadata": {"page_id": page_id, "source": "facebook_oauth"},
+            "is_active": True,
+        })
+    channel_repo.upsert_many(db, rows)
 
     # (Không cần return gì; callback bên ngoài sẽ render HTML “success”)
-    print(f"[OAUTH:FACEBOOK] saved pages={saved_fb}, instagram={saved_ig}")
+    saved_ig = sum(1 for r in rows if r["platform"] == "instagram")
+    print(f"[OAUTH:FACEBOOK] saved pages={len(rows) - saved_ig}, instagram={saved_ig}")
 
 async def _handle_tiktok_callback(db: Session, cfg: Dict, token_json: Dict):
     access = token_json["access_token"]
@@ -385,82 +344,37 @@ async def _handle_youtube_callback(db: Session, cfg: Dict, token_json: Dict):
         raise RuntimeError(f"YouTube: no channels returned for this account. API payload={payload}")
     
     expires_at = datetime.utcnow() + timedelta(seconds=expires_in) if expires_in else None
-    # 3) Upsert từng channel + COMMIT
-    saved = 0
+    # 3) Upsert tất cả channel trong 1 câu lệnh (platform="youtube", external_id=ch_id)
+    rows = []
     for it in items:
-        ch_id = it["id"]
         sn = it.get("snippet", {}) or {}
         title = sn.get("title") or "YouTube Channel"
         thumb = (sn.get("thumbnails") or {}).get("default") or {}
-
-        # upsert theo (platform="youtube", external_id=ch_id)
-        channel_repo.upsert(
-            db, "youtube", ch_id,
-            defaults={
-                "name": title,
-                "username": title,
-                "avatar_url": thumb.get("url"),
-                "access_token": access,
-                "token_expires_at": expires_at,
-                "channel_metadata": {"refresh_token": refresh, "scopes": cfg.get("scope")},
-                "is_active": True,
-            }
-        )
-        saved += 1
-        db.commit()
+        rows.append({
+            "platform": "youtube", "external_id": it["id"],
+            "name": title,
+            "username": title,
+            "avatar_url": thumb.get("url"),
+            "access_token": access,
+            "token_expires_at": expires_at,
+            "channel_metadata": {"refresh_token": refresh, "scopes": cfg.get("scope")},
+            "is_active": True,
+        })
+    channel_repo.upsert_many(db, rows)
 
 # Thêm endpoint refresh token
 @router.post("/{provider}/refresh")
 async def refresh_token(provider: str, channel_id: int, db: Session = Depends(get_db)):
-    """Refresh token cho channel"""
+    """Refresh token cho channel (bình thường TokenRefreshService đã refresh nền trước khi hết hạn)"""
     channel = channel_repo.get_by_id(db, channel_id)
     if not channel or channel.platform != provider:
         raise HTTPException(404, "Channel not found")
-    
-    if provider == "youtube":
-        await _refresh_youtube_token(db, channel)
-    elif provider == "tiktok":
-        await _refresh_tiktok_token(db, channel)
-    # Facebook page tokens thường không cần refresh
-    
-    return {"success": True, "message": f"{provider} token refreshed"}
 
-async def _refresh_youtube_token(db: Session, channel):
-    """Refresh YouTube token using refresh_token"""
-    cfg = OAUTH_CFG.get("youtube")
-    if not cfg:
-        raise HTTPException(500, "YouTube config missing")
-    
-    refresh_token = channel.channel_metadata.get("refresh_token")
-    if not refresh_token:
-        raise HTTPException(400, "No refresh token available")
-    
-    async with httpx.AsyncClient(timeout=30) as client:
-        res = await client.post(
-            cfg["token_url"],
-            data={
-                "grant_type": "refresh_token",
-                "refresh_token": refresh_token,
-                "client_id": cfg["client_id"],
-                "client_secret": cfg["client_secret"]
-            },
-            headers={"Content-Type": "application/x-www-form-urlencoded"}
-        )
-        
-        if res.status_code >= 400:
-            raise HTTPException(res.status_code, f"Token refresh failed: {res.text}")
-        
-        token_data = res.json()
-        access_token = token_data.get("access_token")
-        # New refresh token is optional, use old one if not provided
-        new_refresh = token_data.get("refresh_token", refresh_token)
-        expires_in = int(token_data.get("expires_in", 3600))
-        
-        # Update channel in DB
-        channel.access_token = access_token
-        channel.token_expires_at = datetime.utcnow() + timedelta(seconds=expires_in)
-        channel.channel_metadata["refresh_token"] = new_refresh
-        db.commit()
-        
-        return token_data
+    # Facebook page tokens thường không cần refresh
+    if provider in ("youtube", "tiktok"):
+        try:
+            await TokenRefreshService().refresh(db, channel_id, force=True, skip_locked=False)
+        except TokenRefreshError as e:
+            raise HTTPException(400, f"Token refresh failed: {e}")
 
+    return {"success": True, "message": f"{provider} token refreshed"}
@@ -6,6 +6,7 @@ import logging
 from app.core.database import get_db
 from app.api.deps import require_roles, get_current_user_id
 from app.schemas.post_schemas import PostCreateIn, PostUpdateIn, PostOut
+from app.schemas.common import CursorPage
 from app.services.post_service import PostService
 
 router = APIRouter(prefix="/posts", tags=["posts"])
@@ -44,6 +45,19 @@ def list_posts(
 ):
     return svc.list(db, status=status, q=q, limit=limit, offset=offset)
 
+@router.get("/page", response_model=CursorPage[PostOut], dependencies=[Depends(require_roles(["admin", "staff"]))])
+def list_posts_page(
+    status: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    with_total: bool = False,
+    db: Session = Depends(get_db),
+    svc: PostService = Depends(get_service),
+):
+    """Keyset pagination: truyền lại next_cursor để lấy trang sau."""
+    return svc.list_page(db, status=status, q=q, limit=limit, cursor=cursor, with_total=with_total)
+
 @router.get("/{post_id}", response_model=PostOut, dependencies=[Depends(require_roles(["admin", "staff"]))])
 def get_post(
     post_id: int,
@@ -0,0 +1,26 @@
+# Tìm kiếm hợp nhất: posts / videos / media / channels (/users cho admin)
+
+
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.api.deps import get_search_service, get_current_roles
+from app.services.search_service import SearchService, DEFAULT_TYPES
+from app.schemas.search_schemas import SearchOut
+
+router = APIRouter(prefix="/search", tags=["search"])
+
+@router.get("/", response_model=SearchOut)
+async def search(
+    q: str,
+    types: Optional[str] = Query(None, description="posts,videos,media,channels,users"),
+    limit: int = Query(20, ge=1, le=100),
+    roles: List[str] = Depends(get_current_roles),
+    svc: SearchService = Depends(get_search_service),
+):
+    if not any(r in roles for r in ("admin", "staff")):
+        raise HTTPException(403, "Forbidden")
+    kinds = [t.strip() for t in types.split(",") if t.strip()] if types else list(DEFAULT_TYPES)
+    if "users" in kinds and "admin" not in roles:
+        raise HTTPException(403, "Searching users requires admin role")
+    return await svc.search(q, types=kinds, limit=limit)
@@ -0,0 +1,13 @@
+# Phục vụ file media tại /storage/... (thay StaticFiles mount, xem core/media_delivery.py)
+
+
+from fastapi import APIRouter, Request
+
+from app.core import media_delivery
+
+router = APIRouter(prefix="/storage", tags=["storage"])
+
+@router.api_route("/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_media(path: str, request: Request):
+    # key lưu trong DB có dạng "storage/..." nên URL = "/" + key
+    return media_delivery.deliver(request, f"{media_delivery.MOUNT_PREFIX}/{path}")
@@ -3,13 +3,20 @@
 
 
 from typing import List, Optional
-from fastapi import APIRouter, Depends, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 
 from app.api.deps import get_video_service, require_roles
 from app.services.video_service import VideoService
 from app.schemas.video_schemas import VideoImportIn, VideoOut, VideoProcessIn, VideoUpdateIn, TrimIn, CropIn, WatermarkIn, ThumbnailIn
+from app.schemas.video_schemas import PreflightOut, RenditionsIn, RenditionOut
+from app.services.rendition_service import RenditionService
+from app.services.batch_service import BatchService
+from app.schemas.video_schemas import VideoBatchIn, VideoBatchOut, VideoProcessResultOut
+from app.schemas.common import CursorPage
+from app.core import media_delivery
+from app.services.derivative_service import DerivativeService
 
 
 router = APIRouter(prefix="/videos", tags=["videos"])
@@ -38,6 +45,35 @@ async def import_videos(
 ):
     return await svc.import_urls(db=db, payload=body)
 
+@router.post("/batch", response_model=VideoBatchOut, status_code=status.HTTP_202_ACCEPTED)
+async def create_batch(
+    body: VideoBatchIn,
+    db: Session = Depends(get_db),
+    _ = Depends(require_roles(["admin","staff"])),
+):
+    """1 op cho nhiều video, chạy song song trên video worker pool; theo dõi qua GET /videos/batch/{id}."""
+    svc = BatchService()
+    batch = await svc.create(db, body)
+    return svc.progress(db, batch.id, include_items=False)
+
+@router.get("/batch/{batch_id}", response_model=VideoBatchOut)
+async def get_batch(
+    batch_id: int,
+    include_items: bool = True,
+    db: Session = Depends(get_db),
+    _ = Depends(require_roles(["admin","staff"])),
+):
+    return BatchService().progress(db, batch_id, include_items=include_items)
+
+@router.post("/{video_id}/import/retry", response_model=VideoOut, status_code=status.HTTP_202_ACCEPTED)
+async def retry_import(
+    video_id: int,
+    db: Session = Depends(get_db),
+    _ = Depends(require_roles(["admin","staff"])),
+    svc: VideoService = Depends(get_video_service),
+):
+    return await svc.retry_import(db, video_id)
+
 @router.post("/upload", response_model=List[VideoOut], status_code=status.HTTP_201_CREATED)
 async def upload_videos(
     files: List[UploadFile] = File(...),          # KEY phải tên đúng "files"
@@ -49,7 +85,7 @@ async def upload_videos(
 ):
     return await svc.upload(db=db, files=files, title=title, channel_id=channel_id)
 
-@router.post("/process", response_model=List[VideoOut])
+@router.post("/process", response_model=List[VideoProcessResultOut], status_code=status.HTTP_202_ACCEPTED)
 async def process_videos(
     body: VideoProcessIn,
     db: Session = Depends(get_db),
@@ -72,6 +108,20 @@ async def list_videos(
     offset = (page - 1) * page_size
     return await svc.list(db=db, status=status, source=source, q=q, limit=page_size, offset=offset)
 
+@router.get("/page", response_model=CursorPage[VideoOut])
+async def list_videos_page(
+    status: str | None = None,
+    source: str | None = None,
+    q: str | None = None,
+    limit: int = Query(24, ge=1, le=200),
+    cursor: str | None = None,
+    with_total: bool = False,
+    db: Session = Depends(get_db),
+    _ = Depends(require_roles(["admin","staff"])),
+    svc: VideoService = Depends(get_video_service),
+):
+    return await svc.list_page(db=db, status=status, source=source, q=q, limit=limit, cursor=cursor, with_total=with_total)
+
 @router.get("/{video_id}", response_model=VideoOut)
 async def get_video(
     video_id: int, 
@@ -80,6 +130,60 @@ async def get_video(
     svc: VideoService = Depends(get_video_service)):
     return await svc.get(db=db, video_id=video_id)
 
+# public giống /storage: poster cho thẻ <img>/<video poster>. Dùng VideoOut.thumb_url (có version + chữ ký):
+# đúng version -> immutable; không có chữ ký hợp lệ thì chỉ phục vụ bản đã có trong cache
+@router.get("/{video_id}/thumb", include_in_schema=False)
+async def video_thumbnail(
+    video_id: int,
+    request: Request,
+    w: int = Query(320, ge=16, le=4096),
+    fmt: str = "jpg",
+    method: str = Query("middle", pattern="^(middle|scene)$"),
+    v: Optional[str] = None,
+    sig: Optional[str] = None,
+    db: Session = Depends(get_db),
+    svc: VideoService = Depends(get_video_service),
+):
+    path, current = await svc.thumbnail(db=db, video_id=video_id, width=w, fmt=fmt, method=method,
+                                        version=v, sig=sig)
+    return media_delivery.deliver_file(request, str(path), key=DerivativeService().cache_key(path), immutable=current)
+
+@router.get("/{video_id}/preflight", response_model=PreflightOut)
+async def video_preflight(
+    video_id: int,
+    platform: str,
+    db: Session = Depends(get_db),
+    _ = Depends(require_roles(["admin","staff"])),
+    svc: VideoService = Depends(get_video_service),
+):
+    """So metadata video với spec platform (không upload gì)."""
+    v = await svc.get(db=db, video_id=video_id)
+    check = await RenditionService().preflight(db, v, platform)
+    if not check:
+        raise HTTPException(422, f"No encoding profile for platform '{platform}'")
+    return check
+
+@router.get("/{video_id}/renditions", response_model=List[RenditionOut])
+async def list_renditions(
+    video_id: int,
+    db: Session = Depends(get_db),
+    _ = Depends(require_roles(["admin","staff"])),
+):
+    return RenditionService().list(db, video_id)
+
+@router.post("/{video_id}/renditions", status_code=status.HTTP_202_ACCEPTED)
+async def prepare_renditions(
+    video_id: int,
+    body: RenditionsIn,
+    db: Session = Depends(get_db),
+    _ = Depends(require_roles(["admin","staff"])),
+    svc: VideoService = Depends(get_video_service),
+):
+    """Xếp job transcode theo spec các platform vào video worker pool."""
+    await svc.get(db=db, video_id=video_id)
+    RenditionService().prepare_background(video_id, body.platforms)
+    return {"video_id": video_id, "queued": body.platforms}
+
 @router.put("/{video_id}", response_model=VideoOut)
 async def update_video(
     video_id: int, 
@@ -0,0 +1,160 @@
+# app/core/channel_cache.py
+"""
+Cache trong process cho thông tin đăng bài của channel (token, page/IG id, platform, hạn token).
+
+- entry sống CHANNEL_CACHE_TTL_SECONDS, hoặc tới khi token hết hạn (lấy mốc sớm hơn)
+- channel_repo gọi invalidate() sau mỗi lần ghi (update / update_tokens / upsert / delete)
+- nhiều worker/node: invalidate() publish id lên Redis (CHANNEL_CACHE_PUBSUB), listener của mỗi
+  process xoá entry tương ứng. Không có Redis -> chỉ xoá local, node khác tự hết hạn theo TTL;
+  mất kết nối pub/sub -> xoá toàn bộ cache vì có thể đã lỡ message.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.settings import get_settings
+from app.core import redis_client
+from app.models.channel_models import Channel
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_CACHE_PUBSUB = "channel_cache:invalidate"
+MAX_ENTRIES = 10000
+
+
+@dataclass(frozen=True)
+class ChannelCreds:
+    id: int
+    platform: str
+    external_id: Optional[str]
+    access_token: Optional[str]
+    token_expires_at: Optional[datetime]
+    is_active: bool
+
+    @property
+    def expired(self) -> bool:
+        return self.token_expires_at is not None and self.token_expires_at <= datetime.now(timezone.utc)
+
+
+_entries: "OrderedDict[int, Tuple[float, ChannelCreds]]" = OrderedDict()
+_lock = threading.Lock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_task: Optional[asyncio.Task] = None
+
+
+def _to_creds(ch: Channel) -> ChannelCreds:
+    exp = ch.token_expires_at
+    if exp is not None and exp.tzinfo is None:
+        exp = exp.replace(tzinfo=timezone.utc)
+    return ChannelCreds(
+        id=ch.id,
+        platform=getattr(ch.platform, "value", ch.platform),
+        external_id=ch.external_id,
+        access_token=ch.access_token,
+        token_expires_at=exp,
+        is_active=bool(ch.is_active),
+    )
+
+
+def get(db: Session, channel_id: int) -> Optional[ChannelCreds]:
+    """Creds của channel, đọc DB khi chưa có trong cache / hết TTL / token đã hết hạn."""
+    ttl = float(get_settings().CHANNEL_CACHE_TTL_SECONDS)
+    now = time.monotonic()
+    if ttl > 0:
+        with _lock:
+            hit = _entries.get(channel_id)
+            if hit is not None and hit[0] > now and not hit[1].expired:
+                _entries.move_to_end(channel_id)
+                return hit[1]
+    ch = db.get(Channel, channel_id)
+    if ch is None:
+        return None
+    creds = _to_creds(ch)
+    if ttl > 0:
+        with _lock:
+            _entries[channel_id] = (now + ttl, creds)
+            _entries.move_to_end(channel_id)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return creds
+
+
+def _drop(ids: Iterable[int]) -> None:
+    with _lock:
+        for cid in ids:
+            _entries.pop(cid, None)
+
+
+def clear() -> None:
+    with _lock:
+        _entries.clear()
+
+
+def invalidate(*channel_ids: int) -> None:
+    """Xoá entry local + báo các process khác (gọi được từ cả threadpool lẫn event loop)."""
+    ids = [int(c) for c in channel_ids if c is not None]
+    if not ids:
+        return
+    _drop(ids)
+    loop = _loop
+    if loop is not None and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(_publish(ids), loop)
+
+
+async def _publish(ids: Iterable[int]) -> None:
+    r = redis_client.get_redis()
+    if r is None:
+        return
+    try:
+        await r.publish(CHANNEL_CACHE_PUBSUB, ",".join(str(i) for i in ids))
+    except Exception as e:
+        redis_client.mark_down(e)
+
+
+# ---------- listener pub/sub ----------
+def start_listener() -> None:
+    global _loop, _task
+    if _task is not None or float(get_settings().CHANNEL_CACHE_TTL_SECONDS) <= 0:
+        return
+    _loop = asyncio.get_running_loop()
+    _task = asyncio.create_task(_listen(), name="channel-cache-invalidation")
+
+
+async def _listen() -> None:
+    while True:
+        r = redis_client.get_redis()
+        if r is None:
+            await asyncio.sleep(redis_client.RETRY_AFTER_SECONDS)
+            continue
+        try:
+            async with r.pubsub() as ps:
+                await ps.subscribe(CHANNEL_CACHE_PUBSUB)
+                clear()  # trước khi subscribe có thể đã lỡ invalidation
+                while True:
+                    msg = await ps.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if msg and msg.get("type") == "message":
+                        data = msg.get("data")
+                        if isinstance(data, bytes):
+                            data = data.decode()
+                        _drop(int(x) for x in str(data).split(",") if x.strip().isdigit())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            redis_client.mark_down(e)
+            clear()
+
+
+async def shutdown() -> None:
+    global _loop, _task
+    if _task is not None:
+        _task.cancel()
+        await asyncio.gather(_task, return_exceptions=True)
+        _task = None
+    _loop = None
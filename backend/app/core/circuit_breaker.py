@@ -0,0 +1,196 @@
+# app/core/circuit_breaker.py
+"""
+Circuit breaker theo từng nền tảng + retry budget chung.
+
+- closed: request đi bình thường; trong cửa sổ CIRCUIT_WINDOW_SECONDS nếu có ít nhất
+  CIRCUIT_MIN_REQUESTS request và tỉ lệ lỗi (5xx / timeout / lỗi kết nối) >= CIRCUIT_FAILURE_RATIO
+  -> open
+- open: từ chối ngay (CircuitOpen, 503 + Retry-After), không gọi upstream. Thời gian open tăng
+  gấp đôi mỗi lần trip liên tiếp (có jitter), tối đa CIRCUIT_MAX_OPEN_SECONDS
+- half-open: hết thời gian open -> cho CIRCUIT_HALF_OPEN_PROBES request thăm dò; thành công
+  -> closed, lỗi -> open lại
+Retry budget: số lần retry trong cửa sổ <= RETRY_BUDGET_RATIO * số request (tối thiểu
+RETRY_BUDGET_MIN) -> khi upstream sập, retry không nhân traffic lên.
+State nằm trong process (mỗi worker tự ngắt, không cần chờ Redis khi chính hạ tầng đang lỗi).
+"""
+import time
+import random
+import logging
+import threading
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class UpstreamUnavailable(HTTPException):
+    """Nền tảng lỗi tạm thời (5xx / timeout / circuit open) -> caller nên hoãn và thử lại sau."""
+
+    def __init__(self, platform: str, retry_after: float, reason: str = "upstream_unavailable", status_code: int = 503):
+        self.platform = platform
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=status_code,
+            detail={"error": reason, "platform": platform, "retry_after": round(retry_after, 1)},
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+class CircuitOpen(UpstreamUnavailable):
+    def __init__(self, platform: str, retry_after: float):
+        super().__init__(platform, retry_after, reason="circuit_open")
+
+
+def backoff(attempt: int, base: float = 0.5, cap: float = 8.0) -> float:
+    """Exponential backoff + full jitter: tránh mọi worker retry cùng một nhịp."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.settings = get_settings()
+        self.state = CLOSED
+        self.trips = 0
+        self.open_until = 0.0
+        self.probes = 0
+        self._calls: Deque[Tuple[float, bool]] = deque()
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        horizon = now - float(self.settings.CIRCUIT_WINDOW_SECONDS)
+        while self._calls and self._calls[0][0] < horizon:
+            self._calls.popleft()
+
+    def _open(self, now: float) -> None:
+        self.trips += 1
+        base = float(self.settings.CIRCUIT_OPEN_SECONDS) * (2 ** (self.trips - 1))
+        duration = min(float(self.settings.CIRCUIT_MAX_OPEN_SECONDS), base) * random.uniform(0.8, 1.2)
+        self.state, self.open_until, self.probes = OPEN, now + duration, 0
+        self._calls.clear()
+        logger.warning(f"Circuit {self.name} open for {duration:.0f}s (trip #{self.trips})")
+
+    def before(self) -> None:
+        """Gọi trước mỗi request; CircuitOpen nếu đang ngắt."""
+        if not self.settings.CIRCUIT_BREAKER_ENABLED:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self.state == OPEN:
+                if now < self.open_until:
+                    raise CircuitOpen(self.name, self.open_until - now)
+                self.state, self.probes = HALF_OPEN, 0
+            if self.state == HALF_OPEN:
+                if self.probes >= int(self.settings.CIRCUIT_HALF_OPEN_PROBES):
+                    raise CircuitOpen(self.name, 1.0)
+                self.probes += 1
+
+    def release(self) -> None:
+        """Lượt thăm dò half-open không gửi được request (vd bị rate limit) -> trả lại lượt."""
+        with self._lock:
+            if self.state == HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def success(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                logger.info(f"Circuit {self.name} closed")
+                self.state, self.trips = CLOSED, 0
+                self._calls.clear()
+            self._calls.append((now, True))
+            self._trim(now)
+
+    def failure(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            if self.state == HALF_OPEN:
+                self._open(now)
+                return
+            if self.state == OPEN:
+                return
+            self._calls.append((now, False))
+            self._trim(now)
+            failed = sum(1 for _, ok in self._calls if not ok)
+            if (len(self._calls) >= int(self.settings.CIRCUIT_MIN_REQUESTS)
+                    and failed / len(self._calls) >= float(self.settings.CIRCUIT_FAILURE_RATIO)):
+                self._open(now)
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN and time.monotonic() < self.open_until
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            self._trim(time.monotonic())
+            return {
+                "state": self.state, "trips": self.trips,
+                "open_for": round(max(0.0, self.open_until - time.monotonic()), 1) if self.state == OPEN else 0,
+                "calls": len(self._calls), "failures": sum(1 for _, ok in self._calls if not ok),
+            }
+
+
+class RetryBudget:
+    """Retry chỉ được phép khi tổng retry trong cửa sổ còn dưới tỉ lệ cho phép của traffic."""
+
+    def __init__(self):
+        self.settings = get_settings()
+        self._events: Deque[Tuple[float, bool]] = deque()  # (ts, is_retry)
+        self._lock = threading.Lock()
+
+    def _trim(self, now: float) -> None:
+        horizon = now - float(self.settings.CIRCUIT_WINDOW_SECONDS)
+        while self._events and self._events[0][0] < horizon:
+            self._events.popleft()
+
+    def record(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            self._events.append((now, False))
+            self._trim(now)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._trim(now)
+            requests = sum(1 for _, r in self._events if not r)
+            retries = len(self._events) - requests
+            allowed = max(float(self.settings.RETRY_BUDGET_MIN), float(self.settings.RETRY_BUDGET_RATIO) * requests)
+            if retries + 1 > allowed:
+                return False
+            self._events.append((now, True))
+            return True
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_budget: Optional[RetryBudget] = None
+_guard = threading.Lock()
+
+
+def get_breaker(platform: str) -> CircuitBreaker:
+    with _guard:
+        if platform not in _breakers:
+            _breakers[platform] = CircuitBreaker(platform)
+        return _breakers[platform]
+
+
+def retry_budget() -> RetryBudget:
+    global _budget
+    with _guard:
+        if _budget is None:
+            _budget = RetryBudget()
+        return _budget
+
+
+def open_platforms() -> List[str]:
+    return [name for name, b in list(_breakers.items()) if b.is_open]
+
+
+def snapshot() -> Dict[str, Dict[str, object]]:
+    return {name: b.snapshot() for name, b in list(_breakers.items())}
@@ -25,6 +25,8 @@ def create_tables():
     import app.models.template_models
     import app.models.schedule_models
     import app.models.analytics_models
+    import app.models.hashtag_models
+    import app.models.blob_models
     import app.models.association  
 
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,114 @@
+# app/core/disk_cache.py
+"""
+Tiện ích cho cache file local sinh bằng ffmpeg (derivative thumbnail, overlay template).
+
+- KeyedLocks: lock theo key (vd sha nguồn) để 2 request không cùng sinh 1 file. Lock chỉ sống
+  khi còn thread giữ / chờ (WeakValueDictionary) -> map không phình theo số key từng gặp.
+- DiskLRU: giới hạn tổng dung lượng 1 thư mục cache, xoá file ít dùng nhất (mtime được "touch"
+  mỗi lần đọc). Không quét cả thư mục mỗi lần ghi: cộng dồn ước lượng dung lượng, chỉ quét khi
+  ước lượng vượt ngưỡng hoặc đã quá scan_interval từ lần quét trước.
+"""
+import os
+import time
+import threading
+import weakref
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+# file vừa sinh / vừa đọc trong khoảng này không bị evict: caller vừa nhận path còn kịp dùng
+EVICT_MIN_AGE = 60.0
+
+
+class KeyedLocks:
+    def __init__(self):
+        self._locks: "weakref.WeakValueDictionary[str, threading.Lock]" = weakref.WeakValueDictionary()
+        self._guard = threading.Lock()
+
+    def get(self, key: str) -> threading.Lock:
+        # caller phải giữ tham chiếu trong lúc dùng (`with locks.get(k):` là đủ)
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = threading.Lock()
+                self._locks[key] = lock
+            return lock
+
+
+class DiskLRU:
+    def __init__(self, root: Path, max_bytes: int, scan_interval: float = 300.0):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.scan_interval = scan_interval
+        self._estimate = 0
+        self._last_scan = 0.0
+        self._guard = threading.Lock()
+        self._scanning = threading.Lock()
+
+    @staticmethod
+    def touch(path: Path) -> None:
+        try:
+            os.utime(path)  # đánh dấu vừa dùng
+        except OSError:
+            pass
+
+    def added(self, nbytes: int) -> None:
+        """Gọi sau khi ghi file mới vào cache; evict nếu tới lượt."""
+        if self.max_bytes <= 0:
+            return
+        with self._guard:
+            self._estimate += max(0, nbytes)
+            due = self._estimate > self.max_bytes or time.monotonic() - self._last_scan > self.scan_interval
+        if due:
+            self.evict()
+
+    def evict(self) -> None:
+        # 1 thread quét tại 1 thời điểm; thread khác bỏ qua thay vì xếp hàng quét lại
+        if not self._scanning.acquire(blocking=False):
+            return
+        try:
+            files: List[Tuple[float, int, Path]] = []
+            total = 0
+            if self.root.exists():
+                for root, _, names in os.walk(self.root):
+                    for n in names:
+                        p = Path(root) / n
+                        try:
+                            st = p.stat()
+                        except OSError:
+                            continue
+                        files.append((st.st_mtime, st.st_size, p))
+                        total += st.st_size
+            if total > self.max_bytes:
+                # xoá cũ nhất tới khi còn 90% ngưỡng (tránh evict lại ngay lần sinh sau)
+                target = int(self.max_bytes * 0.9)
+                fresh = time.time() - EVICT_MIN_AGE
+                for mtime, size, p in sorted(files):
+                    if total <= target or mtime > fresh:
+                        break
+                    try:
+                        if p.stat().st_mtime > fresh:
+                            continue  # vừa được đọc lại sau lúc quét
+                        p.unlink()
+                        total -= size
+                    except OSError:
+                        pass
+            with self._guard:
+                self._estimate = total
+                self._last_scan = time.monotonic()
+        finally:
+            self._scanning.release()
+
+
+_caches: Dict[str, DiskLRU] = {}
+_caches_guard = threading.Lock()
+
+
+def lru_for(root: Path, max_bytes: int) -> DiskLRU:
+    """1 DiskLRU dùng chung cả process cho mỗi thư mục (service được tạo mới mỗi request)."""
+    key = str(Path(root).resolve())
+    with _caches_guard:
+        lru = _caches.get(key)
+        if lru is None:
+            lru = _caches[key] = DiskLRU(root, max_bytes)
+        lru.max_bytes = max_bytes
+        return lru
@@ -0,0 +1,58 @@
+# app/core/encoding.py
+"""
+Tier encode cho các job sửa video (trim/crop/watermark...), chỉ dùng libx264 (không phụ thuộc GPU).
+
+- preview: ultrafast, thu về <= 480p, chạy trên pool "preview" -> staff xem nháp trong vài giây
+- final:   preset/CRF tối ưu dung lượng; có platform thì lấy theo core/platform_profiles.py
+Số thread mỗi job = CPU / số job tối đa của pool (video_workers.threads_per_job).
+"""
+from dataclasses import dataclass, replace
+from typing import List, Optional
+
+from app.core import video_workers
+from app.core.platform_profiles import profile_for
+
+
+@dataclass(frozen=True)
+class EncoderTier:
+    name: str
+    preset: str
+    crf: int
+    max_height: Optional[int]   # None = giữ độ phân giải gốc
+    audio_bitrate: str
+    pool: str                   # pool video_workers chạy job
+
+
+TIERS = {
+    "preview": EncoderTier(name="preview", preset="ultrafast", crf=30, max_height=480,
+                           audio_bitrate="96k", pool="preview"),
+    "final": EncoderTier(name="final", preset="slow", crf=20, max_height=None,
+                         audio_bitrate="160k", pool="video"),
+}
+
+
+def tier_for(name: str = "final", platform: Optional[str] = None) -> EncoderTier:
+    tier = TIERS.get(name) or TIERS["final"]
+    profile = profile_for(platform) if platform and tier.name == "final" else None
+    if profile:
+        tier = replace(tier, preset=profile.preset, crf=profile.crf, audio_bitrate=profile.audio_bitrate)
+    return tier
+
+
+def scale_filter(tier: EncoderTier) -> Optional[str]:
+    # chỉ thu nhỏ, cạnh chẵn cho yuv420p
+    if not tier.max_height:
+        return None
+    return f"scale=-2:'min(ih,{tier.max_height})'"
+
+
+def video_args(tier: EncoderTier) -> List[str]:
+    return [
+        "-c:v", "libx264", "-preset", tier.preset, "-crf", str(tier.crf), "-pix_fmt", "yuv420p",
+        "-threads", str(video_workers.threads_per_job(tier.pool)),
+        "-movflags", "+faststart",
+    ]
+
+
+def audio_args(tier: EncoderTier) -> List[str]:
+    return ["-c:a", "aac", "-b:a", tier.audio_bitrate]
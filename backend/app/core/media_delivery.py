@@ -0,0 +1,228 @@
+# app/core/media_delivery.py
+"""
+Phục vụ file media (thay cho StaticFiles mount /storage).
+
+MEDIA_DELIVERY_MODE:
+- "inline":     API tự gửi file: ETag mạnh, Range/206, 304, zero-copy nếu server hỗ trợ
+- "x-accel":    trả header X-Accel-Redirect cho nginx tự gửi (location internal MEDIA_ACCEL_PREFIX)
+- "x-sendfile": trả header X-Sendfile (Apache / lighttpd / Caddy)
+Với STORAGE_BACKEND=s3 luôn redirect tới URL pre-signed, worker không đụng tới byte nào.
+
+File content-addressed (blobs/ab/cd/<sha256>) không bao giờ đổi nội dung -> ETag = sha256,
+Cache-Control immutable 1 năm.
+
+Thumbnail (/videos/{id}/thumb, /media/{id}/thumb) public cho thẻ <img>: URL mang version của file
+nguồn (v) + chữ ký (sig) do API đã xác thực phát ra (thumb_url). Đúng version -> immutable; chỉ URL
+có chữ ký hợp lệ mới được sinh derivative (chạy ffmpeg), còn lại chỉ phục vụ bản đã có trong cache.
+"""
+import os
+import re
+import hmac
+import hashlib
+import stat
+import mimetypes
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Tuple, Mapping
+from urllib.parse import quote
+
+import anyio
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, RedirectResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.settings import get_settings
+from app.core.storage import get_storage
+
+CHUNK_SIZE = 256 * 1024
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# file thường (output trim/crop...) có thể bị ghi đè cùng tên -> cache ngắn + revalidate bằng ETag
+CACHE_DEFAULT = "public, max-age=300, must-revalidate"
+
+# key media luôn nằm dưới thư mục này (URL /storage/... = "/" + key)
+MOUNT_PREFIX = "storage"
+
+_BLOB_RE = re.compile(r"(?:^|/)blobs/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})(?:\.[^/]*)?$")
+
+
+def content_hash_from_key(key: str) -> Optional[str]:
+    m = _BLOB_RE.search(key)
+    return m.group(1) if m else None
+
+
+def source_version(key: Optional[str]) -> str:
+    # blob -> sha256 nội dung; file thường -> hash key (edit luôn ghi ra key mới)
+    sha = content_hash_from_key(key or "")
+    return (sha or hashlib.sha1((key or "").encode()).hexdigest())[:16]
+
+
+def sign(*parts) -> str:
+    msg = ":".join(str(p) for p in parts).encode()
+    return hmac.new(get_settings().JWT_SECRET.encode(), msg, hashlib.sha256).hexdigest()[:32]
+
+
+def verify(sig: Optional[str], *parts) -> bool:
+    return bool(sig) and hmac.compare_digest(sig, sign(*parts))
+
+
+def thumb_url(kind: str, obj_id: int, key: Optional[str], width: int = 320) -> str:
+    """URL thumbnail có version + chữ ký, vd /api/v1/media/5/thumb?w=320&v=...&sig=..."""
+    ver = source_version(key)
+    return (f"{get_settings().API_PREFIX}/{kind}/{obj_id}/thumb"
+            f"?w={width}&v={ver}&sig={sign(kind, obj_id, ver)}")
+
+
+def safe_key(key: str, prefix: str = MOUNT_PREFIX) -> str:
+    """
+    Chặn path traversal ("..", path tuyệt đối). Sau khi normalize key phải vẫn nằm dưới `prefix`:
+    "storage/../.env" -> ".env" không bắt đầu bằng "../" nhưng đã ra khỏi thư mục media.
+    """
+    norm = os.path.normpath(key).replace(os.sep, "/")
+    if "\x00" in norm or not norm.startswith(prefix.rstrip("/") + "/"):
+        raise HTTPException(404, "Not found")
+    return norm
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    'bytes=a-b' | 'bytes=a-' | 'bytes=-n' -> (start, end) tính cả end.
+    None = không có / không hiểu / nhiều range -> trả cả file (RFC 9110 cho phép).
+    ValueError = range nằm ngoài file -> 416.
+    """
+    if not header or not header.strip().lower().startswith("bytes="):
+        return None
+    spec = header.split("=", 1)[1].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, last = (p.strip() for p in spec.split("-", 1))
+    if not (first.isdigit() or not first) or not (last.isdigit() or not last) or not (first or last):
+        return None
+    if not first:
+        n = int(last)
+        if n <= 0 or size == 0:
+            raise ValueError("range not satisfiable")
+        return max(0, size - n), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("range not satisfiable")
+    return start, min(end, size - 1)
+
+
+def is_not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    inm = headers.get("if-none-match")
+    if inm is not None:
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        return "*" in tags or etag in tags
+    ims = headers.get("if-modified-since")
+    if ims:
+        try:
+            return int(mtime) <= int(parsedate_to_datetime(ims).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+class RangeFileResponse(Response):
+    """Gửi đoạn [start, end] của file; dùng http.response.zerocopysend (sendfile) nếu server có."""
+
+    def __init__(self, path: str, start: int, end: int, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, media_type: Optional[str] = None):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(max(0, end - start + 1))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        count = self.end - self.start + 1
+        if scope["method"].upper() == "HEAD" or count <= 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        if "http.response.zerocopysend" in (scope.get("extensions") or {}):
+            with open(self.path, "rb") as f:
+                await send({"type": "http.response.zerocopysend", "file": f,
+                            "offset": self.start, "count": count, "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.start)
+            remaining = count
+            while remaining > 0:
+                chunk = await f.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                # file bị cắt ngắn giữa chừng: đóng body cho đúng giao thức
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def deliver(request: Request, key: str, prefix: str = MOUNT_PREFIX) -> Response:
+    key = safe_key(key, prefix)
+    storage = get_storage()
+
+    if storage.name != "local":
+        return RedirectResponse(storage.url(key), status_code=307, headers={"Cache-Control": "private, max-age=60"})
+
+    # chốt chặn thứ 2: path thật (đã resolve symlink) phải nằm trong thư mục media
+    path = storage.path(key).resolve()
+    if not path.is_relative_to((storage.root / prefix).resolve()):
+        raise HTTPException(404, "Not found")
+
+    sha = content_hash_from_key(key)
+    return deliver_file(request, str(path), key=key,
+                        etag=f'"{sha}"' if sha else None, immutable=bool(sha))
+
+
+def deliver_file(request: Request, path: str, *, key: Optional[str] = None,
+                 etag: Optional[str] = None, immutable: bool = False) -> Response:
+    """
+    Gửi 1 file local. `key` (tương đối so với storage root) cần cho chế độ x-accel;
+    không có key thì luôn gửi inline. `etag` mặc định tính từ size + mtime.
+    """
+    settings = get_settings()
+    try:
+        st = os.stat(path)
+    except OSError:
+        raise HTTPException(404, "Not found")
+    if not stat.S_ISREG(st.st_mode):
+        raise HTTPException(404, "Not found")
+
+    etag = etag or f'"{st.st_size:x}-{st.st_mtime_ns:x}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+        "Cache-Control": CACHE_IMMUTABLE if immutable else CACHE_DEFAULT,
+        "Accept-Ranges": "bytes",
+    }
+    if is_not_modified(request.headers, etag, st.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    mode = (settings.MEDIA_DELIVERY_MODE or "inline").lower()
+    if mode == "x-accel" and key:
+        # nginx tự xử lý Range / sendfile, giữ lại ETag & Cache-Control của ta
+        headers["X-Accel-Redirect"] = f"{settings.MEDIA_ACCEL_PREFIX.rstrip('/')}/{quote(key)}"
+        return Response(status_code=200, headers=headers, media_type=media_type)
+    if mode == "x-sendfile":
+        headers["X-Sendfile"] = os.path.abspath(path)
+        return Response(status_code=200, headers=headers, media_type=media_type)
+
+    size = st.st_size
+    rng = None
+    if_range = request.headers.get("if-range")
+    # If-Range không khớp -> file đã đổi, trả cả file thay vì ghép nhầm byte
+    if if_range is None or if_range.strip() in (etag, headers["Last-Modified"]):
+        try:
+            rng = parse_range(request.headers.get("range"), size)
+        except ValueError:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", **headers})
+    if rng:
+        start, end = rng
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return RangeFileResponse(path, start, end, status_code=206, headers=headers, media_type=media_type)
+    return RangeFileResponse(path, 0, size - 1, status_code=200, headers=headers, media_type=media_type)
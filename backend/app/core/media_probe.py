@@ -0,0 +1,89 @@
+# app/core/media_probe.py
+"""
+ffprobe -> dict đã chuẩn hoá (duration, kích thước, codec, bitrate, fps, rotation).
+Hàm ở đây là blocking (subprocess); gọi qua asyncio.to_thread từ code async.
+"""
+import os
+import json
+import subprocess
+from fractions import Fraction
+from typing import Any, Dict, Optional
+
+FFPROBE_BIN = os.getenv("FFPROBE_BIN", "ffprobe")
+PROBE_TIMEOUT = 60
+
+
+def _fps(rate: Optional[str]) -> Optional[float]:
+    try:
+        val = float(Fraction(rate)) if rate and rate != "0/0" else None
+    except (ValueError, ZeroDivisionError):
+        return None
+    return round(val, 3) if val else None
+
+
+def _int(val: Any) -> Optional[int]:
+    try:
+        return int(float(val))
+    except (TypeError, ValueError):
+        return None
+
+
+def _rotation(stream: Dict[str, Any]) -> int:
+    # ffmpeg cũ: tags.rotate; ffmpeg >= 5: side_data_list[].rotation (display matrix)
+    rot = _int((stream.get("tags") or {}).get("rotate"))
+    if rot is None:
+        for sd in stream.get("side_data_list") or []:
+            if "rotation" in sd:
+                rot = _int(sd["rotation"])
+                break
+    return (rot or 0) % 360
+
+
+def _container(format_name: str, path: str) -> str:
+    # format_name kiểu "mov,mp4,m4a,3gp,3g2,mj2" -> ưu tiên đuôi file nếu nằm trong danh sách
+    names = [n for n in (format_name or "").split(",") if n]
+    ext = os.path.splitext(path)[1].lstrip(".").lower()
+    if ext and ext in names:
+        return ext
+    return names[0] if names else (ext or "unknown")
+
+
+def parse_probe(data: Dict[str, Any], path: str = "") -> Dict[str, Any]:
+    fmt = data.get("format") or {}
+    streams = data.get("streams") or []
+    v = next((s for s in streams if s.get("codec_type") == "video"
+              and not (s.get("disposition") or {}).get("attached_pic")), None)
+    a = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    width = _int(v.get("width")) if v else None
+    height = _int(v.get("height")) if v else None
+    rotation = _rotation(v) if v else 0
+    # kích thước hiển thị (đã xoay) mới là thứ platform kiểm tra (9:16, 1080x1920...)
+    disp_w, disp_h = (height, width) if rotation in (90, 270) else (width, height)
+    duration = fmt.get("duration") or (v or {}).get("duration")
+
+    return {
+        "duration": round(float(duration), 3) if duration else None,
+        "width": disp_w,
+        "height": disp_h,
+        "resolution": f"{disp_w}x{disp_h}" if disp_w and disp_h else None,
+        "format": _container(fmt.get("format_name", ""), path),
+        "video_codec": (v or {}).get("codec_name"),
+        "audio_codec": (a or {}).get("codec_name"),
+        "bitrate": _int(fmt.get("bit_rate")) or _int((v or {}).get("bit_rate")),
+        "fps": _fps((v or {}).get("avg_frame_rate")) or _fps((v or {}).get("r_frame_rate")),
+        "rotation": rotation,
+        "pix_fmt": (v or {}).get("pix_fmt"),
+        "audio_sample_rate": _int((a or {}).get("sample_rate")),
+        "audio_channels": _int((a or {}).get("channels")),
+    }
+
+
+def probe_file(path: str) -> Dict[str, Any]:
+    proc = subprocess.run(
+        [FFPROBE_BIN, "-v", "error", "-print_format", "json", "-show_format", "-show_streams", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=PROBE_TIMEOUT,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {proc.stderr.decode(errors='ignore')[:1000]}")
+    return parse_probe(json.loads(proc.stdout or b"{}"), path)
@@ -0,0 +1,72 @@
+# app/core/oauth_state.py
+"""
+Lưu state/PKCE verifier giữa /oauth/{provider}/start và /callback.
+
+- Redis (REDIS_URL): SET ... EX OAUTH_STATE_TTL_SECONDS, lấy ra bằng GETDEL -> callback rơi vào
+  worker/node nào cũng được, state chỉ dùng được một lần, Redis tự xoá khi hết hạn
+- không có Redis (dev 1 process): OrderedDict trong process. TTL cố định nên thứ tự thêm vào cũng là
+  thứ tự hết hạn -> chỉ cần cắt đầu danh sách, không quét toàn bộ
+"""
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.settings import get_settings
+from app.core import redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "oauth:state:"
+MAX_ENTRIES = 10000
+
+_mem: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _ttl() -> int:
+    return int(get_settings().OAUTH_STATE_TTL_SECONDS)
+
+
+def _purge(now: float) -> None:
+    while _mem:
+        expires_at = next(iter(_mem.values()))[0]
+        if expires_at > now and len(_mem) <= MAX_ENTRIES:
+            break
+        _mem.popitem(last=False)
+
+
+async def save(state: str, data: Dict[str, Any]) -> None:
+    r = redis_client.get_redis()
+    if r is not None:
+        try:
+            await r.set(KEY_PREFIX + state, json.dumps(data), ex=_ttl())
+            return
+        except Exception as e:
+            redis_client.mark_down(e)
+    with _lock:
+        now = time.monotonic()
+        _purge(now)
+        _mem[state] = (now + _ttl(), data)
+
+
+async def consume(state: str) -> Optional[Dict[str, Any]]:
+    """Lấy và xoá state (dùng 1 lần). None nếu không có / đã hết hạn."""
+    r = redis_client.get_redis()
+    if r is not None:
+        try:
+            raw = await r.getdel(KEY_PREFIX + state)
+            if raw is not None:
+                return json.loads(raw)
+        except Exception as e:
+            redis_client.mark_down(e)
+    # state có thể được lưu local lúc Redis tạm lỗi
+    with _lock:
+        now = time.monotonic()
+        _purge(now)
+        rec = _mem.pop(state, None)
+    if rec is None or rec[0] <= now:
+        return None
+    return rec[1]
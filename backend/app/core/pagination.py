@@ -0,0 +1,69 @@
+# app/core/pagination.py
+"""
+Keyset (cursor) pagination dùng chung cho các list endpoint.
+
+Cursor là chuỗi opaque (base64url của JSON [created_at_iso, id]); client chỉ
+việc gửi lại `next_cursor` của trang trước. Truy vấn dùng so sánh bộ
+`(created_at, id) < (:ts, :id)` nên Postgres đi thẳng vào composite index
+`(created_at, id)` — chi phí mỗi trang ~ O(page size), không phụ thuộc độ sâu.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text, tuple_
+from sqlalchemy.orm import Query, Session
+
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(created_at: datetime, id_: int) -> str:
+    raw = json.dumps([created_at.isoformat() if created_at else None, id_], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        ts, id_ = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        return (datetime.fromisoformat(ts) if ts else None), int(id_)
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
+
+
+def paginate_keyset(query: Query, model: Any, *, limit: int, cursor: Optional[str] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    Trả (items, next_cursor), sắp xếp mới nhất trước theo (created_at, id).
+    Lấy dư 1 dòng để biết còn trang sau hay không (không cần COUNT).
+    """
+    limit = max(1, min(int(limit or 1), MAX_PAGE_SIZE))
+    if cursor:
+        ts, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < tuple_(ts, last_id))
+    rows = (
+        query.order_by(model.created_at.desc(), model.id.desc())
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more and rows else None
+    return rows, next_cursor
+
+
+def estimate_count(db: Session, table_name: str) -> Optional[int]:
+    """
+    Ước lượng số dòng từ thống kê planner (pg_class.reltuples) thay vì COUNT(*).
+    Trả None nếu không phải Postgres hoặc bảng chưa được ANALYZE.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return None
+    val = db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"),
+        {"t": table_name},
+    ).scalar()
+    if val is None or val < 0:
+        return None
+    return int(val)
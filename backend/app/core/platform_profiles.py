@@ -0,0 +1,165 @@
+# app/core/platform_profiles.py
+"""
+Thông số video từng nền tảng chấp nhận + tham số ffmpeg để transcode về đúng thông số.
+
+check_video() so metadata đã probe (cột videos.width/height/duration/...) với profile
+trước khi publish -> không tốn băng thông upload file sẽ bị từ chối.
+Số liệu theo tài liệu công khai của từng nền tảng; chỉnh ở đây khi họ đổi spec.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core import video_workers
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    name: str
+    platform: str
+    # giới hạn chấp nhận
+    max_width: int
+    max_height: int
+    min_aspect: float                 # width / height
+    max_aspect: float
+    video_codecs: Tuple[str, ...]
+    audio_codecs: Tuple[str, ...]
+    max_bitrate: int                  # bit/s (tổng)
+    min_duration: float               # giây
+    max_duration: float
+    max_size: int                     # byte
+    max_fps: float
+    containers: Tuple[str, ...] = ("mp4", "mov")
+    # đích khi transcode
+    target_width: int = 1080
+    target_height: int = 1920
+    crf: int = 21
+    preset: str = "medium"
+    audio_bitrate: str = "128k"
+
+    @property
+    def canvas(self) -> Tuple[int, int]:
+        return self.target_width, self.target_height
+
+
+MB = 1024 * 1024
+
+PROFILES: Dict[str, EncodingProfile] = {
+    "instagram_reels": EncodingProfile(
+        name="instagram_reels", platform="instagram",
+        max_width=1920, max_height=1920, min_aspect=0.01, max_aspect=10.0,
+        video_codecs=("h264", "hevc"), audio_codecs=("aac",),
+        max_bitrate=25_000_000, min_duration=3, max_duration=15 * 60,
+        max_size=300 * MB, max_fps=60, containers=("mp4", "mov"),
+        target_width=1080, target_height=1920, crf=21,
+    ),
+    "tiktok": EncodingProfile(
+        name="tiktok", platform="tiktok",
+        max_width=4096, max_height=4096, min_aspect=0.5, max_aspect=2.0,
+        video_codecs=("h264", "hevc", "vp8", "vp9"), audio_codecs=("aac", "mp3", "opus"),
+        max_bitrate=25_000_000, min_duration=3, max_duration=10 * 60,
+        max_size=4096 * MB, max_fps=60, containers=("mp4", "mov", "webm"),
+        target_width=1080, target_height=1920, crf=21,
+    ),
+    "youtube": EncodingProfile(
+        name="youtube", platform="youtube",
+        max_width=7680, max_height=4320, min_aspect=0.1, max_aspect=10.0,
+        video_codecs=("h264", "hevc", "vp9", "av1", "mpeg4"), audio_codecs=("aac", "mp3", "opus", "vorbis", "ac3"),
+        max_bitrate=85_000_000, min_duration=1, max_duration=12 * 3600,
+        max_size=256 * 1024 * MB, max_fps=60, containers=("mp4", "mov", "webm", "matroska", "avi"),
+        target_width=1920, target_height=1080, crf=19, preset="slow",
+    ),
+    "facebook_video": EncodingProfile(
+        name="facebook_video", platform="facebook",
+        max_width=4096, max_height=4096, min_aspect=0.5, max_aspect=2.0,
+        video_codecs=("h264", "hevc"), audio_codecs=("aac",),
+        max_bitrate=40_000_000, min_duration=1, max_duration=240 * 60,
+        max_size=10 * 1024 * MB, max_fps=60, containers=("mp4", "mov"),
+        target_width=1920, target_height=1080, crf=21,
+    ),
+}
+
+# platform -> profile mặc định khi đăng video
+PLATFORM_PROFILE: Dict[str, str] = {
+    "instagram": "instagram_reels",
+    "tiktok": "tiktok",
+    "youtube": "youtube",
+    "facebook": "facebook_video",
+}
+
+
+def profile_for(platform: str) -> Optional[EncodingProfile]:
+    name = PLATFORM_PROFILE.get(getattr(platform, "value", platform) or "")
+    return PROFILES.get(name) if name else None
+
+
+def check_video(profile: EncodingProfile, meta: Dict[str, Any]) -> Tuple[List[str], List[str]]:
+    """
+    meta: duration, width, height, format, video_codec, audio_codec, bitrate, fps, size.
+    Trả (fixable, fatal): lỗi transcode được / lỗi không tự sửa được (thời lượng...).
+    Thiếu metadata thì bỏ qua check tương ứng (không chặn oan).
+    """
+    fixable: List[str] = []
+    fatal: List[str] = []
+    w, h = meta.get("width"), meta.get("height")
+    dur = meta.get("duration")
+
+    if dur is not None:
+        if dur < profile.min_duration:
+            fatal.append(f"duration {dur:.1f}s < min {profile.min_duration:.0f}s")
+        elif dur > profile.max_duration:
+            # cắt ngắn sẽ làm mất nội dung -> để người dùng tự trim
+            fatal.append(f"duration {dur:.1f}s > max {profile.max_duration:.0f}s")
+    if w and h:
+        if w > profile.max_width or h > profile.max_height:
+            fixable.append(f"resolution {w}x{h} > max {profile.max_width}x{profile.max_height}")
+        ratio = w / h
+        if not (profile.min_aspect <= ratio <= profile.max_aspect):
+            fixable.append(f"aspect {ratio:.2f} outside [{profile.min_aspect}, {profile.max_aspect}]")
+    if meta.get("video_codec") and meta["video_codec"] not in profile.video_codecs:
+        fixable.append(f"video codec {meta['video_codec']} not in {list(profile.video_codecs)}")
+    if meta.get("audio_codec") and meta["audio_codec"] not in profile.audio_codecs:
+        fixable.append(f"audio codec {meta['audio_codec']} not in {list(profile.audio_codecs)}")
+    if meta.get("format") and meta["format"] not in profile.containers:
+        fixable.append(f"container {meta['format']} not in {list(profile.containers)}")
+    if meta.get("bitrate") and meta["bitrate"] > profile.max_bitrate:
+        fixable.append(f"bitrate {meta['bitrate']} > max {profile.max_bitrate}")
+    if meta.get("fps") and meta["fps"] > profile.max_fps + 0.5:
+        fixable.append(f"fps {meta['fps']} > max {profile.max_fps}")
+    if meta.get("size") and meta["size"] > profile.max_size:
+        fixable.append(f"size {meta['size']} > max {profile.max_size}")
+    return fixable, fatal
+
+
+def transcode_args(profile: EncodingProfile, meta: Dict[str, Any]) -> List[str]:
+    """Tham số output ffmpeg (sau -i) để ra file đạt profile."""
+    w, h = meta.get("width"), meta.get("height")
+    filters: List[str] = []
+    ratio = (w / h) if w and h else None
+    if ratio is not None and not (profile.min_aspect <= ratio <= profile.max_aspect):
+        # sai tỉ lệ: thu vào canvas đích + pad viền đen (không crop mất nội dung)
+        tw, th = profile.canvas
+        filters.append(f"scale={tw}:{th}:force_original_aspect_ratio=decrease")
+        filters.append(f"pad={tw}:{th}:(ow-iw)/2:(oh-ih)/2")
+    else:
+        # giữ tỉ lệ, chỉ thu nhỏ khi vượt giới hạn; cạnh chẵn cho yuv420p
+        filters.append(f"scale='min(iw,{profile.max_width})':'min(ih,{profile.max_height})'"
+                       f":force_original_aspect_ratio=decrease:force_divisible_by=2")
+    if meta.get("fps") and meta["fps"] > profile.max_fps + 0.5:
+        filters.append(f"fps={profile.max_fps:g}")
+    filters.append("format=yuv420p")
+
+    # giới hạn bitrate theo cả max_bitrate lẫn max_size / duration (chừa 5% + audio)
+    maxrate = profile.max_bitrate
+    dur = meta.get("duration")
+    if dur:
+        maxrate = min(maxrate, int(profile.max_size * 8 / dur * 0.95) - 192_000)
+    maxrate = max(maxrate, 500_000)
+
+    return [
+        "-vf", ",".join(filters),
+        "-c:v", "libx264", "-profile:v", "high", "-preset", profile.preset, "-crf", str(profile.crf),
+        "-threads", str(video_workers.threads_per_job()),
+        "-maxrate", str(maxrate), "-bufsize", str(maxrate * 2),
+        "-c:a", "aac", "-b:a", profile.audio_bitrate, "-ar", "48000",
+        "-movflags", "+faststart",
+    ]
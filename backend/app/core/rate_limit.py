@@ -0,0 +1,324 @@
+# app/core/rate_limit.py
+"""
+Rate limit phía client cho API các nền tảng (token bucket).
+
+Mỗi request lấy token từ tối đa 3 bucket:
+    rl:<platform>:app                       toàn app (IG dùng chung app Facebook)
+    rl:<platform>:ch:<external_id>          từng page / tài khoản
+    rl:<platform>:ch:<external_id>:<class>  từng loại endpoint của page (publish, upload...)
+    (không có channel -> rl:<platform>:ep:<class>)
+Chỉ bucket có cấu hình trong LIMITS mới được dùng.
+
+Bucket tự điều chỉnh theo phản hồi của nền tảng:
+- X-App-Usage / X-Page-Usage / X-Business-Use-Case-Usage (Graph API, % đã dùng): vượt
+  RATE_LIMIT_SLOWDOWN_PERCENT -> giảm tốc độ nạp tuyến tính, 100% -> chặn tới khi
+  estimated_time_to_regain_access
+- 429 / mã lỗi throttle (4, 17, 32, 613, 800xx, rate_limit_exceeded) -> chặn theo Retry-After
+State nằm trên Redis (Lua, atomic, chia sẻ giữa các worker); không có Redis -> state trong process.
+"""
+import json
+import time
+import asyncio
+import logging
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.settings import get_settings
+from app.core import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Limit:
+    capacity: float      # burst tối đa
+    per_seconds: float   # thời gian nạp đầy capacity
+
+    @property
+    def rate(self) -> float:
+        return self.capacity / self.per_seconds
+
+
+# Số liệu theo tài liệu công khai / quota mặc định; headers usage sẽ siết thêm khi cần.
+LIMITS: Dict[str, Dict[str, Limit]] = {
+    "facebook": {
+        "app": Limit(200, 60),
+        "channel": Limit(100, 60),
+        "publish": Limit(30, 60),
+    },
+    "instagram": {
+        "channel": Limit(200, 3600),
+        "publish": Limit(50, 86400),   # content publishing limit / 24h
+    },
+    "tiktok": {
+        "app": Limit(600, 60),
+        "channel": Limit(120, 60),
+        "publish": Limit(6, 60),       # /post/publish/* : 6 request/phút/user token
+    },
+    "youtube": {
+        "app": Limit(10000, 86400),    # quota unit/ngày; request truyền cost theo YOUTUBE_COSTS
+    },
+}
+# bucket app dùng chung (Instagram Graph API tính vào app Facebook)
+APP_OF = {"instagram": "facebook"}
+YOUTUBE_COSTS = {"read": 1, "write": 50, "upload": 1600}
+
+# Graph API error code báo throttle; 4/613 là cấp app, còn lại cấp page/tài khoản
+APP_THROTTLE_CODES = {4, 613}
+THROTTLE_CODES = APP_THROTTLE_CODES | {17, 32, 80001, 80002, 80004, 80005, 80006, 80008, 80014}
+DEFAULT_BLOCK_SECONDS = 60.0
+SCALE_TTL_SECONDS = 300.0   # giảm tốc theo header hết hiệu lực nếu không có header mới
+
+_ACQUIRE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i, key in ipairs(KEYS) do
+  local cap = tonumber(ARGV[i * 3 - 1])
+  local rate = tonumber(ARGV[i * 3])
+  local h = redis.call('HMGET', key, 'tokens', 'ts', 'scale', 'scale_until', 'blocked_until')
+  local tk = tonumber(h[1]) or cap
+  local ts = tonumber(h[2]) or now
+  if (tonumber(h[4]) or 0) > now then rate = rate * (tonumber(h[3]) or 1) end
+  tk = math.min(cap, tk + math.max(0, now - ts) * rate)
+  tokens[i] = tk
+  local need = math.min(cost, cap)
+  local w = math.max(0, (tonumber(h[5]) or 0) - now)
+  if tk < need then w = math.max(w, (need - tk) / rate) end
+  if w > wait then wait = w end
+end
+for i, key in ipairs(KEYS) do
+  local tk = tokens[i]
+  if wait <= 0 then tk = tk - math.min(cost, tonumber(ARGV[i * 3 - 1])) end
+  redis.call('HSET', key, 'tokens', tk, 'ts', now)
+  redis.call('EXPIRE', key, tonumber(ARGV[i * 3 + 1]))
+end
+return tostring(wait)
+"""
+
+_PENALIZE_LUA = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local scale = tonumber(ARGV[1])
+local block = tonumber(ARGV[2])
+if scale >= 0 then
+  redis.call('HSET', KEYS[1], 'scale', scale, 'scale_until', now + tonumber(ARGV[3]))
+end
+if block > 0 then
+  local cur = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+  redis.call('HSET', KEYS[1], 'blocked_until', math.max(cur, now + block))
+end
+redis.call('EXPIRE', KEYS[1], math.ceil(math.max(block, tonumber(ARGV[3]), tonumber(ARGV[4]))))
+return 1
+"""
+
+
+class RateLimited(HTTPException):
+    """Phải chờ lâu hơn RATE_LIMIT_MAX_WAIT_SECONDS -> trả 429 cho caller tự lên lịch lại."""
+
+    def __init__(self, platform: str, retry_after: float):
+        self.platform = platform
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=429,
+            detail={"error": "rate_limited", "platform": platform, "retry_after": round(retry_after, 1)},
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))},
+        )
+
+
+@dataclass
+class _Bucket:
+    tokens: float
+    ts: float
+    scale: float = 1.0
+    scale_until: float = 0.0
+    blocked_until: float = 0.0
+
+
+def _json_header(headers: httpx.Headers, name: str) -> Any:
+    raw = headers.get(name)
+    if not raw:
+        return None
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+
+def _usage_pct(usage: Dict[str, Any]) -> float:
+    vals = [usage.get(k) for k in ("call_count", "total_time", "total_cputime", "acc_id_util_pct")]
+    return max([float(v) for v in vals if isinstance(v, (int, float))] or [0.0])
+
+
+def _retry_after(headers: httpx.Headers) -> Optional[float]:
+    try:
+        return float(headers.get("retry-after") or "") or None
+    except ValueError:
+        return None
+
+
+def _error_code(resp: httpx.Response) -> Any:
+    if resp.status_code < 400:
+        return None
+    try:
+        err = resp.json().get("error")
+    except Exception:
+        return None
+    return err.get("code") if isinstance(err, dict) else None
+
+
+class RateLimiter:
+    def __init__(self):
+        self.settings = get_settings()
+        self._mem: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    # ---------- bucket ----------
+    def buckets(self, platform: str, endpoint: str = "read", channel: Optional[str] = None) -> List[Tuple[str, Limit]]:
+        limits = LIMITS.get(platform) or {}
+        out = [b for b in (self._app_bucket(platform),
+                           self._channel_bucket(platform, channel) if channel else None) if b]
+        if endpoint in limits and endpoint not in ("app", "channel"):
+            scope = f"ch:{channel}" if channel else "ep"
+            out.append((f"rl:{platform}:{scope}:{endpoint}", limits[endpoint]))
+        return out
+
+    def _channel_bucket(self, platform: str, channel: str) -> Optional[Tuple[str, Limit]]:
+        lim = (LIMITS.get(platform) or {}).get("channel")
+        return (f"rl:{platform}:ch:{channel}", lim) if lim else None
+
+    def _app_bucket(self, platform: str) -> Optional[Tuple[str, Limit]]:
+        app_platform = APP_OF.get(platform, platform)
+        lim = (LIMITS.get(app_platform) or {}).get("app")
+        return (f"rl:{app_platform}:app", lim) if lim else None
+
+    # ---------- lấy token ----------
+    async def acquire(self, platform: str, endpoint: str = "read", channel: Optional[str] = None,
+                      cost: float = 1.0) -> None:
+        """Chờ tới khi mọi bucket liên quan còn token; chờ quá RATE_LIMIT_MAX_WAIT_SECONDS -> RateLimited."""
+        if not self.settings.RATE_LIMIT_ENABLED:
+            return
+        buckets = self.buckets(platform, endpoint, channel)
+        if not buckets:
+            return
+        deadline = time.monotonic() + float(self.settings.RATE_LIMIT_MAX_WAIT_SECONDS)
+        while True:
+            wait = await self._take(buckets, cost)
+            if wait <= 0:
+                return
+            if time.monotonic() + wait > deadline:
+                raise RateLimited(platform, wait)
+            # ngủ từng đoạn ngắn: worker khác có thể đã nhận header mới nới/siết bucket
+            await asyncio.sleep(min(wait, 5.0))
+
+    async def _take(self, buckets: List[Tuple[str, Limit]], cost: float) -> float:
+        r = redis_client.get_redis()
+        if r is not None:
+            args: List[Any] = [cost]
+            for _, lim in buckets:
+                args += [lim.capacity, lim.rate, int(lim.per_seconds * 2) + 60]
+            try:
+                return float(await r.eval(_ACQUIRE_LUA, len(buckets), *[k for k, _ in buckets], *args))
+            except Exception as e:
+                redis_client.mark_down(e)
+        return self._take_local(buckets, cost)
+
+    def _take_local(self, buckets: List[Tuple[str, Limit]], cost: float) -> float:
+        with self._lock:
+            now = time.time()
+            wait = 0.0
+            for key, lim in buckets:
+                b = self._mem.setdefault(key, _Bucket(tokens=lim.capacity, ts=now))
+                rate = lim.rate * (b.scale if b.scale_until > now else 1.0)
+                b.tokens = min(lim.capacity, b.tokens + max(0.0, now - b.ts) * rate)
+                b.ts = now
+                need = min(cost, lim.capacity)
+                w = max(0.0, b.blocked_until - now)
+                if b.tokens < need:
+                    w = max(w, (need - b.tokens) / rate)
+                wait = max(wait, w)
+            if wait <= 0:
+                for key, lim in buckets:
+                    self._mem[key].tokens -= min(cost, lim.capacity)
+            return wait
+
+    # ---------- phản hồi từ nền tảng ----------
+    async def _penalize(self, bucket: Optional[Tuple[str, Limit]], scale: Optional[float] = None,
+                        block: float = 0.0) -> None:
+        if bucket is None or (scale is None and block <= 0):
+            return
+        key, lim = bucket
+        r = redis_client.get_redis()
+        if r is not None:
+            try:
+                await r.eval(_PENALIZE_LUA, 1, key, -1 if scale is None else scale, block,
+                             SCALE_TTL_SECONDS, int(lim.per_seconds * 2) + 60)
+                return
+            except Exception as e:
+                redis_client.mark_down(e)
+        with self._lock:
+            now = time.time()
+            b = self._mem.setdefault(key, _Bucket(tokens=lim.capacity, ts=now))
+            if scale is not None:
+                b.scale, b.scale_until = scale, now + SCALE_TTL_SECONDS
+            if block > 0:
+                b.blocked_until = max(b.blocked_until, now + block)
+
+    def _scale(self, pct: float) -> float:
+        start = float(self.settings.RATE_LIMIT_SLOWDOWN_PERCENT)
+        if pct < start:
+            return 1.0
+        return max(0.05, (100.0 - pct) / max(1.0, 100.0 - start))
+
+    async def observe(self, platform: str, resp: httpx.Response, channel: Optional[str] = None) -> bool:
+        """Cập nhật bucket theo headers/ lỗi của response. True = response bị throttle (nên thử lại)."""
+        if not self.settings.RATE_LIMIT_ENABLED:
+            return False
+        headers = resp.headers
+        app_bucket = self._app_bucket(platform)
+        regain = 0.0
+
+        app_usage = _json_header(headers, "x-app-usage")
+        if isinstance(app_usage, dict):
+            pct = _usage_pct(app_usage)
+            await self._penalize(app_bucket, self._scale(pct), DEFAULT_BLOCK_SECONDS if pct >= 100 else 0.0)
+
+        page_usage = _json_header(headers, "x-page-usage")
+        if isinstance(page_usage, dict) and channel:
+            pct = _usage_pct(page_usage)
+            await self._penalize(self._channel_bucket(platform, channel), self._scale(pct),
+                                 DEFAULT_BLOCK_SECONDS if pct >= 100 else 0.0)
+
+        buc = _json_header(headers, "x-business-use-case-usage")
+        if isinstance(buc, dict):
+            for obj_id, entries in buc.items():
+                entries = [e for e in (entries or []) if isinstance(e, dict)]
+                if not entries:
+                    continue
+                pct = max(_usage_pct(e) for e in entries)
+                wait = max(float(e.get("estimated_time_to_regain_access") or 0) for e in entries) * 60
+                if str(obj_id) == str(channel):
+                    regain = max(regain, wait)
+                await self._penalize(self._channel_bucket(platform, str(obj_id)), self._scale(pct), wait)
+
+        code = _error_code(resp)
+        throttled = resp.status_code == 429 or code in THROTTLE_CODES or code == "rate_limit_exceeded"
+        if throttled:
+            block = _retry_after(headers) or regain or DEFAULT_BLOCK_SECONDS
+            target = self._channel_bucket(platform, channel) if channel and code not in APP_THROTTLE_CODES else None
+            await self._penalize(target or app_bucket, block=block)
+            logger.warning(f"{platform} throttled (status={resp.status_code}, code={code}), backing off {block:.0f}s")
+        return throttled
+
+
+@lru_cache
+def get_limiter() -> RateLimiter:
+    return RateLimiter()
+
@@ -0,0 +1,55 @@
+# app/core/redis_client.py
+"""
+Redis dùng chung giữa các worker (rate limit, cache...). Không bắt buộc:
+thiếu package `redis` hoặc server không kết nối được -> get_redis() trả None,
+caller tự fallback về state trong process.
+"""
+import time
+import logging
+from typing import Any, Optional
+
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+try:  # optional dependency
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover
+    aioredis = None
+
+# lỗi kết nối -> tạm bỏ Redis trong khoảng này rồi thử lại
+RETRY_AFTER_SECONDS = 30.0
+
+_client: Optional[Any] = None
+_down_until = 0.0
+
+
+def get_redis() -> Optional[Any]:
+    """Client redis.asyncio dùng chung, hoặc None nếu không có / đang lỗi."""
+    global _client
+    if aioredis is None or time.monotonic() < _down_until:
+        return None
+    url = get_settings().REDIS_URL
+    if not url:
+        return None
+    if _client is None:
+        _client = aioredis.from_url(url, socket_timeout=1.0, socket_connect_timeout=1.0)
+    return _client
+
+
+def mark_down(err: Exception) -> None:
+    """Caller gọi khi lệnh Redis lỗi kết nối: fallback local trong RETRY_AFTER_SECONDS."""
+    global _down_until
+    if time.monotonic() >= _down_until:
+        logger.warning(f"Redis unavailable, using in-process fallback for {RETRY_AFTER_SECONDS:.0f}s: {err}")
+    _down_until = time.monotonic() + RETRY_AFTER_SECONDS
+
+
+async def close() -> None:
+    global _client
+    if _client is not None:
+        try:
+            await _client.aclose()
+        except Exception:
+            pass
+        _client = None
@@ -0,0 +1,169 @@
+# app/core/schema_upgrades.py
+"""
+DDL idempotent chạy sau Base.metadata.create_all().
+
+create_all() chỉ tạo bảng chưa tồn tại, không thêm index/cột mới vào bảng cũ.
+Các câu lệnh ở đây đều dạng IF NOT EXISTS / CREATE OR REPLACE nên chạy lại mỗi
+lần khởi động là an toàn. Chỉ áp dụng cho PostgreSQL.
+"""
+import logging
+from typing import List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core import text_search
+
+logger = logging.getLogger(__name__)
+
+PG_UPGRADES: List[str] = [
+    # Keyset pagination (created_at, id)
+    "CREATE INDEX IF NOT EXISTS ix_posts_created_at_id ON posts (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_created_at_id ON videos (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_media_assets_created_at_id ON media_assets (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_channels_created_at_id ON channels (created_at, id)",
+
+    # Search: pg_trgm + unaccent (tiếng Việt: "Khuyến mãi" ~ "khuyen mai", "đ" -> "d")
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() là STABLE nên không index được -> bọc lại thành IMMUTABLE
+    """
+    CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+    LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS
+    $$ SELECT public.unaccent('public.unaccent'::regdictionary, lower($1)) $$
+    """,
+    "ALTER TABLE posts ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    "ALTER TABLE channels ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """
+    CREATE OR REPLACE FUNCTION posts_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(f_unaccent(NEW.caption), '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(f_unaccent(NEW.hashtags), '')), 'B');
+        RETURN NEW;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION videos_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(f_unaccent(NEW.title), '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(f_unaccent(NEW.description), '')), 'B');
+        RETURN NEW;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION channels_search_vector_update() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(f_unaccent(NEW.name), '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(f_unaccent(NEW.username), '')), 'B');
+        RETURN NEW;
+    END $$
+    """,
+    "DROP TRIGGER IF EXISTS trg_posts_search_vector ON posts",
+    "CREATE TRIGGER trg_posts_search_vector BEFORE INSERT OR UPDATE OF caption, hashtags ON posts "
+    "FOR EACH ROW EXECUTE FUNCTION posts_search_vector_update()",
+    "DROP TRIGGER IF EXISTS trg_videos_search_vector ON videos",
+    "CREATE TRIGGER trg_videos_search_vector BEFORE INSERT OR UPDATE OF title, description ON videos "
+    "FOR EACH ROW EXECUTE FUNCTION videos_search_vector_update()",
+    "DROP TRIGGER IF EXISTS trg_channels_search_vector ON channels",
+    "CREATE TRIGGER trg_channels_search_vector BEFORE INSERT OR UPDATE OF name, username ON channels "
+    "FOR EACH ROW EXECUTE FUNCTION channels_search_vector_update()",
+    # backfill dòng cũ (chỉ chạy thực sự ở lần đầu; các lần sau WHERE rỗng)
+    "UPDATE posts SET caption = caption WHERE search_vector IS NULL",
+    "UPDATE videos SET title = title WHERE search_vector IS NULL",
+    "UPDATE channels SET name = name WHERE search_vector IS NULL",
+    "CREATE INDEX IF NOT EXISTS ix_posts_search_vector ON posts USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_search_vector ON videos USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_channels_search_vector ON channels USING gin (search_vector)",
+    # Trigram trên biểu thức f_unaccent(col) -> LIKE '%q%' dùng được index
+    "CREATE INDEX IF NOT EXISTS ix_posts_caption_trgm ON posts USING gin (f_unaccent(caption) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_posts_hashtags_trgm ON posts USING gin (f_unaccent(hashtags) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_title_trgm ON videos USING gin (f_unaccent(title) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_description_trgm ON videos USING gin (f_unaccent(description) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_media_assets_path_trgm ON media_assets USING gin (f_unaccent(path) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_channels_name_trgm ON channels USING gin (f_unaccent(name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_channels_username_trgm ON channels USING gin (f_unaccent(username) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (f_unaccent(username) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (f_unaccent(email) gin_trgm_ops)",
+
+    # Hashtag: prefix autocomplete + tra post theo tag (bảng mới do create_all tạo)
+    "CREATE INDEX IF NOT EXISTS ix_hashtags_tag_prefix ON hashtags (tag text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_post_hashtags_hashtag_id_post_id ON post_hashtags (hashtag_id, post_id)",
+
+    # Content-addressed storage: row trỏ tới media_blobs qua sha256
+    "ALTER TABLE media_assets ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+    "CREATE INDEX IF NOT EXISTS ix_media_assets_content_hash ON media_assets (content_hash)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_content_hash ON videos (content_hash)",
+
+    # ffprobe metadata
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS width integer",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS height integer",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS video_codec varchar(32)",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS audio_codec varchar(32)",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS bitrate bigint",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS fps double precision",
+    "ALTER TABLE videos ADD COLUMN IF NOT EXISTS rotation integer",
+    "CREATE INDEX IF NOT EXISTS ix_videos_duration ON videos (duration)",
+    "CREATE INDEX IF NOT EXISTS ix_videos_width_height ON videos (width, height)",
+
+    # Publish dispatcher: hoãn + thử lại target khi nền tảng lỗi tạm thời
+    "ALTER TABLE post_targets ADD COLUMN IF NOT EXISTS attempts integer NOT NULL DEFAULT 0",
+    "CREATE INDEX IF NOT EXISTS ix_post_targets_status_scheduled_time ON post_targets (status, scheduled_time)",
+
+    # Refresh token nền (services/token_refresh_service.py)
+    "CREATE INDEX IF NOT EXISTS ix_channels_token_expires_at ON channels (token_expires_at) "
+    "WHERE token_expires_at IS NOT NULL",
+
+    # Bulk upsert channel (ON CONFLICT cần unique index). Bảng cũ có (platform, external_id) trùng
+    # thì lệnh này lỗi và được log lại -> gộp các channel trùng bằng tay rồi khởi động lại.
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_channels_platform_external_id ON channels (platform, external_id)",
+]
+
+
+# Trigger gọi f_unaccent mà hàm không tồn tại (thiếu extension unaccent) thì mọi INSERT/UPDATE
+# vào bảng đều lỗi -> khi đó gỡ trigger, tìm kiếm chuyển sang lower() LIKE (xem text_search).
+DROP_SEARCH_TRIGGERS: List[str] = [
+    "DROP TRIGGER IF EXISTS trg_posts_search_vector ON posts",
+    "DROP TRIGGER IF EXISTS trg_videos_search_vector ON videos",
+    "DROP TRIGGER IF EXISTS trg_channels_search_vector ON channels",
+]
+
+
+def _uses_unaccent(stmt: str) -> bool:
+    # lệnh gọi f_unaccent (hàm + trigger search_vector, backfill, index trigram), trừ lệnh tạo chính f_unaccent
+    return ("f_unaccent(" in stmt and "FUNCTION f_unaccent" not in stmt) \
+        or "_search_vector_update()" in stmt or "search_vector IS NULL" in stmt
+
+
+def apply_upgrades(engine: Engine) -> None:
+    if engine.dialect.name != "postgresql":
+        return
+    unaccent = None
+    for stmt in PG_UPGRADES:
+        if _uses_unaccent(stmt):
+            if unaccent is None:
+                # f_unaccent vừa được tạo (hoặc không tạo được) ở các lệnh phía trên
+                unaccent = text_search.probe(engine)["unaccent"]
+            if not unaccent:
+                continue
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(stmt))
+        except Exception as e:
+            logger.error(f"Schema upgrade failed: {stmt[:80]}... -> {e}")
+    features = text_search.probe(engine)
+    if not features["unaccent"]:
+        logger.error("f_unaccent() is unavailable (unaccent extension missing?): "
+                     "search triggers removed, text search falls back to case-insensitive LIKE")
+        for stmt in DROP_SEARCH_TRIGGERS:
+            try:
+                with engine.begin() as conn:
+                    conn.execute(text(stmt))
+            except Exception as e:
+                logger.error(f"Schema upgrade failed: {stmt[:80]}... -> {e}")
+    if not features["trgm"]:
+        logger.error("pg_trgm is unavailable: search results are not ranked by similarity")
@@ -0,0 +1,141 @@
+# app/core/smart_trim.py
+"""
+Trim chính xác tới frame mà không re-encode cả clip.
+
+    [start ... K1) re-encode  |  [K1 ... K2) copy stream  |  [K2 ... end) re-encode
+
+K1 = keyframe đầu tiên >= start, K2 = keyframe cuối cùng <= end (đọc từ packet flags,
+không decode). Chỉ 2 GOP ở biên bị encode lại; phần giữa copy nguyên -> thời gian ~ stream copy.
+Các đoạn ghi ra MPEG-TS (SPS/PPS nằm in-band ở mỗi keyframe) rồi nối bằng concat demuxer;
+audio cắt 1 lần cho cả khoảng (encode aac nhanh, không bị hở ở chỗ nối).
+Chỉ áp dụng cho nguồn H.264; nguồn khác trả False để caller re-encode toàn bộ.
+Hàm ở đây là blocking; gọi từ video_workers.
+"""
+import os
+import json
+import shutil
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional
+
+from app.core.encoding import EncoderTier, video_args
+from app.core.media_probe import FFPROBE_BIN, PROBE_TIMEOUT
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+# đoạn biên ngắn hơn mức này thì bỏ (nhỏ hơn 1 frame ở 60fps)
+MIN_SEGMENT = 0.02
+
+
+def _run(args: List[str]) -> None:
+    proc = subprocess.run([FFMPEG_BIN, "-hide_banner", "-loglevel", "error", *args],
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {proc.stdout.decode(errors='ignore')[:2000]}")
+
+
+def video_stream_info(path: str) -> Dict[str, Any]:
+    """Codec/profile/pix_fmt của video stream đầu — để đoạn encode lại khớp đoạn copy."""
+    proc = subprocess.run(
+        [FFPROBE_BIN, "-v", "error", "-select_streams", "v:0", "-print_format", "json",
+         "-show_entries", "stream=codec_name,profile,pix_fmt,width,height", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=PROBE_TIMEOUT,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {proc.stderr.decode(errors='ignore')[:1000]}")
+    streams = json.loads(proc.stdout or b"{}").get("streams") or []
+    return streams[0] if streams else {}
+
+
+def keyframes(path: str) -> List[float]:
+    """pts (giây) của các keyframe video, tăng dần. Đọc packet header, không decode."""
+    proc = subprocess.run(
+        [FFPROBE_BIN, "-v", "error", "-select_streams", "v:0",
+         "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=PROBE_TIMEOUT * 5,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {proc.stderr.decode(errors='ignore')[:1000]}")
+    out: List[float] = []
+    for line in proc.stdout.decode(errors="ignore").splitlines():
+        pts, _, flags = line.partition(",")
+        if "K" in flags and pts not in ("", "N/A"):
+            out.append(float(pts))
+    return sorted(out)
+
+
+def plan(kfs: List[float], start: float, end: float) -> Optional[Dict[str, float]]:
+    """(K1, K2) cho khoảng [start, end); None nếu không có GOP đầy đủ nào nằm trong khoảng."""
+    k1 = next((k for k in kfs if k >= start - 1e-3), None)
+    k2 = next((k for k in reversed(kfs) if k <= end + 1e-3), None)
+    if k1 is None or k2 is None or k2 - k1 < MIN_SEGMENT:
+        return None
+    return {"k1": k1, "k2": k2}
+
+
+def _match_args(info: Dict[str, Any]) -> List[str]:
+    # đoạn encode lại phải cùng pix_fmt/profile với đoạn copy thì decoder mới nối mượt
+    args: List[str] = []
+    if info.get("pix_fmt"):
+        args += ["-pix_fmt", info["pix_fmt"]]
+    profile = (info.get("profile") or "").lower().replace("constrained ", "")
+    if profile in ("baseline", "main", "high"):
+        args += ["-profile:v", profile]
+    return args
+
+
+def _strip_option(args: List[str], name: str) -> List[str]:
+    i = args.index(name) if name in args else -1
+    return args if i < 0 else args[:i] + args[i + 2:]
+
+
+def smart_trim(src: str, dst: str, start: float, end: Optional[float], duration: Optional[float],
+               tier: EncoderTier) -> bool:
+    """Ghi [start, end) của src ra dst. Trả False nếu nguồn không hợp (caller tự re-encode toàn bộ)."""
+    info = video_stream_info(src)
+    if info.get("codec_name") != "h264":
+        return False
+    end = end if end is not None else duration
+    if end is None or end <= start:
+        return False
+    p = plan(keyframes(src), start, end)
+    if p is None:
+        return False
+    k1, k2 = p["k1"], p["k2"]
+
+    # -pix_fmt sau ghi đè yuv420p mặc định; -movflags chỉ dành cho mp4, đoạn ở đây là mpegts
+    enc = _strip_option(video_args(tier), "-movflags") + _match_args(info)
+    ts = ["-bsf:v", "h264_mp4toannexb", "-f", "mpegts"]
+    work = tempfile.mkdtemp(prefix="smarttrim_")
+    try:
+        parts: List[str] = []
+        if k1 - start >= MIN_SEGMENT:
+            head = os.path.join(work, "0_head.ts")
+            _run(["-ss", f"{start:.6f}", "-i", src, "-t", f"{k1 - start:.6f}", "-an", *enc, *ts, "-y", head])
+            parts.append(head)
+        mid = os.path.join(work, "1_mid.ts")
+        # seek input tới đúng keyframe K1 (+epsilon tránh làm tròn rơi về keyframe trước)
+        _run(["-ss", f"{k1 + 0.001:.6f}", "-i", src, "-t", f"{k2 - k1:.6f}", "-an",
+              "-c:v", "copy", *ts, "-y", mid])
+        parts.append(mid)
+        if end - k2 >= MIN_SEGMENT:
+            tail = os.path.join(work, "2_tail.ts")
+            _run(["-ss", f"{k2:.6f}", "-i", src, "-t", f"{end - k2:.6f}", "-an", *enc, *ts, "-y", tail])
+            parts.append(tail)
+
+        listing = os.path.join(work, "parts.txt")
+        with open(listing, "w") as f:
+            f.writelines(f"file '{part}'\n" for part in parts)
+        audio = os.path.join(work, "audio.m4a")
+        has_audio = True
+        try:
+            _run(["-ss", f"{start:.6f}", "-i", src, "-t", f"{end - start:.6f}", "-vn",
+                  "-c:a", "aac", "-b:a", tier.audio_bitrate, "-y", audio])
+        except RuntimeError:
+            has_audio = False  # nguồn không có audio
+        mux = ["-f", "concat", "-safe", "0", "-i", listing]
+        if has_audio and os.path.getsize(audio) > 0:
+            mux += ["-i", audio, "-map", "0:v", "-map", "1:a"]
+        _run([*mux, "-c", "copy", "-movflags", "+faststart", "-y", dst])
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return True
@@ -0,0 +1,310 @@
+# app/core/storage.py
+"""
+Lớp lưu trữ file dùng chung cho MediaService / VideoService / pipeline ffmpeg.
+
+Key của file chính là path đang lưu trong DB ("storage/blobs/ab/cd/<sha>.mp4"),
+nên dữ liệu cũ không phải migrate khi chuyển backend:
+- local: key = đường dẫn tương đối so với STORAGE_LOCAL_ROOT (mặc định: cha của MEDIA_ROOT)
+- s3:    key = object key trong bucket (AWS S3 / MinIO / R2 ...)
+
+ffmpeg chỉ đọc/ghi file local -> dùng local_copy() / local_output(); với local
+backend đây là no-op, với S3 là tải về / đẩy lên file tạm.
+"""
+import os
+import shutil
+import asyncio
+import logging
+import tempfile
+import mimetypes
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from pathlib import Path
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from urllib.parse import quote
+
+from app.core.settings import get_settings
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 1024 * 1024
+
+
+class StorageBackend(ABC):
+    name: str = "base"
+
+    @abstractmethod
+    def put_file(self, local_path: str, key: str, content_type: Optional[str] = None, move: bool = False) -> None:
+        """Đưa file local lên storage dưới `key`; move=True thì file nguồn bị lấy đi."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]: ...
+
+    @abstractmethod
+    def delete(self, key: str) -> None: ...
+
+    @abstractmethod
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Đọc byte [start, end] (end tính cả, None = tới hết file) theo từng chunk."""
+
+    @abstractmethod
+    def url(self, key: str, expires: Optional[int] = None) -> str:
+        """URL public (local) hoặc pre-signed (S3) để nền tảng ngoài tự tải file."""
+
+    @abstractmethod
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        """Path local đọc được của `key` trong phạm vi context."""
+
+    @contextmanager
+    def local_output(self, key: str, content_type: Optional[str] = None) -> Iterator[str]:
+        """Path local để tool (ffmpeg) ghi ra; thoát context thì file được đưa lên `key`."""
+        suffix = Path(key).suffix
+        fd, tmp = tempfile.mkstemp(suffix=suffix)
+        os.close(fd)
+        try:
+            yield tmp
+            self.put_file(tmp, key, content_type=content_type, move=True)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def read_bytes(self, key: str) -> bytes:
+        return b"".join(self.open_range(key))
+
+    # ---------- cho code async: mọi lần đọc / tải (S3 = network) chạy ngoài event loop ----------
+    async def aiter_bytes(self, key: str) -> AsyncIterator[bytes]:
+        """Như open_range() nhưng từng chunk được đọc trong thread -> stream upload không chặn loop."""
+        it = self.open_range(key)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, it, None)
+                if chunk is None:
+                    break
+                yield chunk
+        finally:
+            await asyncio.to_thread(it.close)
+
+    @asynccontextmanager
+    async def alocal_copy(self, key: str) -> AsyncIterator[str]:
+        """local_copy() cho code async: tải file về / dọn file tạm trong thread."""
+        cm = self.local_copy(key)
+        path = await asyncio.to_thread(cm.__enter__)
+        try:
+            yield path
+        finally:
+            await asyncio.to_thread(cm.__exit__, None, None, None)
+
+    @abstractmethod
+    def iter_keys(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        """(key, size, mtime epoch) của mọi file dưới prefix — dùng cho GC (services/lifecycle_service.py)."""
+
+    def delete_many(self, keys: List[str]) -> int:
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str = ".", public_base_url: str = ""):
+        self.root = Path(root)
+        self.public_base_url = public_base_url.rstrip("/")
+
+    def path(self, key: str) -> Path:
+        return self.root / key
+
+    def put_file(self, local_path: str, key: str, content_type: Optional[str] = None, move: bool = False) -> None:
+        dest = self.path(key)
+        if Path(local_path).resolve() == dest.resolve():
+            return
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if move:
+            try:
+                os.replace(local_path, dest)  # atomic nếu cùng filesystem
+                return
+            except OSError:
+                pass
+        tmp = dest.with_name(dest.name + ".part")
+        shutil.copyfile(local_path, tmp)
+        os.replace(tmp, dest)
+        if move:
+            os.remove(local_path)
+
+    def exists(self, key: str) -> bool:
+        return self.path(key).is_file()
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.path(key).stat().st_size
+        except OSError:
+            return None
+
+    def delete(self, key: str) -> None:
+        self.path(key).unlink(missing_ok=True)
+
+    def iter_keys(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        base = self.path(prefix)
+        if not base.is_dir():
+            return
+        for dirpath, _, names in os.walk(base):
+            for n in names:
+                p = Path(dirpath) / n
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                yield p.relative_to(self.root).as_posix(), st.st_size, st.st_mtime
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self.path(key), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(READ_CHUNK if remaining is None else min(READ_CHUNK, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def url(self, key: str, expires: Optional[int] = None) -> str:
+        # file local được phục vụ qua mount /storage của chính API
+        return f"{self.public_base_url}/{quote(key.lstrip('/'))}"
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        yield str(self.path(key))
+
+    @contextmanager
+    def local_output(self, key: str, content_type: Optional[str] = None) -> Iterator[str]:
+        # ghi thẳng vào vị trí cuối, không cần file tạm
+        dest = self.path(key)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        yield str(dest)
+
+
+class S3Storage(StorageBackend):
+    """S3-compatible (AWS, MinIO, R2...). Cần `boto3` (optional dependency)."""
+    name = "s3"
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 presign_expires: int = 3600, multipart_chunk_mb: int = 16, max_concurrency: int = 8):
+        try:
+            import boto3
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+        except ImportError as e:
+            raise RuntimeError("STORAGE_BACKEND=s3 requires the 'boto3' package") from e
+
+        self.bucket = bucket
+        self.presign_expires = presign_expires
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            # MinIO cần path-style; pool đủ lớn cho các part upload song song
+            config=Config(s3={"addressing_style": "path"} if endpoint_url else {},
+                          max_pool_connections=max(10, max_concurrency * 2)),
+        )
+        chunk = multipart_chunk_mb * 1024 * 1024
+        # file > chunk được chia part và upload song song max_concurrency luồng
+        self.transfer = TransferConfig(multipart_threshold=chunk, multipart_chunksize=chunk,
+                                       max_concurrency=max_concurrency, use_threads=True)
+
+    def put_file(self, local_path: str, key: str, content_type: Optional[str] = None, move: bool = False) -> None:
+        ctype = content_type or mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self.client.upload_file(local_path, self.bucket, key, ExtraArgs={"ContentType": ctype}, Config=self.transfer)
+        if move:
+            os.remove(local_path)
+
+    def _head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def size(self, key: str) -> Optional[int]:
+        head = self._head(key)
+        return int(head["ContentLength"]) if head else None
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def iter_keys(self, prefix: str) -> Iterator[Tuple[str, int, float]]:
+        pages = self.client.get_paginator("list_objects_v2").paginate(
+            Bucket=self.bucket, Prefix=prefix.rstrip("/") + "/")
+        for page in pages:
+            for obj in page.get("Contents") or []:
+                yield obj["Key"], int(obj["Size"]), obj["LastModified"].timestamp()
+
+    def delete_many(self, keys: List[str]) -> int:
+        # DeleteObjects tối đa 1000 key / request
+        for i in range(0, len(keys), 1000):
+            chunk = keys[i:i + 1000]
+            self.client.delete_objects(Bucket=self.bucket,
+                                       Delete={"Objects": [{"Key": k} for k in chunk], "Quiet": True})
+        return len(keys)
+
+    def open_range(self, key: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        kwargs = {"Bucket": self.bucket, "Key": key}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(**kwargs)["Body"]
+        try:
+            for chunk in body.iter_chunks(READ_CHUNK):
+                yield chunk
+        finally:
+            body.close()
+
+    def url(self, key: str, expires: Optional[int] = None) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": key},
+            ExpiresIn=expires or self.presign_expires,
+        )
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        fd, tmp = tempfile.mkstemp(suffix=Path(key).suffix)
+        os.close(fd)
+        try:
+            # download_file cũng tải song song theo range
+            self.client.download_file(self.bucket, key, tmp, Config=self.transfer)
+            yield tmp
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+@lru_cache
+def get_storage() -> StorageBackend:
+    s = get_settings()
+    if (s.STORAGE_BACKEND or "local").lower() == "s3":
+        logger.info(f"Using S3 storage bucket={s.S3_BUCKET} endpoint={s.S3_ENDPOINT_URL or 'aws'}")
+        return S3Storage(
+            bucket=s.S3_BUCKET,
+            endpoint_url=s.S3_ENDPOINT_URL,
+            region=s.S3_REGION,
+            access_key=s.S3_ACCESS_KEY,
+            secret_key=s.S3_SECRET_KEY,
+            presign_expires=s.S3_PRESIGN_EXPIRES,
+            multipart_chunk_mb=s.S3_MULTIPART_CHUNK_MB,
+            max_concurrency=s.S3_MAX_CONCURRENCY,
+        )
+    # key trong DB tương đối so với thư mục cha của MEDIA_ROOT (xem BlobService)
+    root = s.STORAGE_LOCAL_ROOT or str(Path(s.MEDIA_ROOT).parent)
+    return LocalStorage(root=root, public_base_url=s.PUBLIC_BASE_URL)
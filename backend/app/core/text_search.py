@@ -0,0 +1,84 @@
+# app/core/text_search.py
+"""
+Biểu thức tìm kiếm dùng chung, khớp đúng với các index trong schema_upgrades:
+- f_unaccent(col) LIKE '%q%'  -> GIN gin_trgm_ops trên f_unaccent(col)
+- search_vector @@ tsquery   -> GIN trên cột tsvector (trigger tự cập nhật)
+f_unaccent() đã lower() sẵn nên so khớp không phân biệt hoa thường / dấu.
+
+DB có hỗ trợ hay không được dò lười ở lần dùng đầu tiên (cả script không chạy startup của app):
+không có unaccent -> so khớp bằng lower() (như ILIKE: không phân biệt hoa thường nhưng phân biệt dấu);
+không có pg_trgm -> similarity = 0. schema_upgrades dò lại sau khi chạy DDL.
+"""
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, literal, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.elements import ColumnElement
+
+logger = logging.getLogger(__name__)
+
+TS_CONFIG = "simple"
+
+_features: Optional[Dict[str, bool]] = None
+_probe_lock = threading.Lock()
+
+
+def _works(conn, stmt: str) -> bool:
+    try:
+        conn.execute(text(stmt))
+        return True
+    except Exception:
+        conn.rollback()
+        return False
+
+
+def probe(engine: Optional[Engine] = None) -> Dict[str, bool]:
+    """Dò f_unaccent() / similarity() trên DB và ghi nhớ kết quả. Lỗi kết nối thì raise (lần sau dò lại)."""
+    global _features
+    if engine is None:
+        from app.core.database import engine
+    with engine.connect() as conn:
+        found = {"unaccent": _works(conn, "SELECT f_unaccent('a')"),
+                 "trgm": _works(conn, "SELECT similarity('a', 'a')")}
+    _features = found
+    return found
+
+
+def _feature(name: str) -> bool:
+    if _features is None:
+        with _probe_lock:
+            if _features is None:
+                try:
+                    probe()
+                except Exception as e:
+                    # DB chưa kết nối được: dùng mặc định (có đủ extension), lần sau dò lại
+                    logger.warning(f"Cannot probe text search features: {e}")
+                    return True
+    return _features[name]
+
+
+def escape_like(q: str) -> str:
+    """Escape ký tự đặc biệt của LIKE, dùng với escape="!"."""
+    return q.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+
+
+def _fold(expr: Any) -> ColumnElement:
+    return func.f_unaccent(expr) if _feature("unaccent") else func.lower(expr)
+
+
+def contains(column: Any, q: str) -> ColumnElement:
+    """`column` chứa `q` (bỏ dấu, không phân biệt hoa thường)."""
+    pattern = func.concat("%", _fold(literal(escape_like(q.strip()))), "%")
+    return _fold(column).like(pattern, escape="!")
+
+
+def ts_query(q: str) -> ColumnElement:
+    return func.websearch_to_tsquery(TS_CONFIG, _fold(literal(q.strip())))
+
+
+def similarity(column: Any, q: str) -> ColumnElement:
+    if not _feature("trgm"):
+        return literal(0.0)
+    return func.coalesce(func.similarity(_fold(column), _fold(literal(q.strip()))), 0.0)
@@ -0,0 +1,85 @@
+# app/core/upstream.py
+"""
+Điểm duy nhất gọi HTTP tới API các nền tảng: circuit breaker -> rate limiter -> request.
+
+- Lỗi tạm thời (5xx, timeout, lỗi kết nối) chỉ retry tại chỗ UPSTREAM_INLINE_RETRIES lần,
+  backoff có jitter, và chỉ khi retry budget còn + circuit vẫn closed. Hết lượt -> raise
+  UpstreamUnavailable để caller hoãn việc (vd target quay lại "scheduled") thay vì giữ request.
+- Chỉ retry tại chỗ khi gửi lại không thể tạo trùng: method idempotent (GET, PUT...) hoặc request
+  chưa hề được gửi (lỗi kết nối / hết chỗ trong pool). POST đăng bài bị timeout / 5xx có thể đã
+  tạo bài -> raise ngay, publish_now ghi attempt "unknown" và đối soát trước khi đăng lại.
+- Throttle (429 / usage header) -> rate limiter chặn bucket; request gửi lại khi bucket mở.
+- 4xx khác trả nguyên response cho caller tự xử lý.
+"""
+import asyncio
+import logging
+from typing import Any, Optional
+
+import httpx
+
+from app.core.settings import get_settings
+from app.core.rate_limit import get_limiter
+from app.core.circuit_breaker import CLOSED, UpstreamUnavailable, backoff, get_breaker, retry_budget
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_STATUS = {500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# request chưa rời client -> gửi lại an toàn với mọi method
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+async def request(client: httpx.AsyncClient, method: str, url: str, *, platform: str, endpoint: str = "read",
+                  channel: Optional[str] = None, cost: float = 1.0, **kwargs: Any) -> httpx.Response:
+    settings = get_settings()
+    limiter = get_limiter()
+    breaker = get_breaker(platform)
+    budget = retry_budget()
+    inline_retries = int(settings.UPSTREAM_INLINE_RETRIES)
+    defer = float(settings.UPSTREAM_DEFER_SECONDS)
+    attempt = 0
+    idempotent = method.upper() in IDEMPOTENT_METHODS
+
+    def may_retry(safe: bool) -> bool:
+        return safe and attempt < inline_retries and breaker.state == CLOSED and budget.try_spend()
+
+    while True:
+        breaker.before()
+        try:
+            await limiter.acquire(platform, endpoint, channel, cost)
+            if attempt == 0:
+                budget.record()
+            resp = await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            breaker.failure()
+            logger.warning(f"{platform} {method} {url} attempt {attempt + 1}: {type(e).__name__} {e}")
+            if may_retry(idempotent or isinstance(e, NOT_SENT_ERRORS)):
+                await asyncio.sleep(backoff(attempt))
+                attempt += 1
+                continue
+            reason = "upstream_timeout" if isinstance(e, httpx.TimeoutException) else "upstream_unavailable"
+            raise UpstreamUnavailable(platform, defer, reason=reason, status_code=504 if reason == "upstream_timeout" else 503)
+        except BaseException:
+            breaker.release()  # RateLimited / cancel: không tính là kết quả của lượt thăm dò
+            raise
+
+        throttled = await limiter.observe(platform, resp, channel)
+        transient = resp.status_code in TRANSIENT_STATUS
+        if transient:
+            breaker.failure()
+        else:
+            breaker.success()  # bị throttle vẫn là upstream còn sống
+        if not (throttled or transient):
+            return resp
+        # throttle: nền tảng đã từ chối request -> gửi lại không tạo trùng
+        if throttled and attempt < inline_retries + 1 and budget.try_spend():
+            attempt += 1
+            continue  # acquire() vòng sau chờ tới khi bucket mở lại
+        if transient:
+            logger.warning(f"{platform} {method} {url} attempt {attempt + 1}: HTTP {resp.status_code}")
+            if may_retry(idempotent):
+                await asyncio.sleep(backoff(attempt))
+                attempt += 1
+                continue
+            raise UpstreamUnavailable(platform, defer)
+        return resp
@@ -0,0 +1,58 @@
+# app/core/video_workers.py
+"""
+Pool worker cho job ffmpeg/ffprobe nặng (transcode, rendition...).
+
+Giới hạn số job chạy đồng thời = VIDEO_WORKERS để nhiều request không cùng lúc
+spawn hàng chục ffmpeg tranh CPU. Job là hàm blocking, chạy trong thread pool;
+submit_background() cho job "làm trước" không ai chờ kết quả.
+Pool "preview" riêng (PREVIEW_WORKERS) để bản nháp không phải xếp hàng sau bản final dài.
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+CPU_COUNT = os.cpu_count() or 2
+VIDEO_WORKERS = int(os.getenv("VIDEO_WORKERS", str(max(1, CPU_COUNT // 2))))
+PREVIEW_WORKERS = int(os.getenv("PREVIEW_WORKERS", "2"))
+
+POOL_SIZES: Dict[str, int] = {"video": VIDEO_WORKERS, "preview": PREVIEW_WORKERS}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+
+
+def get_executor(pool: str = "video") -> ThreadPoolExecutor:
+    if pool not in _executors:
+        _executors[pool] = ThreadPoolExecutor(max_workers=POOL_SIZES[pool], thread_name_prefix=f"{pool}-worker")
+    return _executors[pool]
+
+
+def threads_per_job(pool: str = "video") -> int:
+    """Số thread ffmpeg cho 1 job: chia đều CPU cho số job tối đa của pool (không job nào ôm hết core)."""
+    return max(1, CPU_COUNT // max(1, POOL_SIZES[pool]))
+
+
+async def run(fn: Callable[..., Any], *args: Any, pool: str = "video", **kwargs: Any) -> Any:
+    """Chạy job blocking trên pool và chờ kết quả (không chặn event loop)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(pool), partial(fn, *args, **kwargs))
+
+
+def submit_background(fn: Callable[..., Any], *args: Any, pool: str = "video", **kwargs: Any) -> None:
+    """Xếp job vào pool, không chờ; lỗi chỉ được log."""
+    def _job():
+        try:
+            fn(*args, **kwargs)
+        except Exception as e:
+            logger.error(f"Background video job {getattr(fn, '__name__', fn)} failed: {e}")
+    get_executor(pool).submit(_job)
+
+
+def shutdown() -> None:
+    for ex in _executors.values():
+        ex.shutdown(wait=False, cancel_futures=True)
+    _executors.clear()
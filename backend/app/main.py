@@ -8,11 +8,20 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
 
 from app.core.settings import get_settings
 from app.core.timezone import now_vn
 from app.core.database import engine
+from app.core.schema_upgrades import apply_upgrades
+from app.core import video_workers
+from app.services.download_service import DownloadService
+from app.services.video_service import VideoService
+from app.services.batch_service import BatchService
+from app.services.lifecycle_service import LifecycleService
+from app.services.publish_dispatcher import PublishDispatcher
+from app.services.token_refresh_service import TokenRefreshService
+from app.core import circuit_breaker
+from app.core import channel_cache
 
 # Import routers (giữ nguyên file/endpoint hiện có)
 from app.api import (
@@ -30,6 +39,10 @@ from app.api import (
     schedule_routers,
     template_routers,
     auth_routers,
+    search_routers,
+    hashtag_routers,
+    storage_routers,
+    lifecycle_routers,
 )
 
 # Import Base và các models để tạo tables
@@ -39,11 +52,13 @@ from app.models.roles_models import Role
 from app.models.association import user_roles
 from app.models.channel_models import Channel, ChannelPlatformEnum
 from app.models.media_models import MediaAsset
-from app.models.post_models import Post, PostMedia, PostTarget
-from app.models.video_models import Video
+from app.models.post_models import Post, PostMedia, PostTarget, PublishAttempt
+from app.models.video_models import Video, VideoRendition, VideoBatch, VideoBatchItem
 from app.models.template_models import Template
 from app.models.schedule_models import Schedule
 from app.models.analytics_models import ActivityLog
+from app.models.hashtag_models import Hashtag
+from app.models.blob_models import MediaBlob
 
 # Import các models khác nếu cần
 
@@ -81,7 +96,7 @@ def create_app() -> FastAPI:
     # Health & root
     @app.get("/health")
     async def health() -> Dict[str, Any]:
-        return {"ok": True, "time_vn": now_vn().isoformat()}
+        return {"ok": True, "time_vn": now_vn().isoformat(), "circuits": circuit_breaker.snapshot()}
 
     @app.get("/")
     async def root() -> Dict[str, Any]:
@@ -103,15 +118,37 @@ def create_app() -> FastAPI:
     app.include_router(schedule_routers.router, prefix=api_prefix)
     app.include_router(template_routers.router, prefix=api_prefix)
     app.include_router(auth_routers.router, prefix=api_prefix)
+    app.include_router(search_routers.router, prefix=api_prefix)
+    app.include_router(hashtag_routers.router, prefix=api_prefix)
+    app.include_router(lifecycle_routers.router, prefix=api_prefix)
+    # media ở /storage/... (ngoài api_prefix, giữ nguyên URL cũ của StaticFiles)
+    app.include_router(storage_routers.router)
 
     @app.on_event("startup")
     async def on_startup():
         logger.info("App started")
         # TỰ ĐỘNG TẠO TABLES
         create_tables()
+        # import URL đang dở từ lần chạy trước
+        DownloadService().resume_pending()
+        # edit nền dở (restart / worker chết) -> video về ready thay vì kẹt processing
+        VideoService().start_background()
+        BatchService().resume_unfinished()
+        LifecycleService().start_background()
+        PublishDispatcher().start_background()
+        TokenRefreshService().start_background()
+        channel_cache.start_listener()
 
     @app.on_event("shutdown")
     async def on_shutdown():
+        await DownloadService.shutdown()
+        await BatchService.shutdown()
+        await VideoService.shutdown()
+        await LifecycleService.shutdown()
+        await PublishDispatcher.shutdown()
+        await TokenRefreshService.shutdown()
+        await channel_cache.shutdown()
+        video_workers.shutdown()
         logger.info("App stopped")
 
     return app
@@ -122,6 +159,7 @@ def create_tables():
     try:
         logger.info("Creating database tables...")
         Base.metadata.create_all(bind=engine)
+        apply_upgrades(engine)
         logger.info("✅ Database tables created successfully!")
     except Exception as e:
         logger.error(f"❌ Error creating database tables: {e}")
@@ -133,11 +171,3 @@ app = create_app()
 
 # Bạn cũng có thể tạo tables ở đây (ngoài startup event)
 # create_tables()
-
-# Ví dụ thư mục chứa file: backend/storage
-STORAGE_DIR = os.path.join(os.path.dirname(__file__), "..", "storage")
-STORAGE_DIR = os.path.abspath(STORAGE_DIR)
-os.makedirs(STORAGE_DIR, exist_ok=True)
-
-# Phục vụ static tại /storage
-app.mount("/storage", StaticFiles(directory=STORAGE_DIR), name="storage")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Table, Column, Integer, ForeignKey
+from sqlalchemy import Table, Column, Integer, ForeignKey, Index
 from app.models.base import Base
 
 # Định nghĩa chung cho các association tables
@@ -7,4 +7,13 @@ user_roles = Table(
     Base.metadata,
     Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
     Column("role_id", Integer, ForeignKey("roles.id", ondelete="CASCADE"), primary_key=True)
-)
\ No newline at end of file
+)
+
+post_hashtags = Table(
+    "post_hashtags",
+    Base.metadata,
+    Column("post_id", Integer, ForeignKey("posts.id", ondelete="CASCADE"), primary_key=True),
+    Column("hashtag_id", Integer, ForeignKey("hashtags.id", ondelete="CASCADE"), primary_key=True),
+    # PK (post_id, hashtag_id) phục vụ tra theo post; index này phục vụ tra theo hashtag
+    Index("ix_post_hashtags_hashtag_id_post_id", "hashtag_id", "post_id"),
+)
@@ -0,0 +1,19 @@
+
+
+from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import Integer, BigInteger, String, JSON
+from app.models.base import Base, TimestampMixin
+
+class MediaBlob(Base, TimestampMixin):
+    """File vật lý lưu theo nội dung (sha256); MediaAsset/Video trỏ tới qua content_hash."""
+    __tablename__ = "media_blobs"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    sha256: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    path: Mapped[str] = mapped_column(String(500), nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    mime_type: Mapped[str | None] = mapped_column(String(150))
+    # số row (media_assets/videos) đang giữ blob; về 0 -> xoá file
+    ref_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    blob_metadata: Mapped[dict | None] = mapped_column("metadata", JSON, nullable=True)
@@ -1,8 +1,9 @@
 
 
 
-from sqlalchemy import String, Integer, Text, Boolean, DateTime, ForeignKey, UniqueConstraint, JSON
+from sqlalchemy import String, Integer, Text, Boolean, DateTime, ForeignKey, UniqueConstraint, JSON, Index, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from datetime import datetime
 from sqlalchemy.sql import func
 from sqlalchemy import Enum as SAEnum
@@ -34,6 +35,18 @@ class Channel(Base, TimestampMixin):
     channel_metadata: Mapped[dict | None] = mapped_column("metadata", JSON, nullable=True)
     source_ref_table: Mapped[str | None] = mapped_column(String(50), nullable=True)
     source_ref_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # trigger DB tự cập nhật từ name/username (xem core/schema_upgrades.py)
+    search_vector = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
     # Quan hệ ngược với PostTarget (tiện truy vấn)
-    targets = relationship("PostTarget", back_populates="channel")
\ No newline at end of file
+    targets = relationship("PostTarget", back_populates="channel")
+
+    # keyset pagination: ORDER BY created_at DESC, id DESC
+    # TokenRefreshService quét token sắp hết hạn (partial: FB/IG page token không có hạn)
+    __table_args__ = (
+        Index("ix_channels_created_at_id", "created_at", "id"),
+        # channel_repo.upsert_many: INSERT ... ON CONFLICT (platform, external_id)
+        UniqueConstraint("platform", "external_id", name="uq_channels_platform_external_id"),
+        Index("ix_channels_token_expires_at", "token_expires_at",
+              postgresql_where=text("token_expires_at IS NOT NULL")),
+    )
@@ -0,0 +1,23 @@
+
+
+from datetime import datetime
+from sqlalchemy import String, Integer, DateTime, Index
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.sql import func
+from app.models.base import Base
+from app.models.association import post_hashtags
+
+class Hashtag(Base):
+    __tablename__ = "hashtags"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # đã chuẩn hoá: lowercase, không có '#'
+    tag: Mapped[str] = mapped_column(String(100), unique=True, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+
+    posts = relationship("Post", secondary=post_hashtags, viewonly=True)
+
+    # text_pattern_ops -> LIKE 'prefix%' dùng được btree (autocomplete)
+    __table_args__ = (
+        Index("ix_hashtags_tag_prefix", "tag", postgresql_ops={"tag": "text_pattern_ops"}),
+    )
@@ -3,7 +3,7 @@
 
 
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, JSON, ForeignKey
+from sqlalchemy import Integer, String, JSON, ForeignKey, Index
 from app.models.base import Base, TimestampMixin
 
 class MediaAsset(Base, TimestampMixin):
@@ -14,8 +14,13 @@ class MediaAsset(Base, TimestampMixin):
     path: Mapped[str] = mapped_column(String(500))
     mime_type: Mapped[str | None] = mapped_column(String(150))
     size: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    # sha256 của blob trong media_blobs (nội dung dùng chung, đếm tham chiếu)
+    content_hash: Mapped[str | None] = mapped_column(String(64), index=True, nullable=True)
 
     media_metadata: Mapped[dict | None] = mapped_column("metadata", JSON, nullable=True)
 
     uploaded_by_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
     uploaded_by = relationship("User")
+
+    # keyset pagination: ORDER BY created_at DESC, id DESC
+    __table_args__ = (Index("ix_media_assets_created_at_id", "created_at", "id"),)
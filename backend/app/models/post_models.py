@@ -1,5 +1,6 @@
-from sqlalchemy import String, Integer, Text, JSON, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy import String, Integer, Text, JSON, DateTime, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from app.models.base import Base, TimestampMixin
 from sqlalchemy import Enum as SAEnum
 
@@ -17,6 +18,8 @@ class Post(Base, TimestampMixin):
     template_id: Mapped[int | None] = mapped_column(ForeignKey("templates.id"), nullable=True)
     created_by_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"), nullable=True)
     post_metadata: Mapped[dict | None] = mapped_column(JSON, nullable=True)  # ✅ thêm
+    # trigger DB tự cập nhật từ caption/hashtags (xem core/schema_upgrades.py)
+    search_vector = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
     video = relationship("Video")
     template = relationship("Template")
@@ -24,6 +27,9 @@ class Post(Base, TimestampMixin):
     media = relationship("PostMedia", back_populates="post", cascade="all, delete-orphan")
     targets = relationship("PostTarget", back_populates="post", cascade="all, delete-orphan")
 
+    # keyset pagination: ORDER BY created_at DESC, id DESC
+    __table_args__ = (Index("ix_posts_created_at_id", "created_at", "id"),)
+
 class PostMedia(Base, TimestampMixin):
     __tablename__ = "post_media"
 
@@ -55,8 +61,34 @@ class PostTarget(Base, TimestampMixin):
     platform_post_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
     error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
     engagement_data: Mapped[dict | None] = mapped_column(JSON, nullable=True)
+    # số lần publish bị hoãn vì nền tảng lỗi tạm thời (xem PostService._defer)
+    attempts: Mapped[int] = mapped_column(Integer, default=0, server_default="0", nullable=False)
 
     post = relationship("Post", back_populates="targets")
     channel = relationship("Channel", back_populates="targets")
 
-    __table_args__ = (UniqueConstraint("post_id", "channel_id", name="uq_post_channel"),)
+    __table_args__ = (
+        UniqueConstraint("post_id", "channel_id", name="uq_post_channel"),
+        # dispatcher: status = 'scheduled' AND scheduled_time <= now
+        Index("ix_post_targets_status_scheduled_time", "status", "scheduled_time"),
+    )
+
+
+class PublishAttempt(Base, TimestampMixin):
+    """
+    1 lần đăng target lên nền tảng, ghi (commit) TRƯỚC khi gọi API.
+    idempotency_key = hash(target + nội dung): cùng nội dung chỉ có 1 dòng, dùng lại khi thử lại.
+    status: pending (đang gọi API) | succeeded | failed (chắc chắn chưa đăng, được thử lại)
+            | unknown (lỗi giữa chừng, phải đối soát với nền tảng trước khi đăng lại)
+    """
+    __tablename__ = "publish_attempts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    target_id: Mapped[int] = mapped_column(ForeignKey("post_targets.id", ondelete="CASCADE"), index=True)
+    idempotency_key: Mapped[str] = mapped_column(String(64), unique=True)
+    platform: Mapped[str] = mapped_column(String(20))
+    status: Mapped[str] = mapped_column(String(20), default="pending")
+    tries: Mapped[int] = mapped_column(Integer, default=1, server_default="1", nullable=False)
+    started_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True))
+    platform_post_id: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    error_message: Mapped[str | None] = mapped_column(Text, nullable=True)
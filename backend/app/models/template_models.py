@@ -10,7 +10,7 @@ class Template(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     name: Mapped[str] = mapped_column(String)
-    type: Mapped[str] = mapped_column(String)  # caption, hashtag, watermark, thumbnail
+    type: Mapped[str] = mapped_column(String)  # caption, hashtag, watermark, frame, thumbnail
     content: Mapped[str] = mapped_column(Text)
     template_metadata: Mapped[dict | None] = mapped_column(JSON)
 
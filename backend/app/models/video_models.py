@@ -1,9 +1,10 @@
 
 
-from sqlalchemy import String, Integer, Float, Text, JSON, DateTime, ForeignKey
+from sqlalchemy import String, Integer, BigInteger, Float, Text, JSON, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.sql import func
-from app.models.base import Base
+from app.models.base import Base, TimestampMixin
 
 class Video(Base):
     __tablename__ = "videos"
@@ -18,13 +19,25 @@ class Video(Base):
 
     file_path: Mapped[str] = mapped_column(String)
     file_size: Mapped[int | None] = mapped_column(Integer)
+    # blob (media_blobs.sha256) mà video giữ tham chiếu — file upload gốc
+    content_hash: Mapped[str | None] = mapped_column(String(64), index=True)
     duration: Mapped[float | None] = mapped_column(Float)
     resolution: Mapped[str | None] = mapped_column(String)
     format: Mapped[str] = mapped_column(String, default="mp4")
+    # điền bởi ffprobe (services/probe_service.py); width/height là kích thước hiển thị (đã xoay)
+    width: Mapped[int | None] = mapped_column(Integer)
+    height: Mapped[int | None] = mapped_column(Integer)
+    video_codec: Mapped[str | None] = mapped_column(String(32))
+    audio_codec: Mapped[str | None] = mapped_column(String(32))
+    bitrate: Mapped[int | None] = mapped_column(BigInteger)
+    fps: Mapped[float | None] = mapped_column(Float)
+    rotation: Mapped[int | None] = mapped_column(Integer)
     thumbnail_path: Mapped[str | None] = mapped_column(String)
 
     video_metadata: Mapped[dict | None] = mapped_column(JSON)
     status: Mapped[str] = mapped_column(String, default="processing")
+    # trigger DB tự cập nhật từ title/description (xem core/schema_upgrades.py)
+    search_vector = mapped_column(TSVECTOR, nullable=True, deferred=True)
 
     uploaded_by_id: Mapped[int | None] = mapped_column(ForeignKey("users.id"))
     created_at: Mapped[DateTime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -32,3 +45,69 @@ class Video(Base):
 
     uploaded_by = relationship("User")
     posts = relationship("Post", back_populates="video")
+
+    # keyset pagination: ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index("ix_videos_created_at_id", "created_at", "id"),
+        Index("ix_videos_duration", "duration"),
+        Index("ix_videos_width_height", "width", "height"),
+    )
+
+
+class VideoRendition(Base, TimestampMixin):
+    """Bản transcode đạt spec của 1 platform profile (xem core/platform_profiles.py)."""
+    __tablename__ = "video_renditions"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    video_id: Mapped[int] = mapped_column(ForeignKey("videos.id", ondelete="CASCADE"), index=True)
+    profile: Mapped[str] = mapped_column(String(50))
+    # file_path của video lúc render; video bị edit (file_path đổi) -> rendition hết hạn
+    source_path: Mapped[str] = mapped_column(String)
+    path: Mapped[str | None] = mapped_column(String)
+    size: Mapped[int | None] = mapped_column(BigInteger)
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending/processing/ready/failed
+    error_message: Mapped[str | None] = mapped_column(Text)
+    rendition_metadata: Mapped[dict | None] = mapped_column("metadata", JSON)
+
+    video = relationship("Video")
+
+    __table_args__ = (UniqueConstraint("video_id", "profile", name="uq_video_renditions_video_id_profile"),)
+
+
+class VideoBatch(Base, TimestampMixin):
+    """1 lệnh xử lý hàng loạt (trim/crop/watermark/thumbnail...) trên nhiều video."""
+    __tablename__ = "video_batches"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    op: Mapped[str] = mapped_column(String(30))
+    spec: Mapped[dict | None] = mapped_column(JSON)          # tham số chung cho mọi item
+    parallelism: Mapped[int] = mapped_column(Integer, default=1)
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending/running/done/partial/failed
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    finished_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True))
+
+    items = relationship("VideoBatchItem", back_populates="batch", order_by="VideoBatchItem.id",
+                         cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (Index("ix_video_batches_status", "status"),)
+
+
+class VideoBatchItem(Base, TimestampMixin):
+    __tablename__ = "video_batch_items"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    batch_id: Mapped[int] = mapped_column(ForeignKey("video_batches.id", ondelete="CASCADE"))
+    video_id: Mapped[int] = mapped_column(ForeignKey("videos.id", ondelete="CASCADE"))
+    status: Mapped[str] = mapped_column(String(20), default="pending")  # pending/running/done/failed
+    result: Mapped[dict | None] = mapped_column(JSON)
+    error_message: Mapped[str | None] = mapped_column(Text)
+    started_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[DateTime | None] = mapped_column(DateTime(timezone=True))
+
+    batch = relationship("VideoBatch", back_populates="items")
+
+    __table_args__ = (
+        # progress: GROUP BY status trong 1 batch
+        Index("ix_video_batch_items_batch_id_status", "batch_id", "status"),
+        Index("ix_video_batch_items_video_id", "video_id"),
+    )
@@ -7,6 +7,9 @@ from sqlalchemy import func, cast, Integer
 from app.models.post_models import Post, PostTarget
 from app.models.channel_models import Channel
 from app.models.video_models import Video
+from app.models.hashtag_models import Hashtag
+from app.models.association import post_hashtags
+from app.core.text_search import escape_like
 
 class AnalyticsRepo:
     @staticmethod
@@ -59,3 +62,34 @@ class AnalyticsRepo:
             .order_by(func.count(PostTarget.id).desc())
         )
         return q.all()
+
+    @staticmethod
+    def hashtags(db: Session, limit: int = 20, prefix: str | None = None):
+        views_sum = func.coalesce(func.sum(cast(PostTarget.engagement_data["post_video_views"].astext, Integer)), 0)
+        reacts_sum = func.coalesce(func.sum(cast(PostTarget.engagement_data["reactions"].astext, Integer)), 0)
+        comments_sum = func.coalesce(func.sum(cast(PostTarget.engagement_data["comments"].astext, Integer)), 0)
+        shares_sum = func.coalesce(func.sum(cast(PostTarget.engagement_data["shares"].astext, Integer)), 0)
+
+        # đi từ hashtags -> post_hashtags (index hashtag_id, post_id) -> post_targets, không quét caption
+        q = (
+            db.query(
+                Hashtag.tag.label("tag"),
+                func.count(func.distinct(post_hashtags.c.post_id)).label("posts"),
+                views_sum.label("views"),
+                reacts_sum.label("reactions"),
+                comments_sum.label("comments"),
+                shares_sum.label("shares"),
+            )
+            .select_from(Hashtag)
+            .join(post_hashtags, post_hashtags.c.hashtag_id == Hashtag.id)
+            .outerjoin(PostTarget, PostTarget.post_id == post_hashtags.c.post_id)
+        )
+        if prefix:
+            escaped = escape_like(prefix)
+            q = q.filter(Hashtag.tag.like(f"{escaped}%", escape="!"))
+        return (
+            q.group_by(Hashtag.id)
+            .order_by(views_sum.desc(), Hashtag.tag.asc())
+            .limit(limit)
+            .all()
+        )
@@ -0,0 +1,90 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update as sa_update
+from app.models.video_models import VideoBatch, VideoBatchItem
+
+def create(db: Session, op: str, spec: dict, video_ids: List[int], parallelism: int) -> VideoBatch:
+    batch = VideoBatch(op=op, spec=spec, parallelism=parallelism, status="pending", total=len(video_ids))
+    db.add(batch); db.flush()
+    db.add_all([VideoBatchItem(batch_id=batch.id, video_id=vid, status="pending") for vid in video_ids])
+    db.commit(); db.refresh(batch)
+    return batch
+
+def get(db: Session, batch_id: int) -> Optional[VideoBatch]:
+    return db.get(VideoBatch, batch_id)
+
+def list_items(db: Session, batch_id: int, status: Optional[str] = None) -> List[VideoBatchItem]:
+    q = db.query(VideoBatchItem).filter(VideoBatchItem.batch_id == batch_id)
+    if status:
+        q = q.filter(VideoBatchItem.status == status)
+    return q.order_by(VideoBatchItem.id).all()
+
+def get_item(db: Session, item_id: int) -> Optional[VideoBatchItem]:
+    return db.get(VideoBatchItem, item_id)
+
+def counts(db: Session, batch_id: int) -> Dict[str, int]:
+    rows = (
+        db.query(VideoBatchItem.status, func.count(VideoBatchItem.id))
+        .filter(VideoBatchItem.batch_id == batch_id)
+        .group_by(VideoBatchItem.status)
+        .all()
+    )
+    return {s: n for s, n in rows}
+
+def claim_orphaned(db: Session, stale_before: datetime) -> List[int]:
+    """
+    Nhận batch dở dang mà worker chạy nó đã chết: updated_at (heartbeat) cũ hơn stale_before.
+    Cùng câu UPDATE đặt lại updated_at, SKIP LOCKED -> 2 worker không nhận trùng 1 batch.
+    """
+    last = func.coalesce(VideoBatch.updated_at, VideoBatch.created_at)
+    candidates = (
+        select(VideoBatch.id)
+        .where(VideoBatch.status.in_(["pending", "running"]), last < stale_before)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        sa_update(VideoBatch).where(VideoBatch.id.in_(candidates)).values(updated_at=func.now())
+        .returning(VideoBatch.id).execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted(r[0] for r in rows)
+
+def touch(db: Session, batch_ids: List[int]) -> None:
+    # heartbeat cho batch worker này đang chạy
+    if not batch_ids:
+        return
+    db.execute(
+        sa_update(VideoBatch).where(VideoBatch.id.in_(batch_ids), VideoBatch.status.in_(["pending", "running"]))
+        .values(updated_at=func.now()).execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+def claim_item(db: Session, item_id: int) -> Optional[VideoBatchItem]:
+    """pending -> running bằng 1 UPDATE có điều kiện: None nếu item đã được nhận / đã xong."""
+    row = db.execute(
+        sa_update(VideoBatchItem)
+        .where(VideoBatchItem.id == item_id, VideoBatchItem.status == "pending")
+        .values(status="running", started_at=func.now(), updated_at=func.now())
+        .returning(VideoBatchItem.id).execution_options(synchronize_session=False)
+    ).first()
+    db.commit()
+    return db.get(VideoBatchItem, row.id, populate_existing=True) if row else None
+
+def fail_interrupted(db: Session, batch_id: int) -> int:
+    """
+    Item đang chạy khi worker giữ batch chết: edit không idempotent nên không chạy lại, đánh dấu failed.
+    Chỉ gọi sau claim_orphaned (không còn worker nào đang chạy item của batch).
+    """
+    res = db.execute(
+        sa_update(VideoBatchItem)
+        .where(VideoBatchItem.batch_id == batch_id, VideoBatchItem.status == "running")
+        .values(status="failed", error_message="interrupted by restart", finished_at=func.now())
+    )
+    db.commit()
+    return res.rowcount or 0
+
+def update(db: Session, obj, data: dict):
+    for k, v in data.items():
+        setattr(obj, k, v)
+    db.add(obj); db.commit(); db.refresh(obj); return obj
@@ -0,0 +1,75 @@
+
+
+from typing import Optional, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import update, delete, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.blob_models import MediaBlob
+
+# pg_advisory_xact_lock(class, obj) theo sha: không trùng không gian khoá 1 tham số (GC_LOCK_KEY)
+BLOB_LOCK_CLASS = 0x424C_4F42  # "BLOB"
+
+def lock(db: Session, sha256: str) -> None:
+    """
+    Khoá 1 nội dung tới hết transaction hiện tại (commit/rollback nhả khoá): ingest / acquire / release
+    cùng sha chạy lần lượt, không xen giữa lúc kiểm tra row/file và lúc đổi ref_count / xoá file.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(text("SELECT pg_advisory_xact_lock(:c, :o)"),
+               {"c": BLOB_LOCK_CLASS, "o": int(sha256[:8], 16) - 2**31})
+
+def get_by_hash(db: Session, sha256: str) -> Optional[MediaBlob]:
+    return db.query(MediaBlob).filter(MediaBlob.sha256 == sha256).first()
+
+def add_ref(db: Session, *, sha256: str, path: str, size: int, mime_type: Optional[str]) -> Tuple[MediaBlob, bool]:
+    """
+    Tạo blob (ref_count=1) hoặc tăng ref_count nếu đã có — 1 câu lệnh, an toàn khi
+    nhiều request upload cùng nội dung. Trả (blob, created).
+    """
+    stmt = (
+        pg_insert(MediaBlob.__table__)
+        .values(sha256=sha256, path=path, size=size, mime_type=mime_type, ref_count=1)
+        .on_conflict_do_update(
+            index_elements=["sha256"],
+            set_={"ref_count": MediaBlob.__table__.c.ref_count + 1},
+        )
+        .returning(MediaBlob.__table__.c.id, MediaBlob.__table__.c.ref_count)
+    )
+    row = db.execute(stmt).one()
+    db.commit()
+    blob = db.get(MediaBlob, row.id, populate_existing=True)
+    return blob, row.ref_count == 1
+
+def incref(db: Session, sha256: str) -> Optional[MediaBlob]:
+    res = db.execute(
+        update(MediaBlob)
+        .where(MediaBlob.sha256 == sha256)
+        .values(ref_count=MediaBlob.ref_count + 1)
+        .returning(MediaBlob.id)
+    ).first()
+    db.commit()
+    return db.get(MediaBlob, res.id, populate_existing=True) if res else None
+
+def decref(db: Session, sha256: str) -> Optional[Tuple[int, str]]:
+    """
+    Giảm ref_count; khi về 0 xoá luôn row. Trả (ref_count còn lại, path) hoặc None.
+    Không commit: caller giữ lock(sha) xoá file xong mới commit (xem BlobService.release).
+    """
+    res = db.execute(
+        update(MediaBlob)
+        .where(MediaBlob.sha256 == sha256, MediaBlob.ref_count > 0)
+        .values(ref_count=MediaBlob.ref_count - 1)
+        .returning(MediaBlob.ref_count, MediaBlob.path)
+    ).first()
+    if res is None:
+        return None
+    if res.ref_count == 0:
+        db.execute(delete(MediaBlob).where(MediaBlob.sha256 == sha256, MediaBlob.ref_count == 0))
+    return res.ref_count, res.path
+
+def merge_metadata(db: Session, blob: MediaBlob, data: dict) -> MediaBlob:
+    meta = dict(blob.blob_metadata or {})
+    meta.update(data)
+    blob.blob_metadata = meta
+    db.add(blob); db.commit(); db.refresh(blob); return blob
@@ -1,14 +1,20 @@
 
 
 
-from typing import List, Optional, Union
+from typing import Iterable, List, Optional, Tuple, Union
 from datetime import datetime
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
-from sqlalchemy.exc import IntegrityError
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 
 from app.models.channel_models import Channel
 from app.schemas.channel_schemas import ChannelPlatformEnum
+from app.core.pagination import paginate_keyset
+from app.core import text_search
+from app.core import channel_cache
+
+# ~12 tham số / row -> dưới giới hạn 65535 tham số của PostgreSQL
+UPSERT_CHUNK = 1000
 
 WRITEABLE_FIELDS = {
     "name","username","avatar_url","access_token","token_expires_at","status",
@@ -33,10 +39,27 @@ def list(
     if only_active:
         query = query.filter(Channel.is_active.is_(True))
     if q:
-        like = f"%{q}%"
-        query = query.filter(or_(Channel.name.ilike(like), Channel.username.ilike(like)))
+        query = query.filter(or_(text_search.contains(Channel.name, q), text_search.contains(Channel.username, q)))
     return query.order_by(Channel.name.asc()).offset(offset).limit(limit).all()
 
+def list_page(
+    db: Session,
+    platform: Optional[Union[ChannelPlatformEnum, str]] = None,
+    q: Optional[str] = None,
+    only_active: bool = True,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Channel], Optional[str]]:
+    query = db.query(Channel)
+    if platform:
+        plat_value = platform.value if hasattr(platform, "value") else platform
+        query = query.filter(Channel.platform == plat_value)
+    if only_active:
+        query = query.filter(Channel.is_active.is_(True))
+    if q:
+        query = query.filter(or_(text_search.contains(Channel.name, q), text_search.contains(Channel.username, q)))
+    return paginate_keyset(query, Channel, limit=limit, cursor=cursor)
+
 def get_by_platform_external(db: Session, platform: str, external_id: str) -> Optional[Channel]:
     return (
         db.query(Channel)
@@ -56,32 +79,63 @@ def update(db: Session, obj: Channel, data: dict) -> Channel:
                 continue
             setattr(obj, k, v)
     db.add(obj); db.commit(); db.refresh(obj)
+    channel_cache.invalidate(obj.id)
     return obj
 
 def delete(db: Session, obj: Channel) -> None:
+    channel_id = obj.id
     db.delete(obj); db.commit()
+    channel_cache.invalidate(channel_id)
 
 def upsert(db: Session, platform: str, external_id: str, defaults: Optional[dict] = None) -> Channel:
-    defaults = defaults or {}
-    obj = get_by_platform_external(db, platform, external_id)
-    if not obj:
-        obj = Channel(platform=platform, external_id=external_id, **{k:v for k,v in defaults.items() if k in WRITEABLE_FIELDS})
-        db.add(obj)
-        try:
-            db.commit()
-        except IntegrityError:
-            db.rollback()
-            obj = get_by_platform_external(db, platform, external_id)
-            if not obj:
-                raise
-        db.refresh(obj)
-    else:
-        if defaults:
-            for k, v in defaults.items():
-                if k in WRITEABLE_FIELDS:
-                    setattr(obj, k, v)
-            db.commit(); db.refresh(obj)
-    return obj
+    return upsert_many(db, [{**(defaults or {}), "platform": platform, "external_id": external_id}])[0]
+
+def _column_name(attr: str) -> str:
+    # channel_metadata -> cột "metadata"
+    return Channel.__mapper__.column_attrs[attr].columns[0].name
+
+def upsert_many(db: Session, rows: Iterable[dict]) -> List[Channel]:
+    """
+    Upsert nhiều channel trong 1 transaction: INSERT ... ON CONFLICT (platform, external_id)
+    DO UPDATE ... RETURNING id, tối đa UPSERT_CHUNK row / câu lệnh. Mỗi row: platform, external_id
+    + các field ghi được; channel đã có chỉ bị ghi đè các field có trong row.
+    Trả channel theo thứ tự row (trùng key -> row sau thắng).
+    """
+    by_key = {}
+    for r in rows:
+        plat = getattr(r["platform"], "value", r["platform"])
+        values = {k: v for k, v in r.items() if k in WRITEABLE_FIELDS}
+        by_key[(plat, str(r["external_id"]))] = {**values, "platform": plat, "external_id": str(r["external_id"])}
+    if not by_key:
+        return []
+    # multi-row VALUES cần cùng tập cột -> gom theo tập field
+    groups = {}
+    for key, values in by_key.items():
+        groups.setdefault(tuple(sorted(values)), []).append((key, values))
+    ids = {}
+    for fields, items in groups.items():
+        for i in range(0, len(items), UPSERT_CHUNK):
+            chunk = items[i:i + UPSERT_CHUNK]
+            stmt = pg_insert(Channel).values([values for _, values in chunk])
+            set_ = {
+                _column_name(f): stmt.excluded[_column_name(f)]
+                for f in fields if f not in ("platform", "external_id")
+            }
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["platform", "external_id"],
+                # không có gì để ghi vẫn cần DO UPDATE để RETURNING trả về dòng đã có
+                set_={**set_, "updated_at": func.now()},
+            ).returning(Channel.id, Channel.platform, Channel.external_id)
+            for row in db.execute(stmt):
+                ids[(getattr(row.platform, "value", row.platform), row.external_id)] = row.id
+    db.commit()
+    channel_cache.invalidate(*ids.values())
+    found = {
+        c.id: c for c in db.scalars(
+            select(Channel).where(Channel.id.in_(ids.values())).execution_options(populate_existing=True)
+        )
+    }
+    return [found[ids[key]] for key in by_key]
 
 def update_tokens(
     db: Session,
@@ -104,4 +158,49 @@ def update_tokens(
     if channel_metadata:
         channel.channel_metadata = {**(channel.channel_metadata or {}), **channel_metadata}
     db.add(channel); db.commit(); db.refresh(channel)
+    channel_cache.invalidate(channel.id)
     return channel
+
+def list_expiring_ids(
+    db: Session,
+    before: datetime,
+    platforms: Iterable[Union[ChannelPlatformEnum, str]],
+    limit: int = 100,
+    exclude_ids: Iterable[int] = (),
+) -> List[int]:
+    """Channel active có token hết hạn trước `before`, sắp xếp theo hạn (ix_channels_token_expires_at)."""
+    stmt = (
+        select(Channel.id)
+        .where(
+            Channel.token_expires_at.is_not(None),
+            Channel.token_expires_at < before,
+            Channel.is_active.is_(True),
+            Channel.platform.in_([p.value if hasattr(p, "value") else p for p in platforms]),
+        )
+        .order_by(Channel.token_expires_at.asc())
+        .limit(limit)
+    )
+    exclude_ids = [*exclude_ids]
+    if exclude_ids:
+        stmt = stmt.where(Channel.id.not_in(exclude_ids))
+    return [*db.scalars(stmt)]
+
+def lock_for_refresh(
+    db: Session,
+    channel_id: int,
+    before: Optional[datetime] = None,
+    skip_locked: bool = True,
+) -> Optional[Channel]:
+    """
+    SELECT ... FOR UPDATE trên channel (giữ tới commit của update_tokens).
+    skip_locked: worker khác đang giữ -> None. before: token đã được refresh xa hơn mốc này -> None.
+    """
+    stmt = (
+        select(Channel)
+        .where(Channel.id == channel_id)
+        .with_for_update(skip_locked=skip_locked)
+        .execution_options(populate_existing=True)
+    )
+    if before is not None:
+        stmt = stmt.where(Channel.token_expires_at.is_not(None), Channel.token_expires_at < before)
+    return db.scalars(stmt).first()
@@ -0,0 +1,53 @@
+
+
+from typing import List, Optional, Tuple, Iterable
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.models.hashtag_models import Hashtag
+from app.models.association import post_hashtags
+from app.models.post_models import Post
+from app.core.pagination import paginate_keyset
+from app.core.text_search import escape_like
+
+def get_or_create_many(db: Session, tags: Iterable[str]) -> List[Hashtag]:
+    tags = sorted(set(tags))
+    if not tags:
+        return []
+    # 1 câu INSERT ... ON CONFLICT DO NOTHING, không race khi nhiều worker cùng ghi
+    db.execute(
+        pg_insert(Hashtag.__table__)
+        .values([{"tag": t} for t in tags])
+        .on_conflict_do_nothing(index_elements=["tag"])
+    )
+    return db.query(Hashtag).filter(Hashtag.tag.in_(tags)).all()
+
+def set_post_hashtags(db: Session, post_id: int, tags: Iterable[str]) -> List[Hashtag]:
+    items = get_or_create_many(db, tags)
+    db.execute(delete(post_hashtags).where(post_hashtags.c.post_id == post_id))
+    if items:
+        db.execute(post_hashtags.insert(), [{"post_id": post_id, "hashtag_id": h.id} for h in items])
+    db.commit()
+    return items
+
+def get_by_tag(db: Session, tag: str) -> Optional[Hashtag]:
+    return db.query(Hashtag).filter(Hashtag.tag == tag).first()
+
+def autocomplete(db: Session, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+    escaped = escape_like(prefix)
+    usage = func.count(post_hashtags.c.post_id).label("posts")
+    return (
+        db.query(Hashtag.tag, usage)
+        .outerjoin(post_hashtags, post_hashtags.c.hashtag_id == Hashtag.id)
+        .filter(Hashtag.tag.like(f"{escaped}%", escape="!"))
+        .group_by(Hashtag.id)
+        .order_by(usage.desc(), Hashtag.tag.asc())
+        .limit(limit)
+        .all()
+    )
+
+def posts_by_tag_page(db: Session, hashtag_id: int, limit: int = 50, cursor: Optional[str] = None) -> Tuple[List[Post], Optional[str]]:
+    sub = select(post_hashtags.c.post_id).where(post_hashtags.c.hashtag_id == hashtag_id)
+    query = db.query(Post).filter(Post.id.in_(sub))
+    return paginate_keyset(query, Post, limit=limit, cursor=cursor)
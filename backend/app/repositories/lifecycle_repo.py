@@ -0,0 +1,74 @@
+from typing import Any, Dict, Iterator, List, Set, Tuple
+from sqlalchemy.orm import Session
+from sqlalchemy import Text, cast, literal, select, text
+from sqlalchemy.engine import Connection
+
+from app.core.text_search import escape_like
+from app.models.video_models import Video, VideoRendition
+from app.models.media_models import MediaAsset
+from app.models.post_models import PostMedia
+from app.models.blob_models import MediaBlob
+from app.models.template_models import Template
+
+# pg_try_advisory_lock key: chỉ 1 process chạy GC tại 1 thời điểm (nhiều worker uvicorn)
+GC_LOCK_KEY = 0x5354_4743  # "STGC"
+
+def iter_videos(db: Session, chunk: int = 1000) -> Iterator[Tuple[int, str, str, Dict[str, Any]]]:
+    """(id, file_path, thumbnail_path, video_metadata) theo lô, không nạp cả bảng vào RAM."""
+    stmt = select(Video.id, Video.file_path, Video.thumbnail_path, Video.video_metadata).order_by(Video.id)
+    for row in db.execute(stmt.execution_options(yield_per=chunk)):
+        yield row.id, row.file_path, row.thumbnail_path, row.video_metadata or {}
+
+def iter_paths(db: Session, chunk: int = 5000) -> Iterator[str]:
+    """Mọi path còn được row khác ngoài videos trỏ tới."""
+    for col in (VideoRendition.path, MediaAsset.path, MediaBlob.path, Template.content):
+        for (p,) in db.execute(select(col).where(col.isnot(None)).execution_options(yield_per=chunk)):
+            yield p
+
+def prune_prev_files(db: Session, video_id: int, drop: Set[str]) -> None:
+    """
+    Bỏ các bản cũ `drop` khỏi prev_files. Đọc lại row FOR UPDATE và chỉ sửa key prev_files:
+    metadata được ghi trong lúc GC đang quét (edit xong, preview...) không bị ghi đè bằng bản cũ.
+    """
+    v = db.query(Video).filter(Video.id == video_id).with_for_update().first()
+    if v:
+        meta = dict(v.video_metadata or {})
+        prev = meta.get("prev_files") or []
+        kept = [e for e in prev if (e if isinstance(e, str) else (e or {}).get("path")) not in drop]
+        if len(kept) != len(prev):
+            meta["prev_files"] = kept
+            v.video_metadata = meta
+    db.commit()
+
+def owners(db: Session, key: str) -> List[str]:
+    """Ai đang tham chiếu key (video / rendition / asset + post dùng asset / blob / template)."""
+    out: List[str] = []
+    out += [f"video:{i}" for (i,) in db.query(Video.id).filter(
+        (Video.file_path == key) | (Video.thumbnail_path == key)).all()]
+    # prev_files / preview nằm trong JSON metadata
+    pattern = f'%"{escape_like(key)}"%'
+    out += [f"video:{i}:metadata" for (i,) in db.query(Video.id).filter(
+        cast(Video.video_metadata, Text).like(literal(pattern), escape="!")).all()]
+    out += [f"rendition:{i}" for (i,) in db.query(VideoRendition.id).filter(VideoRendition.path == key).all()]
+    for asset_id, post_id in (
+        db.query(MediaAsset.id, PostMedia.post_id)
+        .outerjoin(PostMedia, PostMedia.media_id == MediaAsset.id)
+        .filter(MediaAsset.path == key).all()
+    ):
+        out.append(f"asset:{asset_id}" + (f":post:{post_id}" if post_id else ""))
+    out += [f"blob:{sha[:12]}" for (sha,) in db.query(MediaBlob.sha256).filter(MediaBlob.path == key).all()]
+    out += [f"template:{i}" for (i,) in db.query(Template.id).filter(Template.content == key).all()]
+    return out
+
+def try_gc_lock(conn: Connection) -> bool:
+    # advisory lock gắn với connection -> caller giữ nguyên 1 Connection cho tới khi unlock
+    if conn.dialect.name != "postgresql":
+        return True
+    got = bool(conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": GC_LOCK_KEY}).scalar())
+    conn.commit()
+    return got
+
+def release_gc_lock(conn: Connection) -> None:
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": GC_LOCK_KEY})
+        conn.commit()
@@ -2,9 +2,11 @@
 
 
 from sqlalchemy.orm import Session
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from app.models.media_models import MediaAsset
 from sqlalchemy import or_
+from app.core.pagination import paginate_keyset
+from app.core import text_search
 
 
 def create(db: Session, **fields) -> MediaAsset:
@@ -23,11 +25,25 @@ def list_assets(
     if type_filter: qy = qy.filter(MediaAsset.type == type_filter)
     if mime: qy = qy.filter(MediaAsset.mime_type == mime)
     if q:
-        like = f"%{q}%"
-        qy = qy.filter(or_(MediaAsset.path.ilike(like)))
+        qy = qy.filter(text_search.contains(MediaAsset.path, q))
     # time_filter ("7d","30d") nên xử lý ở service → chuyển sang khoảng created_at
     return qy.order_by(MediaAsset.id.desc()).offset(offset).limit(limit).all()
 
+def list_assets_page(
+    db: Session,
+    type_filter: Optional[str] = None,
+    q: Optional[str] = None,
+    mime: Optional[str] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+) -> Tuple[List[MediaAsset], Optional[str]]:
+    qy = db.query(MediaAsset)
+    if type_filter: qy = qy.filter(MediaAsset.type == type_filter)
+    if mime: qy = qy.filter(MediaAsset.mime_type == mime)
+    if q:
+        qy = qy.filter(text_search.contains(MediaAsset.path, q))
+    return paginate_keyset(qy, MediaAsset, limit=limit, cursor=cursor)
+
 def get(db: Session, asset_id: int) -> MediaAsset | None:
     return db.query(MediaAsset).filter(MediaAsset.id == asset_id).first()
 
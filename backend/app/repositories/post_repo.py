@@ -1,7 +1,10 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import or_, select, func
 from app.models.post_models import Post, PostTarget
+from app.core.pagination import paginate_keyset
+from app.core import text_search
 
 # Post
 
@@ -19,10 +22,23 @@ def post_list(
     if status:
         query = query.filter(Post.status == status)
     if q:
-        like = f"%{q}%"
-        query = query.filter(or_(Post.caption.ilike(like), Post.hashtags.ilike(like)))
+        query = query.filter(or_(text_search.contains(Post.caption, q), text_search.contains(Post.hashtags, q)))
     return query.order_by(Post.created_at.desc()).offset(offset).limit(limit).all()
 
+def post_list_page(
+    db: Session,
+    status: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Post], Optional[str]]:
+    query = db.query(Post)
+    if status:
+        query = query.filter(Post.status == status)
+    if q:
+        query = query.filter(or_(text_search.contains(Post.caption, q), text_search.contains(Post.hashtags, q)))
+    return paginate_keyset(query, Post, limit=limit, cursor=cursor)
+
 def post_create(db: Session, **data) -> Post:
     # Phòng ngừa key lạ
     data.pop("default_scheduled_time", None)
@@ -60,3 +76,49 @@ def target_bulk_create(db: Session, items: List[dict]) -> List[PostTarget]:
 def target_delete_for_post(db: Session, post_id: int) -> None:
     db.query(PostTarget).filter(PostTarget.post_id == post_id).delete(synchronize_session=False)
     db.commit()
+
+def claim_due_targets(db: Session, now: datetime, limit: int, exclude_platforms: Sequence[str] = ()) -> List[int]:
+    """
+    Nhận các target đến hạn (scheduled, scheduled_time <= now) -> status 'queued'.
+    FOR UPDATE SKIP LOCKED: nhiều worker chạy dispatcher cùng lúc không nhận trùng target.
+    """
+    stmt = (
+        select(PostTarget.id)
+        .where(PostTarget.status == "scheduled", PostTarget.scheduled_time <= now)
+        .order_by(PostTarget.scheduled_time)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if exclude_platforms:
+        stmt = stmt.where(PostTarget.platform.notin_(list(exclude_platforms)))
+    ids = list(db.scalars(stmt))
+    if ids:
+        db.query(PostTarget).filter(PostTarget.id.in_(ids)).update(
+            {"status": "queued", "updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return ids
+
+def release_stale_claims(db: Session, older_than: datetime) -> int:
+    """Target 'queued' mà worker nhận đã chết trước khi bắt đầu đăng -> trả về 'scheduled'."""
+    n = db.query(PostTarget).filter(PostTarget.status == "queued", PostTarget.updated_at < older_than).update(
+        {"status": "scheduled"}, synchronize_session=False)
+    db.commit()
+    return n
+
+def touch_posting(db: Session, target_id: int) -> None:
+    """Gia hạn target 'posting' đang upload lâu để release_stale_publishing không trả nó về 'scheduled'."""
+    locked = (select(PostTarget.id).where(PostTarget.id == target_id, PostTarget.status == "posting")
+              .with_for_update(skip_locked=True))
+    db.query(PostTarget).filter(PostTarget.id.in_(locked)).update(
+        {"updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+
+def release_stale_publishing(db: Session, older_than: datetime) -> int:
+    """
+    Target 'posting' quá lâu: worker chết giữa lúc đăng -> 'scheduled' để dispatcher nhận lại.
+    Không sợ đăng trùng: PostService._begin_attempt đối soát attempt dở dang trước khi đăng lại.
+    """
+    n = db.query(PostTarget).filter(PostTarget.status == "posting", PostTarget.updated_at < older_than).update(
+        {"status": "scheduled", "updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+    return n
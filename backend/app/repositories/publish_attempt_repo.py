@@ -0,0 +1,65 @@
+from typing import Optional
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.post_models import PublishAttempt
+
+def get_by_key(db: Session, key: str) -> Optional[PublishAttempt]:
+    return db.query(PublishAttempt).filter(PublishAttempt.idempotency_key == key).first()
+
+def claim(db: Session, *, key: str, target_id: int, platform: str) -> Optional[PublishAttempt]:
+    """
+    Ghi attempt 'pending' cho key (commit ngay, trước khi gọi API). Key đã có chỉ nhận lại được khi
+    đang 'failed' -> None nếu đã đăng / worker khác đang đăng / chưa đối soát.
+    """
+    t = PublishAttempt.__table__
+    stmt = (
+        pg_insert(t)
+        .values(idempotency_key=key, target_id=target_id, platform=platform, status="pending",
+                tries=1, started_at=func.now())
+        .on_conflict_do_update(
+            index_elements=["idempotency_key"],
+            set_={"status": "pending", "tries": t.c.tries + 1, "started_at": func.now(),
+                  "error_message": None, "updated_at": func.now()},
+            where=t.c.status == "failed",
+        )
+        .returning(t.c.id)
+    )
+    row = db.execute(stmt).first()
+    db.commit()
+    return db.get(PublishAttempt, row.id, populate_existing=True) if row else None
+
+def renew(db: Session, attempt_id: int) -> None:
+    """Heartbeat cho attempt 'pending' đang upload (updated_at = mốc tính lease). SKIP LOCKED: không chờ khoá."""
+    t = PublishAttempt.__table__
+    locked = select(t.c.id).where(t.c.id == attempt_id, t.c.status == "pending").with_for_update(skip_locked=True)
+    db.execute(update(PublishAttempt).where(PublishAttempt.id.in_(locked)).values(updated_at=func.now())
+               .execution_options(synchronize_session=False))
+    db.commit()
+
+def abandon(db: Session, obj: PublishAttempt, reason: str) -> bool:
+    """
+    Đối soát xong, nền tảng không có bài -> 'failed' để claim lại. Chỉ đổi nếu attempt vẫn đúng
+    lượt đã đọc (status + started_at): worker khác vừa nhận lại thì không ghi đè.
+    """
+    res = db.execute(
+        update(PublishAttempt)
+        .where(PublishAttempt.id == obj.id, PublishAttempt.status == obj.status,
+               PublishAttempt.started_at == obj.started_at)
+        .values(status="failed", error_message=reason, updated_at=func.now())
+    )
+    db.commit()
+    return res.rowcount == 1
+
+def finish(db: Session, obj: PublishAttempt, status: str, *, platform_post_id: Optional[str] = None,
+           error_message: Optional[str] = None) -> PublishAttempt:
+    """
+    Kết quả attempt; commit chung với thay đổi của target đang nằm trong session.
+    updated_at = lúc kết thúc: attempt 'unknown' được đối soát trong cửa sổ tới mốc này, không phải heartbeat cuối.
+    """
+    obj.status = status
+    obj.platform_post_id = platform_post_id
+    obj.error_message = error_message
+    obj.updated_at = func.now()
+    db.add(obj); db.commit()
+    return obj
@@ -0,0 +1,48 @@
+
+
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from app.models.video_models import VideoRendition
+
+STALE_PROCESSING = timedelta(hours=1)
+
+def get(db: Session, video_id: int, profile: str) -> Optional[VideoRendition]:
+    return (
+        db.query(VideoRendition)
+        .filter(VideoRendition.video_id == video_id, VideoRendition.profile == profile)
+        .first()
+    )
+
+def list_for_video(db: Session, video_id: int) -> List[VideoRendition]:
+    return db.query(VideoRendition).filter(VideoRendition.video_id == video_id).order_by(VideoRendition.profile).all()
+
+def claim(db: Session, video_id: int, profile: str, source_path: str) -> Optional[VideoRendition]:
+    """
+    Đánh dấu processing cho (video, profile). Trả None nếu worker khác đang render
+    đúng source này (tránh 2 ffmpeg cùng làm 1 việc); job treo quá STALE thì cho nhận lại.
+    """
+    t = VideoRendition.__table__
+    stale_before = datetime.now(timezone.utc) - STALE_PROCESSING
+    stmt = (
+        pg_insert(t)
+        .values(video_id=video_id, profile=profile, source_path=source_path, status="processing")
+        .on_conflict_do_update(
+            constraint="uq_video_renditions_video_id_profile",
+            set_={"source_path": source_path, "status": "processing", "error_message": None,
+                  "updated_at": func.now()},
+            where=~((t.c.status == "processing") & (t.c.source_path == source_path)
+                    & (t.c.updated_at > stale_before)),
+        )
+        .returning(t.c.id)
+    )
+    row = db.execute(stmt).first()
+    db.commit()
+    return db.get(VideoRendition, row.id, populate_existing=True) if row else None
+
+def update(db: Session, obj: VideoRendition, data: dict) -> VideoRendition:
+    for k, v in data.items():
+        setattr(obj, k, v)
+    db.add(obj); db.commit(); db.refresh(obj); return obj
@@ -4,6 +4,7 @@ from typing import Optional, List
 
 from app.models.roles_models import Role
 from app.models.auth_models import User
+from app.core import text_search
 
 # Roles
 def create_role(db: Session, **fields) -> Role:
@@ -50,8 +51,7 @@ def list_users(db: Session, role_id: Optional[int] = None, is_active: Optional[b
     if is_active is not None:
         qy = qy.filter(User.is_active == is_active)
     if q:
-        like = f"%{q}%"
-        qy = qy.filter(or_(User.username.ilike(like), User.email.ilike(like)))
+        qy = qy.filter(or_(text_search.contains(User.username, q), text_search.contains(User.email, q)))
     if role_id:
         qy = qy.join(User.roles).filter(Role.id == role_id)
     return qy.order_by(User.created_at.desc()).all()
@@ -0,0 +1,116 @@
+
+
+
+from typing import List, Dict, Any
+from sqlalchemy.orm import Session
+from sqlalchemy import or_, func
+
+from app.core import text_search as ts
+from app.models.post_models import Post
+from app.models.video_models import Video
+from app.models.media_models import MediaAsset
+from app.models.channel_models import Channel
+from app.models.auth_models import User
+
+# rank = ts_rank_cd (khớp từ, có trọng số A/B) + similarity trigram (khớp chuỗi con / gõ sai)
+
+def search_posts(db: Session, q: str, limit: int = 20) -> List[Dict[str, Any]]:
+    tsq = ts.ts_query(q)
+    rank = (func.ts_rank_cd(Post.search_vector, tsq) + func.greatest(
+        ts.similarity(Post.caption, q), ts.similarity(Post.hashtags, q))).label("rank")
+    rows = (
+        db.query(Post.id, Post.caption, Post.hashtags, Post.status, rank)
+        .filter(or_(
+            Post.search_vector.op("@@")(tsq),
+            ts.contains(Post.caption, q),
+            ts.contains(Post.hashtags, q),
+        ))
+        .order_by(rank.desc(), Post.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"type": "post", "id": r.id, "title": (r.caption or "")[:120], "subtitle": r.hashtags,
+         "status": r.status, "rank": float(r.rank or 0)}
+        for r in rows
+    ]
+
+def search_videos(db: Session, q: str, limit: int = 20) -> List[Dict[str, Any]]:
+    tsq = ts.ts_query(q)
+    rank = (func.ts_rank_cd(Video.search_vector, tsq) + func.greatest(
+        ts.similarity(Video.title, q), ts.similarity(Video.description, q))).label("rank")
+    rows = (
+        db.query(Video.id, Video.title, Video.description, Video.status, rank)
+        .filter(or_(
+            Video.search_vector.op("@@")(tsq),
+            ts.contains(Video.title, q),
+            ts.contains(Video.description, q),
+        ))
+        .order_by(rank.desc(), Video.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"type": "video", "id": r.id, "title": r.title, "subtitle": (r.description or "")[:120] or None,
+         "status": r.status, "rank": float(r.rank or 0)}
+        for r in rows
+    ]
+
+def search_media(db: Session, q: str, limit: int = 20) -> List[Dict[str, Any]]:
+    rank = ts.similarity(MediaAsset.path, q).label("rank")
+    rows = (
+        db.query(MediaAsset.id, MediaAsset.path, MediaAsset.type, rank)
+        .filter(ts.contains(MediaAsset.path, q))
+        .order_by(rank.desc(), MediaAsset.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"type": "media", "id": r.id, "title": r.path.rsplit("/", 1)[-1], "subtitle": r.type,
+         "status": None, "rank": float(r.rank or 0)}
+        for r in rows
+    ]
+
+def search_channels(db: Session, q: str, limit: int = 20) -> List[Dict[str, Any]]:
+    tsq = ts.ts_query(q)
+    rank = (func.ts_rank_cd(Channel.search_vector, tsq) + func.greatest(
+        ts.similarity(Channel.name, q), ts.similarity(Channel.username, q))).label("rank")
+    rows = (
+        db.query(Channel.id, Channel.name, Channel.username, Channel.platform, rank)
+        .filter(or_(
+            Channel.search_vector.op("@@")(tsq),
+            ts.contains(Channel.name, q),
+            ts.contains(Channel.username, q),
+        ))
+        .order_by(rank.desc(), Channel.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"type": "channel", "id": r.id, "title": r.name, "subtitle": getattr(r.platform, "value", r.platform),
+         "status": None, "rank": float(r.rank or 0)}
+        for r in rows
+    ]
+
+def search_users(db: Session, q: str, limit: int = 20) -> List[Dict[str, Any]]:
+    rank = func.greatest(ts.similarity(User.username, q), ts.similarity(User.email, q)).label("rank")
+    rows = (
+        db.query(User.id, User.username, User.email, User.is_active, rank)
+        .filter(or_(ts.contains(User.username, q), ts.contains(User.email, q)))
+        .order_by(rank.desc(), User.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [
+        {"type": "user", "id": r.id, "title": r.username, "subtitle": r.email,
+         "status": "active" if r.is_active else "inactive", "rank": float(r.rank or 0)}
+        for r in rows
+    ]
+
+SEARCHERS = {
+    "posts": search_posts,
+    "videos": search_videos,
+    "media": search_media,
+    "channels": search_channels,
+    "users": search_users,
+}
@@ -2,9 +2,12 @@
 
 
 from sqlalchemy.orm import Session
-from typing import Optional, List
-from sqlalchemy import or_
+from datetime import datetime
+from typing import Optional, List, Tuple
+from sqlalchemy import or_, and_, not_, select, func, update as sa_update
 from app.models.video_models import Video
+from app.core.pagination import paginate_keyset
+from app.core import text_search
 
 def get_by_id(db: Session, id_: int) -> Optional[Video]:
     return db.query(Video).filter(Video.id == id_).first()
@@ -12,6 +15,37 @@ def get_by_id(db: Session, id_: int) -> Optional[Video]:
 def list_queue(db: Session) -> List[Video]:
     return db.query(Video).filter(Video.status.in_(["processing", "error"])).order_by(Video.id.desc()).all()
 
+def existing_ids(db: Session, ids: List[int]) -> List[int]:
+    return [r[0] for r in db.query(Video.id).filter(Video.id.in_(ids)).all()]
+
+def claim_pending_imports(db: Session, stale_before: datetime) -> List[int]:
+    """
+    Nhận các import URL đang dở (file_path rỗng) mà không worker nào giữ: updated_at cũ hơn
+    stale_before (worker đang tải ghi tiến độ / heartbeat đều đặn). Cùng câu UPDATE đặt lại updated_at,
+    SKIP LOCKED -> nhiều worker khởi động cùng lúc không nhận trùng 1 video.
+    """
+    last = func.coalesce(Video.updated_at, Video.created_at)
+    candidates = (
+        select(Video.id)
+        .where(Video.status == "processing", Video.original_url.isnot(None), Video.file_path == "",
+               last < stale_before)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        sa_update(Video).where(Video.id.in_(candidates)).values(updated_at=func.now())
+        .returning(Video.id).execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted(r[0] for r in rows)
+
+def touch_imports(db: Session, ids: List[int]) -> None:
+    # heartbeat cho import worker này đang giữ (kể cả đang chờ semaphore) -> worker khác không nhận lại
+    if not ids:
+        return
+    db.query(Video).filter(Video.id.in_(ids), Video.status == "processing").update(
+        {"updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+
 def list(
     db: Session,
     status: Optional[str] = None,
@@ -22,10 +56,28 @@ def list(
     qy = db.query(Video)
     if status: qy = qy.filter(Video.status == status)
     if q:
-        like = f"%{q}%"
-        qy = qy.filter(or_(Video.title.ilike(like), Video.description.ilike(like)))
+        qy = qy.filter(or_(text_search.contains(Video.title, q), text_search.contains(Video.description, q)))
     return qy.order_by(Video.id.desc()).offset(offset).limit(limit).all()
 
+def list_page(
+    db: Session,
+    status: Optional[str] = None,
+    source: Optional[str] = None,
+    q: Optional[str] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Video], Optional[str]]:
+    qy = db.query(Video)
+    if status: qy = qy.filter(Video.status == status)
+    if source:  # tiktok/youtube/douyin/upload
+        if source.lower() == "upload":
+            qy = qy.filter(Video.source_platform.is_(None))
+        else:
+            qy = qy.filter(Video.source_platform.ilike(source))
+    if q:
+        qy = qy.filter(or_(text_search.contains(Video.title, q), text_search.contains(Video.description, q)))
+    return paginate_keyset(qy, Video, limit=limit, cursor=cursor)
+
 def create(db: Session, **fields) -> Video:
     obj = Video(**fields)
     db.add(obj); db.commit(); db.refresh(obj)
@@ -37,6 +89,57 @@ def update(db: Session, obj: Video, data: dict) -> Video:
     db.add(obj); db.commit(); db.refresh(obj)
     return obj
 
+# video đang có edit nền giữ (last_edit.status = processing). "processing" vì lý do khác
+# (upload remove_watermark, import) không có job edit nào giữ -> không chặn edit
+_EDIT_STATE = func.coalesce(Video.video_metadata["last_edit"]["status"].as_string(), "")
+EDITING = and_(Video.status == "processing", _EDIT_STATE == "processing")
+
+def is_editing(obj: Video) -> bool:
+    return obj.status == "processing" and \
+        ((obj.video_metadata or {}).get("last_edit") or {}).get("status") == "processing"
+
+def begin_processing(db: Session, obj: Video, meta: dict) -> bool:
+    """
+    -> processing cho 1 edit nền bằng UPDATE có điều kiện (chưa có edit nào giữ, file chưa đổi):
+    False nếu edit khác vừa nhận video -> 2 request đồng thời không cùng render trên 1 file.
+    """
+    res = db.execute(
+        sa_update(Video)
+        .where(Video.id == obj.id, not_(EDITING), Video.file_path == obj.file_path)
+        .values(status="processing", video_metadata=meta, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    db.refresh(obj)
+    return res.rowcount == 1
+
+def touch_edits(db: Session, ids: List[int]) -> None:
+    # heartbeat cho edit nền worker này đang giữ (kể cả đang xếp hàng trong pool)
+    if not ids:
+        return
+    db.query(Video).filter(Video.id.in_(ids), EDITING).update(
+        {"updated_at": func.now()}, synchronize_session=False)
+    db.commit()
+
+def reset_stale_edits(db: Session, stale_before: datetime) -> List[int]:
+    """
+    Edit nền không còn heartbeat (worker chết / restart / job bị huỷ khỏi pool) -> trả video về ready,
+    last_edit = failed. File gốc chưa bị thay (chỉ _final_job đổi file_path) nên video vẫn dùng được.
+    """
+    rows = (
+        db.query(Video)
+        .filter(EDITING, func.coalesce(Video.updated_at, Video.created_at) < stale_before)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    for v in rows:
+        meta = dict(v.video_metadata or {})
+        meta["last_edit"] = {**(meta.get("last_edit") or {}), "status": "failed", "error": "edit interrupted"}
+        v.video_metadata = meta
+        v.status = "ready" if v.file_path else "error"
+    db.commit()
+    return [v.id for v in rows]
+
 def delete(db: Session, obj: Video) -> None:
     db.delete(obj); db.commit()
 
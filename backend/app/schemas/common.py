@@ -1,3 +1,4 @@
+from typing import Generic, List, Optional, TypeVar
 from pydantic import BaseModel, ConfigDict
 from enum import Enum
 
@@ -22,6 +23,7 @@ class TemplateType(str, Enum):
     caption = "caption"
     hashtag = "hashtag"
     watermark = "watermark"
+    frame = "frame"
     thumbnail = "thumbnail"
 
 class ChannelPlatformEnum(str, Enum):
@@ -36,4 +38,12 @@ class ChannelPlatformEnum(str, Enum):
 ChannelPlatform = ChannelPlatformEnum
 
 class ORMModel(BaseModel):
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+T = TypeVar("T")
+
+class CursorPage(BaseModel, Generic[T]):
+    """Trang kết quả keyset: gửi lại next_cursor để lấy trang kế tiếp."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+    total_estimate: Optional[int] = None
@@ -0,0 +1,7 @@
+
+
+from pydantic import BaseModel
+
+class HashtagSuggestion(BaseModel):
+    tag: str
+    posts: int = 0
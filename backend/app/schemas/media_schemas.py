@@ -1,6 +1,7 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, computed_field
+from app.core import media_delivery
 from .common import ORMModel
 
 class MediaAssetOut(ORMModel):
@@ -9,6 +10,7 @@ class MediaAssetOut(ORMModel):
     path: str
     mime_type: Optional[str] = None
     size: Optional[int] = None
+    content_hash: Optional[str] = None
 
     # Đặt tên field là media_metadata, xuất JSON với key "metadata"
     media_metadata: Dict[str, Any] = Field(
@@ -23,6 +25,14 @@ class MediaAssetOut(ORMModel):
 
     model_config = ConfigDict(from_attributes=True, populate_by_name=True)
 
+    @computed_field
+    @property
+    def thumb_url(self) -> Optional[str]:
+        # grid view dùng thumbnail nhỏ thay vì tải ảnh/video gốc
+        if self.type not in ("image", "video"):
+            return None
+        return media_delivery.thumb_url("media", self.id, self.path)
+
     @field_validator("media_metadata", mode="before")
     @classmethod
     def coerce_metadata(cls, v):
@@ -41,4 +51,8 @@ class MediaAssetOut(ORMModel):
 class MediaUpdateIn(BaseModel):
     path: Optional[str] = None
     mime_type: Optional[str] = None
-    metadata: Optional[Dict[str, Any]] = None
\ No newline at end of file
+    metadata: Optional[Dict[str, Any]] = None
+class MediaFromHashIn(BaseModel):
+    sha256: str = Field(..., min_length=64, max_length=64, pattern=r"^[0-9a-fA-F]{64}$")
+    filename: Optional[str] = None
+    mime_type: Optional[str] = None
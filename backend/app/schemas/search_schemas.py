@@ -0,0 +1,16 @@
+
+
+from typing import Optional, List, Dict
+from pydantic import BaseModel
+
+class SearchHit(BaseModel):
+    type: str
+    id: int
+    title: Optional[str] = None
+    subtitle: Optional[str] = None
+    status: Optional[str] = None
+    rank: float = 0.0
+
+class SearchOut(BaseModel):
+    q: str
+    results: Dict[str, List[SearchHit]]
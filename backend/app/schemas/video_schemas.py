@@ -2,7 +2,8 @@
 
 from typing import Optional, List, Dict, Any, Literal
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, computed_field
+from app.core import media_delivery
 from .common import ORMModel, VideoStatus
 
 class VideoImportIn(BaseModel):
@@ -10,11 +11,14 @@ class VideoImportIn(BaseModel):
     source_platform: Optional[str] = None
     remove_watermark: bool = False
     use_proxy: bool = False
+    # url -> checksum mong đợi: "sha256:<hex>" | "md5:<hex>"
+    checksums: Optional[Dict[str, str]] = None
 
 class VideoProcessIn(BaseModel):
     ids: List[int]
     add_watermark_template_id: Optional[int] = None
     add_frame_template_id: Optional[int] = None
+    platform: Optional[str] = None   # preset/CRF bản final theo platform đích
 
 class VideoOut(ORMModel):
     id: int
@@ -28,6 +32,13 @@ class VideoOut(ORMModel):
     duration: Optional[float] = None
     resolution: Optional[str] = None
     format: str
+    width: Optional[int] = None
+    height: Optional[int] = None
+    video_codec: Optional[str] = None
+    audio_codec: Optional[str] = None
+    bitrate: Optional[int] = None
+    fps: Optional[float] = None
+    rotation: Optional[int] = None
     thumbnail_path: Optional[str] = None
     video_metadata: Optional[Dict[str, Any]] = Field(default=None)  # giữ cùng tên model
     status: VideoStatus
@@ -35,6 +46,14 @@ class VideoOut(ORMModel):
     created_at: datetime
     updated_at: Optional[datetime] = None
 
+    @computed_field
+    @property
+    def thumb_url(self) -> Optional[str]:
+        # poster qua /videos/{id}/thumb: version theo file hiện tại -> edit xong URL đổi, không dính cache cũ
+        if not self.file_path:
+            return None
+        return media_delivery.thumb_url("videos", self.id, self.file_path)
+
 class VideoUpdateIn(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
@@ -42,26 +61,91 @@ class VideoUpdateIn(BaseModel):
     thumbnail_path: Optional[str] = None
     video_metadata: Optional[Dict[str, Any]] = None
 
-class TrimIn(BaseModel):
+class EncodeOptions(BaseModel):
+    # preview: bản nháp nhanh, không thay file gốc; final: thay file_path (xem core/encoding.py)
+    tier: Literal["preview", "final"] = "final"
+    platform: Optional[str] = None   # final: preset/CRF theo platform đích
+    background: bool = False         # final: trả về ngay (status=processing), render trên worker
+
+class TrimIn(EncodeOptions):
     video_id: int
     start: float = 0.0          
     end: float | None = None   
     reencode: bool = False      
+    # None = theo reencode (copy/reencode); "smart" = chỉ encode lại GOP ở 2 đầu cắt
+    mode: Optional[Literal["copy", "reencode", "smart"]] = None
 
-class CropIn(BaseModel):
+class CropIn(EncodeOptions):
     video_id: int
     width: int
     height: int
     x: int = 0
     y: int = 0
 
-class WatermarkIn(BaseModel):
+class WatermarkIn(EncodeOptions):
     video_id: int
-    watermark_path: str        
+    watermark_path: Optional[str] = None
+    template_id: Optional[int] = None   # template type=watermark, thay cho watermark_path/x/y/opacity
     x: int = 10
     y: int = 10
     opacity: float = 1.0        
 
 class ThumbnailIn(BaseModel):
     video_id: int
-    method: Literal["scene","middle"] = "scene"  
\ No newline at end of file
+    method: Literal["scene","middle"] = "scene"  
+class PreflightOut(BaseModel):
+    platform: str
+    profile: str
+    ok: bool
+    needs_transcode: bool
+    fixable: List[str] = []
+    fatal: List[str] = []
+
+class RenditionsIn(BaseModel):
+    platforms: List[str]
+
+class RenditionOut(ORMModel):
+    id: int
+    video_id: int
+    profile: str
+    path: Optional[str] = None
+    size: Optional[int] = None
+    status: str
+    error_message: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+class VideoProcessResultOut(BaseModel):
+    video_id: int
+    status: Literal["queued", "recorded", "skipped"]
+    reason: Optional[str] = None   # skipped: "not found" | "no file" | "busy"
+    video: Optional[VideoOut] = None
+
+class VideoBatchIn(BaseModel):
+    op: Literal["trim", "crop", "watermark", "thumbnail"]
+    video_ids: List[int] = Field(min_length=1, max_length=1000)
+    # tham số giống endpoint đơn lẻ (trừ video_id), vd trim: {"start": 0, "end": 30, "mode": "smart"}
+    params: Dict[str, Any] = Field(default_factory=dict)
+    parallelism: Optional[int] = Field(default=None, ge=1, le=64)  # None = kích thước pool
+
+class VideoBatchItemOut(ORMModel):
+    id: int
+    video_id: int
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error_message: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class VideoBatchOut(BaseModel):
+    id: int
+    op: str
+    spec: Optional[Dict[str, Any]] = None
+    status: str
+    parallelism: int
+    total: int
+    counts: Dict[str, int]
+    progress: float
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    items: Optional[List[VideoBatchItemOut]] = None
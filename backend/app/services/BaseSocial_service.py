@@ -2,61 +2,39 @@ from abc import ABC
 from typing import Dict, Any, Optional
 from fastapi import HTTPException
 import httpx
-import asyncio
 import logging
 
+from app.core import upstream
+
 class BaseSocialService(ABC):
     """Base class for all social media services"""
-    
+
+    # tên nền tảng cho rate limiter / circuit breaker (app/core/upstream.py)
+    platform: str = ""
+
     def __init__(self):
         self.timeout = 30
-        self.max_retries = 3
         self.logger = logging.getLogger(self.__class__.__name__)
-    
-    async def _make_request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
-        """Enhanced request handler với proper logging"""
-        backoff = 1.0
-        last_err: Optional[Exception] = None
-        for attempt in range(1, self.max_retries + 1):
+
+    async def _make_request(self, method: str, url: str, *, endpoint: str = "read",
+                            channel: Optional[str] = None, cost: float = 1.0, **kwargs) -> Dict[str, Any]:
+        """
+        Enhanced request handler với proper logging.
+        endpoint/channel chọn bucket rate limit (vd endpoint="publish", channel=page_id).
+        Retry/backoff nằm ở upstream.request(); nền tảng đang lỗi -> UpstreamUnavailable (503/504)
+        để caller hoãn việc thay vì retry trong request handler.
+        """
+        async with httpx.AsyncClient(timeout=self.timeout) as client:
+            resp = await upstream.request(client, method, url, platform=self.platform or "unknown",
+                                          endpoint=endpoint, channel=channel, cost=cost, **kwargs)
+        if resp.status_code >= 400:
+            self.logger.warning(f"HTTP {resp.status_code} {method} {url}")
             try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    resp = await client.request(method, url, **kwargs)
-                    # raise for 4xx/5xx
-                    resp.raise_for_status()
-                    try:
-                        return resp.json()
-                    except Exception:
-                        return {"status_code": resp.status_code, "text": resp.text}
-            except httpx.HTTPStatusError as e:
-                status_code = e.response.status_code if e.response else 0
-                self.logger.warning(f"HTTP {status_code} {method} {url} attempt {attempt}: {e}")
-                last_err = e
-                if status_code in (429, 500, 502, 503, 504) and attempt < self.max_retries:
-                    await asyncio.sleep(backoff)
-                    backoff *= 2
-                    continue
-                # Non-retryable or last attempt
-                detail = None
-                try:
-                    detail = e.response.json()
-                except Exception:
-                    detail = e.response.text if e.response else str(e)
-                raise HTTPException(status_code=502, detail={"error": "upstream_error", "detail": detail})
-            except (httpx.TimeoutException, httpx.ReadTimeout) as e:
-                self.logger.warning(f"Timeout {method} {url} attempt {attempt}")
-                last_err = e
-                if attempt < self.max_retries:
-                    await asyncio.sleep(backoff)
-                    backoff *= 2
-                    continue
-                raise HTTPException(status_code=504, detail="Upstream timeout")
-            except Exception as e:
-                self.logger.exception(f"Error {method} {url} attempt {attempt}: {e}")
-                last_err = e
-                if attempt < self.max_retries:
-                    await asyncio.sleep(backoff)
-                    backoff *= 2
-                    continue
-                raise HTTPException(status_code=500, detail=str(e))
-        # should not reach
-        raise HTTPException(status_code=500, detail=str(last_err or "Unknown error"))
\ No newline at end of file
+                detail = resp.json()
+            except Exception:
+                detail = resp.text
+            raise HTTPException(status_code=502, detail={"error": "upstream_error", "detail": detail})
+        try:
+            return resp.json()
+        except Exception:
+            return {"status_code": resp.status_code, "text": resp.text}
@@ -1,9 +1,10 @@
 
 
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from sqlalchemy.orm import Session
 from app.repositories.analytics_repo import AnalyticsRepo
+from app.services.hashtag_service import normalize_tag
 
 class AnalyticsService:
     @staticmethod
@@ -40,3 +41,18 @@ class AnalyticsService:
                 "default_scheduled_time": post.default_scheduled_time,
             })
         return items
+
+    @staticmethod
+    def hashtags(db: Session, limit: int = 20, prefix: Optional[str] = None) -> List[Dict[str, Any]]:
+        rows = AnalyticsRepo.hashtags(db, limit=limit, prefix=normalize_tag(prefix) if prefix else None)
+        return [
+            {
+                "tag": r.tag,
+                "posts": int(r.posts or 0),
+                "views": int(r.views or 0),
+                "reactions": int(r.reactions or 0),
+                "comments": int(r.comments or 0),
+                "shares": int(r.shares or 0),
+            }
+            for r in rows
+        ]
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple, Type
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from app.core import video_workers
+from app.core.database import SessionLocal
+from app.core.settings import get_settings
+from app.core.encoding import tier_for
+from app.repositories import batch_repo, video_repo
+from app.models.video_models import Video, VideoBatch
+from app.schemas.video_schemas import VideoBatchIn, TrimIn, CropIn, WatermarkIn, ThumbnailIn
+from app.services.video_service import VideoService
+
+logger = logging.getLogger(__name__)
+
+# op -> (schema tham số của endpoint đơn lẻ, method VideoService)
+OPS: Dict[str, Tuple[Type[BaseModel], str]] = {
+    "trim": (TrimIn, "trim"),
+    "crop": (CropIn, "crop"),
+    "watermark": (WatermarkIn, "watermark"),
+    "thumbnail": (ThumbnailIn, "thumbnail_auto"),
+}
+MAX_PARALLELISM = 64
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _result(v: Video) -> Dict[str, Any]:
+    meta = v.video_metadata or {}
+    return {
+        "file_path": v.file_path, "file_size": v.file_size, "duration": v.duration,
+        "thumbnail_path": v.thumbnail_path, "preview": meta.get("preview"),
+    }
+
+
+class BatchService:
+    """
+    Chạy 1 op (trim/crop/watermark/thumbnail) trên nhiều video: 1 batch id, tiến độ tổng + kết quả
+    từng item. Mỗi item gọi đúng method của endpoint đơn lẻ (ffmpeg chạy trên video_workers);
+    parallelism giới hạn số item của batch chạy cùng lúc, pool giới hạn tổng trên máy.
+    Nhiều worker: batch do worker tạo ra chạy, heartbeat updated_at; quá VIDEO_BATCH_LEASE_SECONDS
+    không có heartbeat thì worker khác nhận lại (item đang chạy dở -> failed, item pending chạy tiếp).
+    """
+
+    _tasks: Dict[int, asyncio.Task] = {}
+    _lease_task: Optional[asyncio.Task] = None  # heartbeat batch đang chạy + nhận lại batch của worker đã chết
+
+    def __init__(self):
+        self.videos = VideoService()
+
+    def _item_body(self, op: str, params: Dict[str, Any], video_id: int) -> BaseModel:
+        schema, _ = OPS[op]
+        data = {**params, "video_id": video_id}
+        if "background" in schema.model_fields:
+            data["background"] = False  # item phải chạy xong trong job của batch để ghi được kết quả
+        return schema(**data)
+
+    async def create(self, db: Session, payload: VideoBatchIn) -> VideoBatch:
+        if payload.op not in OPS:
+            raise HTTPException(422, f"Unsupported op, allowed: {', '.join(OPS)}")
+        ids = list(dict.fromkeys(payload.video_ids))
+        try:
+            self._item_body(payload.op, payload.params, ids[0])  # validate tham số 1 lần trước khi fan out
+        except ValidationError as e:
+            raise HTTPException(422, e.errors(include_url=False))
+        missing = sorted(set(ids) - set(video_repo.existing_ids(db, ids)))
+        if missing:
+            raise HTTPException(404, f"Videos not found: {missing[:20]}")
+
+        # mặc định: đủ item để lấp đầy pool mà op dùng
+        pool = tier_for(payload.params.get("tier", "final")).pool
+        parallelism = min(payload.parallelism or video_workers.POOL_SIZES[pool], MAX_PARALLELISM)
+        batch = batch_repo.create(db, payload.op, payload.params, ids, parallelism)
+        self.start(batch.id)
+        return batch
+
+    def progress(self, db: Session, batch_id: int, include_items: bool = True) -> Dict[str, Any]:
+        batch = batch_repo.get(db, batch_id)
+        if not batch:
+            raise HTTPException(404, "Batch not found")
+        counts = batch_repo.counts(db, batch_id)
+        finished = counts.get("done", 0) + counts.get("failed", 0)
+        return {
+            "id": batch.id, "op": batch.op, "spec": batch.spec, "status": batch.status,
+            "parallelism": batch.parallelism, "total": batch.total,
+            "counts": {s: counts.get(s, 0) for s in ("pending", "running", "done", "failed")},
+            "progress": round(finished / batch.total, 4) if batch.total else 1.0,
+            "created_at": batch.created_at, "finished_at": batch.finished_at,
+            "items": batch_repo.list_items(db, batch_id) if include_items else None,
+        }
+
+    # ---------- chạy ----------
+    def start(self, batch_id: int) -> None:
+        cls = type(self)
+        if batch_id not in cls._tasks:
+            cls._tasks[batch_id] = asyncio.create_task(self._run(batch_id), name=f"video-batch-{batch_id}")
+
+    def resume_unfinished(self) -> int:
+        """
+        Gọi lúc startup: nhận batch dở dang của worker đã chết (hết lease) rồi chạy tiếp item pending,
+        và chạy heartbeat + quét lại định kỳ. Batch của worker còn sống không bị đụng tới.
+        """
+        n = self._claim_orphaned()
+        cls = type(self)
+        if cls._lease_task is None:
+            cls._lease_task = asyncio.create_task(self._lease_loop(), name="video-batch-lease")
+        return n
+
+    def _lease(self) -> int:
+        return max(30, int(get_settings().VIDEO_BATCH_LEASE_SECONDS))
+
+    def _claim_orphaned(self) -> int:
+        db = SessionLocal()
+        try:
+            ids = batch_repo.claim_orphaned(db, _now() - timedelta(seconds=self._lease()))
+            for bid in ids:
+                batch_repo.fail_interrupted(db, bid)
+        finally:
+            db.close()
+        for bid in ids:
+            self.start(bid)
+        return len(ids)
+
+    async def _lease_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._lease() / 3)
+            try:
+                db = SessionLocal()
+                try:
+                    batch_repo.touch(db, list(type(self)._tasks))
+                finally:
+                    db.close()
+                n = self._claim_orphaned()
+                if n:
+                    logger.info(f"Resumed {n} orphaned video batches")
+            except Exception:
+                logger.exception("Video batch heartbeat failed")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        if cls._lease_task is not None:
+            cls._lease_task.cancel()
+            await asyncio.gather(cls._lease_task, return_exceptions=True)
+            cls._lease_task = None
+        for t in list(cls._tasks.values()):
+            t.cancel()
+        await asyncio.gather(*cls._tasks.values(), return_exceptions=True)
+        cls._tasks.clear()
+
+    async def _run(self, batch_id: int) -> None:
+        db = SessionLocal()
+        try:
+            batch = batch_repo.get(db, batch_id)
+            if not batch:
+                return
+            batch = batch_repo.update(db, batch, {"status": "running"})
+            op, spec = batch.op, dict(batch.spec or {})
+            sem = asyncio.Semaphore(max(1, batch.parallelism))
+            items = batch_repo.list_items(db, batch_id, status="pending")
+            item_ids = [it.id for it in items]
+            db.commit()  # trả connection về pool: batch chờ item chạy hàng giờ không giữ connection
+            await asyncio.gather(*(self._run_item(sem, op, spec, iid) for iid in item_ids))
+
+            counts = batch_repo.counts(db, batch_id)
+            done, failed = counts.get("done", 0), counts.get("failed", 0)
+            status = "done" if not failed else ("failed" if not done else "partial")
+            batch_repo.update(db, batch, {"status": status, "finished_at": _now()})
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception(f"Video batch {batch_id} crashed")
+        finally:
+            db.close()
+            type(self)._tasks.pop(batch_id, None)
+
+    async def _run_item(self, sem: asyncio.Semaphore, op: str, spec: Dict[str, Any], item_id: int) -> None:
+        async with sem:
+            # session riêng mỗi item: các item chạy xen kẽ trên cùng event loop. VideoService đóng
+            # transaction trước khi chờ ffmpeg -> parallelism không bị giới hạn bởi pool connection DB
+            db = SessionLocal()
+            try:
+                # claim có điều kiện: item đã được worker khác nhận / đã xong thì bỏ qua
+                item = batch_repo.claim_item(db, item_id)
+                if item is None:
+                    return
+                try:
+                    body = self._item_body(op, spec, item.video_id)
+                    v = await getattr(self.videos, OPS[op][1])(db, body)
+                    data = {"status": "done", "result": _result(v), "error_message": None}
+                except HTTPException as e:
+                    db.rollback()
+                    data = {"status": "failed", "error_message": str(e.detail)[:2000]}
+                except Exception as e:
+                    logger.warning(f"Batch item {item_id} ({op} video {item.video_id}) failed: {e}")
+                    db.rollback()
+                    data = {"status": "failed", "error_message": str(e)[:2000]}
+                item = batch_repo.get_item(db, item_id)
+                batch_repo.update(db, item, {**data, "finished_at": _now()})
+            finally:
+                db.close()
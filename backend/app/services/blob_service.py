@@ -0,0 +1,127 @@
+import uuid
+import asyncio
+import hashlib
+import logging
+import aiofiles
+from pathlib import Path, PurePosixPath
+from typing import Optional, Tuple
+from fastapi import UploadFile, HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.settings import get_settings
+from app.core.storage import get_storage
+from app.repositories import blob_repo
+from app.models.blob_models import MediaBlob
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+class BlobService:
+    """
+    Lưu file theo nội dung, key: <MEDIA_ROOT>/blobs/ab/cd/<sha256><ext> (local hoặc S3).
+    Cùng nội dung -> cùng 1 object, media_blobs.ref_count đếm số row đang dùng.
+    """
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.media_root = Path(self.settings.MEDIA_ROOT)
+        self.blob_root = self.media_root / "blobs"
+        self.tmp_dir = self.blob_root / "tmp"
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.storage = get_storage()
+
+    def _rel(self, p: Path) -> str:
+        # path lưu DB giống MediaService: tương đối so với media_root.parent, dạng posix
+        return PurePosixPath(str(p.relative_to(self.media_root.parent))).as_posix()
+
+    def blob_path(self, sha256: str, ext: str = "") -> Path:
+        return self.blob_root / sha256[:2] / sha256[2:4] / f"{sha256}{ext.lower()}"
+
+    async def ingest(self, db: Session, file: UploadFile, mime_type: Optional[str] = None) -> Tuple[MediaBlob, bool]:
+        """
+        Stream file vào tmp đồng thời tính sha256 (không đọc cả file vào RAM).
+        Nếu nội dung đã có -> bỏ tmp, chỉ tăng ref_count. Trả (blob, created).
+        """
+        ext = Path(file.filename or "").suffix
+        tmp = self.tmp_dir / f"{uuid.uuid4().hex}.part"
+        h = hashlib.sha256()
+        size = 0
+        try:
+            async with aiofiles.open(tmp, "wb") as w:
+                while True:
+                    chunk = await file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    size += len(chunk)
+                    await w.write(chunk)
+        except Exception as e:
+            tmp.unlink(missing_ok=True)
+            raise HTTPException(500, f"Failed to save file: {str(e)}")
+
+        return await self.ingest_local(db, tmp, h.hexdigest(), size, ext, mime_type or file.content_type)
+
+    async def ingest_local(self, db: Session, tmp: Path, sha: str, size: int, ext: str = "",
+                           mime_type: Optional[str] = None) -> Tuple[MediaBlob, bool]:
+        """
+        File tạm đã có sẵn sha256 (upload / tải URL) -> blob. File tạm luôn bị move hoặc xoá.
+        Giữ lock(sha) từ lúc kiểm tra tới lúc ghi ref_count: release() cùng nội dung không thể xoá
+        row / file xen giữa. Local: put_file là rename nên giữ lock trong lúc đó không đáng kể.
+        """
+        try:
+            blob_repo.lock(db, sha)
+            existing = blob_repo.get_by_hash(db, sha)
+            if existing and await asyncio.to_thread(self.storage.exists, existing.path):
+                blob = blob_repo.incref(db, sha)
+                if blob:
+                    tmp.unlink(missing_ok=True)
+                    return blob, False
+                # row đã bị xoá (incref commit -> lock đã nhả): ingest lại như nội dung mới
+                blob_repo.lock(db, sha)
+                existing = blob_repo.get_by_hash(db, sha)
+
+            # row còn nhưng file mất -> khôi phục đúng key cũ
+            key = existing.path if existing else self._rel(self.blob_path(sha, ext))
+            try:
+                # local: rename atomic; S3: multipart upload song song (chạy ngoài event loop)
+                await asyncio.to_thread(self.storage.put_file, str(tmp), key, mime_type, True)
+            finally:
+                tmp.unlink(missing_ok=True)
+            return blob_repo.add_ref(db, sha256=sha, path=key, size=size, mime_type=mime_type)
+        except BaseException:
+            db.rollback()  # nhả lock
+            raise
+
+    async def acquire(self, db: Session, sha256: str) -> Optional[MediaBlob]:
+        """Thêm 1 tham chiếu tới blob đã có (upload trùng xong ngay khi biết hash)."""
+        sha256 = (sha256 or "").lower()
+        if not sha256:
+            return None
+        blob_repo.lock(db, sha256)
+        blob = blob_repo.get_by_hash(db, sha256)
+        if not blob or not await asyncio.to_thread(self.storage.exists, blob.path):
+            db.commit()
+            return None
+        return blob_repo.incref(db, blob.sha256)
+
+    def release(self, db: Session, sha256: Optional[str]) -> None:
+        """
+        Bỏ 1 tham chiếu; chỉ xoá file khi không còn row nào dùng. Xoá row và xoá file trong cùng
+        lock(sha) -> ingest cùng nội dung chờ tới khi xong, không ghi lại key rồi bị xoá dưới 1 row sống.
+        """
+        if not sha256:
+            return
+        try:
+            blob_repo.lock(db, sha256)
+            res = blob_repo.decref(db, sha256)
+            if res and res[0] == 0:
+                try:
+                    self.storage.delete(res[1])
+                except Exception as e:
+                    # row đã xoá -> file thành rác, GC nền dọn sau
+                    logger.warning(f"Failed to remove blob {res[1]}: {e}")
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
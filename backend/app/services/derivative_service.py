@@ -0,0 +1,147 @@
+import os
+import uuid
+import shutil
+import hashlib
+import asyncio
+import logging
+import subprocess
+from pathlib import Path, PurePosixPath
+from typing import List, Optional, Tuple
+from fastapi import HTTPException
+
+from app.core.settings import get_settings
+from app.core.storage import get_storage
+from app.core.media_delivery import content_hash_from_key
+from app.core.disk_cache import KeyedLocks, lru_for
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+FORMAT_ARGS = {
+    "jpg": ["-c:v", "mjpeg", "-q:v", "4"],
+    "webp": ["-c:v", "libwebp", "-quality", "75"],
+}
+# bộ lọc chọn khung cho video (ảnh thì bỏ qua)
+FRAME_SELECT = {
+    "scene": "select=gt(scene\\,0.4),thumbnail",
+    "middle": "thumbnail",
+}
+
+def _csv_ints(val: str) -> List[int]:
+    return sorted({int(x) for x in (val or "").split(",") if x.strip().isdigit()})
+
+def _csv(val: str) -> List[str]:
+    return [x.strip().lower() for x in (val or "").split(",") if x.strip()]
+
+
+class DerivativeService:
+    """
+    Thumbnail / poster nhiều kích thước cho ảnh & video, cache trên đĩa local.
+
+    - 1 lần decode: ffmpeg split -> scale ra mọi (size, format) trong cùng 1 lệnh
+    - key cache = hash nguồn + tham số -> file không bao giờ đổi nội dung
+    - sinh lười ở request đầu tiên, các request sau chỉ đọc file
+    - LRU theo tổng dung lượng: mtime được "touch" mỗi lần đọc, vượt ngưỡng thì xoá cũ nhất
+      (core/disk_cache.py: quét theo ngưỡng ước lượng / chu kỳ, không phải mỗi lần sinh)
+    """
+
+    _locks = KeyedLocks()
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.storage = get_storage()
+        self.media_root = Path(self.settings.MEDIA_ROOT)
+        self.cache_dir = self.media_root / "derivatives"
+        self.sizes = _csv_ints(self.settings.DERIVATIVE_SIZES) or [320]
+        self.formats = [f for f in _csv(self.settings.DERIVATIVE_FORMATS) if f in FORMAT_ARGS] or ["jpg"]
+        self.lru = lru_for(self.cache_dir, int(self.settings.DERIVATIVE_CACHE_MAX_MB) * 1024 * 1024)
+
+    # ---------- key / path ----------
+    def source_id(self, key: str) -> str:
+        # blob content-addressed -> dùng luôn sha256; file thường -> hash(key, size)
+        sha = content_hash_from_key(key)
+        if sha:
+            return sha
+        return hashlib.sha256(f"{key}:{self.storage.size(key)}".encode()).hexdigest()
+
+    def _dir(self, src_id: str) -> Path:
+        return self.cache_dir / src_id[:2] / src_id
+
+    def _file(self, src_id: str, variant: str, width: int, fmt: str) -> Path:
+        return self._dir(src_id) / f"{variant}_{width}.{fmt}"
+
+    def cache_key(self, path: Path) -> Optional[str]:
+        """Key tương đối (cho X-Accel-Redirect) khi cache nằm trong storage root local."""
+        if self.storage.name != "local":
+            return None
+        try:
+            return PurePosixPath(str(path.relative_to(self.media_root.parent))).as_posix()
+        except ValueError:
+            return None
+
+    # ---------- generate ----------
+    def _generate(self, key: str, src_id: str, variant: str, is_video: bool) -> None:
+        """Sinh tất cả size x format của 1 nguồn trong 1 lệnh ffmpeg (decode 1 lần)."""
+        outputs = [(w, fmt) for w in self.sizes for fmt in self.formats]
+        out_dir = self._dir(src_id)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tmp_dir = out_dir / f".tmp_{uuid.uuid4().hex}"
+        tmp_dir.mkdir()
+        try:
+            pre = f"{FRAME_SELECT.get(variant, 'thumbnail')}," if is_video else ""
+            labels = "".join(f"[s{i}]" for i in range(len(outputs)))
+            graph = [f"[0:v]{pre}split={len(outputs)}{labels}"]
+            # không phóng to ảnh nhỏ hơn kích thước yêu cầu
+            graph += [f"[s{i}]scale='min(iw,{w})':-2[o{i}]" for i, (w, _) in enumerate(outputs)]
+            args = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error"]
+            with self.storage.local_copy(key) as src:
+                args += ["-i", src, "-filter_complex", ";".join(graph)]
+                for i, (w, fmt) in enumerate(outputs):
+                    args += ["-map", f"[o{i}]", "-frames:v", "1", *FORMAT_ARGS[fmt],
+                             "-y", str(tmp_dir / f"{variant}_{w}.{fmt}")]
+                proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+            if proc.returncode != 0:
+                raise RuntimeError(f"ffmpeg failed: {proc.stdout.decode(errors='ignore')[:2000]}")
+            written = 0
+            for f in tmp_dir.iterdir():
+                written += f.stat().st_size
+                os.replace(f, out_dir / f.name)  # atomic -> request khác không thấy file dở
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        self.lru.added(written)
+
+    def _target(self, key: str, width: int, fmt: str, variant: str) -> Tuple[str, Path]:
+        fmt = fmt.lower()
+        if fmt not in self.formats:
+            raise HTTPException(422, f"Unsupported format, allowed: {', '.join(self.formats)}")
+        # chọn size cấu hình nhỏ nhất >= width yêu cầu (không sinh size tuỳ ý -> cache không phình)
+        width = next((w for w in self.sizes if w >= width), self.sizes[-1])
+        if not self.storage.exists(key):
+            raise HTTPException(404, "Source file not found")
+        src_id = self.source_id(key)
+        return src_id, self._file(src_id, variant, width, fmt)
+
+    def get_path(self, key: str, width: int, fmt: str = "jpg", variant: str = "image",
+                 is_video: bool = False, generate: bool = True) -> Path:
+        """
+        Path local của derivative; sinh (cả bộ) nếu chưa có. Blocking -> gọi qua to_thread.
+        generate=False: chỉ đọc cache, chưa có -> 404 (request không được phép chạy ffmpeg).
+        """
+        src_id, path = self._target(key, width, fmt, variant)
+        # touch trước khi kiểm tra: file đang có sẽ không bị LRU xoá ngay sau đó (EVICT_MIN_AGE)
+        self.lru.touch(path)
+        if not path.exists():
+            if not generate:
+                raise HTTPException(404, "Thumbnail not generated yet")
+            with self._locks.get(src_id):
+                if not path.exists():
+                    self._generate(key, src_id, variant, is_video)
+        return path
+
+    async def get(self, key: str, width: int, fmt: str = "jpg", variant: str = "image",
+                  is_video: bool = False, generate: bool = True) -> Path:
+        try:
+            return await asyncio.to_thread(self.get_path, key, width, fmt, variant, is_video, generate)
+        except RuntimeError as e:
+            logger.error(f"Derivative generation failed for {key}: {e}")
+            raise HTTPException(422, "Cannot generate thumbnail for this file")
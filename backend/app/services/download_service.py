@@ -0,0 +1,349 @@
+import time
+import random
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import base64
+import aiofiles
+import httpx
+from datetime import datetime, timedelta, timezone
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, Iterable, Optional, Tuple
+from urllib.parse import urlparse
+from sqlalchemy.orm import Session
+
+from app.core.settings import get_settings
+from app.core.database import SessionLocal
+from app.repositories import video_repo, media_repo
+from app.models.video_models import Video
+from app.services.blob_service import BlobService
+from app.services.probe_service import ProbeService
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+PROGRESS_INTERVAL = 1.0  # giây giữa 2 lần ghi tiến độ vào DB
+
+
+class _Retryable(Exception):
+    pass
+
+
+class _Fatal(Exception):
+    pass
+
+
+def _hash_file(path: Path) -> Tuple[str, str]:
+    sha, md5 = hashlib.sha256(), hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            sha.update(chunk)
+            md5.update(chunk)
+    return sha.hexdigest(), md5.hexdigest()
+
+
+def _content_range(value: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    # "bytes 100-999/1000" -> (100, 1000); total "*" -> None
+    try:
+        unit, rng = (value or "").split(" ", 1)
+        span, total = rng.split("/", 1)
+        return int(span.split("-", 1)[0]), (int(total) if total != "*" else None)
+    except ValueError:
+        return None, None
+
+
+def _expected_checksum(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    # "sha256:<hex>" | "md5:<hex>" | hex trơn (đoán theo độ dài)
+    if not value:
+        return None
+    algo, _, digest = value.strip().lower().rpartition(":")
+    algo = algo or ("sha256" if len(digest) == 64 else "md5" if len(digest) == 32 else "")
+    return (algo, digest) if algo in ("sha256", "md5") else None
+
+
+class DownloadService:
+    """
+    Tải video cho /videos/import (original_url -> blob -> probe -> ready).
+
+    - chạy nền trên event loop, giới hạn tổng DOWNLOAD_CONCURRENCY và DOWNLOAD_PER_HOST mỗi host
+    - stream thẳng xuống file .part, lỗi mạng thì retry + resume bằng Range/If-Range
+    - kiểm tra độ dài, Content-MD5 của server và checksum người dùng gửi kèm
+    - tiến độ ghi vào video_metadata.download (xem qua /videos/queue hoặc /videos/{id})
+    - nhiều worker: import được claim (UPDATE ... SKIP LOCKED) trước khi tải; worker đang giữ
+      heartbeat updated_at, quá DOWNLOAD_CLAIM_LEASE_SECONDS không có -> worker khác nhận lại
+    Trạng thái dùng chung cả process (class attribute) vì service được tạo mới mỗi request.
+    """
+
+    _tasks: Dict[int, asyncio.Task] = {}
+    _task: Optional[asyncio.Task] = None  # heartbeat + nhận lại import của worker đã chết
+    _global_sem: Optional[asyncio.Semaphore] = None
+    _host_sems: Dict[str, asyncio.Semaphore] = {}
+    _clients: Dict[bool, httpx.AsyncClient] = {}
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.blobs = BlobService()
+        self.probe = ProbeService()
+        self.max_bytes = int(self.settings.DOWNLOAD_MAX_MB) * 1024 * 1024
+
+    # ---------- lịch chạy ----------
+    def enqueue(self, video_ids: Iterable[int]) -> None:
+        cls = type(self)
+        if cls._global_sem is None:
+            cls._global_sem = asyncio.Semaphore(max(1, self.settings.DOWNLOAD_CONCURRENCY))
+        for vid in video_ids:
+            if vid in cls._tasks:
+                continue
+            cls._tasks[vid] = asyncio.create_task(self._run(vid), name=f"video-import-{vid}")
+
+    def resume_pending(self) -> int:
+        """
+        Gọi lúc startup: nhận (claim) các import đang dở không worker nào giữ rồi tải tiếp,
+        và chạy heartbeat + quét lại định kỳ (import của worker đã chết sau lease được nhận lại).
+        """
+        n = self._claim_and_enqueue()
+        cls = type(self)
+        if cls._task is None:
+            cls._task = asyncio.create_task(self._loop(), name="video-import-lease")
+        return n
+
+    def _lease(self) -> int:
+        return max(30, int(self.settings.DOWNLOAD_CLAIM_LEASE_SECONDS))
+
+    def _claim_and_enqueue(self) -> int:
+        db = SessionLocal()
+        try:
+            stale_before = datetime.now(timezone.utc) - timedelta(seconds=self._lease())
+            ids = video_repo.claim_pending_imports(db, stale_before)
+        finally:
+            db.close()
+        self.enqueue(ids)
+        return len(ids)
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._lease() / 3)
+            try:
+                db = SessionLocal()
+                try:
+                    video_repo.touch_imports(db, list(type(self)._tasks))
+                finally:
+                    db.close()
+                n = self._claim_and_enqueue()
+                if n:
+                    logger.info(f"Resumed {n} orphaned video imports")
+            except Exception:
+                logger.exception("Video import heartbeat failed")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+        # file .part được giữ lại -> lần chạy sau resume tiếp
+        for t in list(cls._tasks.values()):
+            t.cancel()
+        await asyncio.gather(*cls._tasks.values(), return_exceptions=True)
+        cls._tasks.clear()
+        for c in cls._clients.values():
+            await c.aclose()
+        cls._clients.clear()
+        cls._global_sem = None
+        cls._host_sems.clear()
+
+    def _host_sem(self, url: str) -> asyncio.Semaphore:
+        host = (urlparse(url).hostname or "").lower()
+        sems = type(self)._host_sems
+        if host not in sems:
+            sems[host] = asyncio.Semaphore(max(1, self.settings.DOWNLOAD_PER_HOST))
+        return sems[host]
+
+    def _client(self, use_proxy: bool) -> httpx.AsyncClient:
+        clients = type(self)._clients
+        if use_proxy not in clients:
+            proxy = self.settings.DOWNLOAD_PROXY_URL if use_proxy else None
+            if use_proxy and not proxy:
+                raise _Fatal("use_proxy is set but DOWNLOAD_PROXY_URL is not configured")
+            clients[use_proxy] = httpx.AsyncClient(
+                proxy=proxy,
+                follow_redirects=True,
+                timeout=httpx.Timeout(60.0, connect=15.0),
+                limits=httpx.Limits(max_connections=max(1, self.settings.DOWNLOAD_CONCURRENCY)),
+                headers={"User-Agent": f"{self.settings.APP_NAME} importer"},
+            )
+        return clients[use_proxy]
+
+    def _part_path(self, video_id: int) -> Path:
+        # tên cố định theo video -> retry / restart tải tiếp đúng file cũ
+        return self.blobs.tmp_dir / f"import_{video_id}.part"
+
+    # ---------- job ----------
+    async def _run(self, video_id: int) -> None:
+        try:
+            async with type(self)._global_sem:
+                db = SessionLocal()
+                try:
+                    await self._import(db, video_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.exception(f"Import of video {video_id} crashed")
+                    self._fail(db, video_id, str(e))
+                finally:
+                    db.close()
+        finally:
+            type(self)._tasks.pop(video_id, None)
+
+    async def _import(self, db: Session, video_id: int) -> None:
+        v = video_repo.get_by_id(db, video_id)
+        if not v or v.file_path or not v.original_url:
+            return
+        meta = dict(v.video_metadata or {})
+        state: Dict[str, Any] = dict(meta.get("download") or {})
+        state.update(status="downloading", error=None)
+        part = self._part_path(video_id)
+        attempts = max(1, self.settings.DOWNLOAD_MAX_RETRIES)
+
+        for attempt in range(1, attempts + 1):
+            state["attempt"] = attempt
+            try:
+                async with self._host_sem(v.original_url):
+                    await self._fetch(db, v, part, state, bool(meta.get("use_proxy")))
+                break
+            except _Fatal as e:
+                part.unlink(missing_ok=True)
+                self._fail(db, video_id, str(e))
+                return
+            except (_Retryable, httpx.HTTPError, OSError) as e:
+                if attempt == attempts:
+                    # giữ .part: import lại (hoặc restart) vẫn resume được
+                    self._fail(db, video_id, f"{type(e).__name__}: {e}")
+                    return
+                state["error"] = f"{type(e).__name__}: {e}"
+                self._progress(db, v, state, force=True)
+                await asyncio.sleep(min(60, 2 ** attempt) + random.random())
+
+        await self._finish(db, v, part, state)
+
+    async def _fetch(self, db: Session, v: Video, part: Path, state: Dict[str, Any], use_proxy: bool) -> None:
+        offset = part.stat().st_size if part.exists() else 0
+        # identity: Content-Length/Range phải tính trên đúng byte ghi xuống đĩa
+        headers = {"Accept-Encoding": "identity"}
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            validator = state.get("etag") or state.get("last_modified")
+            if validator:
+                headers["If-Range"] = validator  # file trên server đổi -> nhận 200 và tải lại từ đầu
+
+        async with self._client(use_proxy).stream("GET", v.original_url, headers=headers) as r:
+            if r.status_code == 416 and offset:
+                if state.get("total") == offset:
+                    return  # đã tải đủ ở lần trước
+                part.unlink(missing_ok=True)
+                raise _Retryable("range not satisfiable, restarting from scratch")
+            if r.status_code in (408, 429) or r.status_code >= 500:
+                raise _Retryable(f"HTTP {r.status_code}")
+            if r.status_code >= 400:
+                raise _Fatal(f"HTTP {r.status_code} for {v.original_url}")
+
+            if r.status_code == 206:
+                start, total = _content_range(r.headers.get("content-range"))
+                if start != offset:
+                    part.unlink(missing_ok=True)
+                    raise _Retryable(f"server resumed at {start}, expected {offset}")
+                mode = "ab"
+            else:
+                offset, mode = 0, "wb"
+                length = r.headers.get("content-length")
+                total = int(length) if length and length.isdigit() else None
+                # Content-MD5 chỉ đúng cho response đầy đủ, không phải 206
+                state["content_md5"] = r.headers.get("content-md5")
+            state.update(
+                total=total,
+                etag=r.headers.get("etag") if not (r.headers.get("etag") or "").startswith("W/") else None,
+                last_modified=r.headers.get("last-modified"),
+                content_type=(r.headers.get("content-type") or "").split(";")[0].strip() or None,
+                final_url=str(r.url),
+            )
+            if total and total > self.max_bytes:
+                raise _Fatal(f"file too large ({total} bytes)")
+
+            done = offset
+            state["bytes"] = done
+            async with aiofiles.open(part, mode) as w:
+                async for chunk in r.aiter_raw(CHUNK_SIZE):
+                    await w.write(chunk)
+                    done += len(chunk)
+                    if done > self.max_bytes:
+                        raise _Fatal(f"file too large (> {self.max_bytes} bytes)")
+                    state["bytes"] = done
+                    self._progress(db, v, state)
+            if total is not None and done != total:
+                raise _Retryable(f"connection closed at {done}/{total} bytes")
+            state["total"] = done
+
+    async def _finish(self, db: Session, v: Video, part: Path, state: Dict[str, Any]) -> None:
+        sha, md5 = await asyncio.to_thread(_hash_file, part)
+        meta = dict(v.video_metadata or {})
+
+        server_md5 = state.get("content_md5")
+        if server_md5:
+            try:
+                server_md5 = base64.b64decode(server_md5).hex()
+            except ValueError:
+                server_md5 = None
+        expected = _expected_checksum(meta.get("checksum"))
+        mismatch = (server_md5 and server_md5 != md5) or \
+                   (expected and expected[1] != {"sha256": sha, "md5": md5}[expected[0]])
+        if mismatch:
+            # không resume được nữa -> bỏ .part, lần sau tải lại từ đầu
+            part.unlink(missing_ok=True)
+            self._fail(db, v.id, "checksum mismatch")
+            return
+
+        mime = state.get("content_type") or mimetypes.guess_type(v.original_url)[0] or "video/mp4"
+        ext = PurePosixPath(urlparse(state.get("final_url") or v.original_url).path).suffix.lower()
+        if not ext or len(ext) > 5:
+            ext = mimetypes.guess_extension(mime) or ".mp4"
+        blob, created = await self.blobs.ingest_local(db, part, sha, state["total"], ext, mime)
+
+        state.update(status="done", bytes=blob.size, sha256=sha, error=None)
+        meta.update(download={k: val for k, val in state.items() if not k.startswith("_")},
+                    deduplicated=not created)
+        v = video_repo.update(db, v, {
+            "file_path": blob.path, "file_size": blob.size, "content_hash": blob.sha256,
+            "video_metadata": meta,
+        })
+        # giống upload: asset trong Media Library giữ tham chiếu riêng tới cùng blob
+        await self.blobs.acquire(db, blob.sha256)
+        media_repo.create(
+            db, type="video", path=blob.path, mime_type=mime, size=blob.size, content_hash=blob.sha256,
+            media_metadata={"source": "import", "video_id": v.id, "original_url": v.original_url},
+            uploaded_by_id=None,
+        )
+        v = await self.probe.apply_to_video(db, v)
+        video_repo.update(db, v, {"status": "ready"})
+
+    # ---------- trạng thái ----------
+    def _progress(self, db: Session, v: Video, state: Dict[str, Any], force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - state.get("_ts", 0) < PROGRESS_INTERVAL:
+            return
+        state["_ts"] = now
+        meta = dict(v.video_metadata or {})
+        meta["download"] = {k: val for k, val in state.items() if not k.startswith("_")}
+        video_repo.update(db, v, {"video_metadata": meta})
+
+    def _fail(self, db: Session, video_id: int, error: str) -> None:
+        logger.warning(f"Import of video {video_id} failed: {error}")
+        db.rollback()
+        v = video_repo.get_by_id(db, video_id)
+        if not v:
+            return
+        meta = dict(v.video_metadata or {})
+        state = {k: val for k, val in (meta.get("download") or {}).items() if not k.startswith("_")}
+        state.update(status="failed", error=error[:1000])
+        meta["download"] = state
+        video_repo.update(db, v, {"status": "error", "video_metadata": meta})
@@ -2,16 +2,45 @@ from typing import Any, Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
 from datetime import datetime
 from fastapi import HTTPException
+from urllib.parse import urlencode
 import json
+import asyncio
 
-from app.repositories import channel_repo
+from app.core.settings import get_settings
+from app.core.rate_limit import get_limiter
+from app.core import channel_cache
 from app.services.BaseSocial_service import BaseSocialService
 from app.schemas.common import ChannelPlatformEnum as PF
 
 
+# Graph batch API: tối đa 50 operation / request
+BATCH_LIMIT = 50
+# số lô batch đọc gửi song song
+READ_BATCH_CONCURRENCY = 4
+# /me/accounts: field expansion lấy luôn IG gắn với page -> không cần gọi riêng từng page
+PAGE_FIELDS = (
+    "id,name,access_token,picture{url},"
+    "instagram_business_account{id,username,profile_picture_url},"
+    "connected_instagram_account{id,username,profile_picture_url}"
+)
+PAGE_LIMIT = 100
+
+
+def parse_graph_time(value: Optional[str]) -> Optional[datetime]:
+    # Graph API: "2024-05-01T10:00:00+0000"
+    try:
+        return datetime.strptime(value or "", "%Y-%m-%dT%H:%M:%S%z")
+    except ValueError:
+        return None
+
+
+
 class FacebookService(BaseSocialService):
+    platform = "facebook"
+
     def __init__(self):
-        self.settings = self.get_settings()
+        super().__init__()
+        self.settings = get_settings()
         self.graph_v = getattr(self.settings, "GRAPH_API_VERSION", "v19.0")
         self.base_url = f"https://graph.facebook.com/{self.graph_v}"
 
@@ -26,69 +55,218 @@ class FacebookService(BaseSocialService):
         except Exception:
             return None
 
+    async def find_post(self, token: str, page_id: str, *, message: str, since: datetime, until: datetime,
+                        video: bool = False) -> Optional[str]:
+        """
+        Đối soát publish bị gián đoạn: id bài của page tạo trong [since, until] có nội dung đúng
+        `message` (cả bài đã lên lịch), None nếu không có. Nội dung rỗng không phân biệt được bài
+        nào -> không nhận.
+        """
+        text = (message or "").strip()
+        if not text:
+            return None
+        edges = ["videos"] if video else ["posts", "scheduled_posts"]
+        field = "description" if video else "message"
+        for edge in edges:
+            js = await self._make_request(
+                "GET", f"{self.base_url}/{page_id}/{edge}", channel=page_id,
+                params={"access_token": token, "fields": f"id,{field},created_time",
+                        "since": int(since.timestamp()), "limit": 25},
+            )
+            for item in js.get("data") or []:
+                created = parse_graph_time(item.get("created_time"))
+                if created and since <= created <= until and (item.get(field) or "").strip() == text:
+                    return str(item["id"])
+        return None
+
     def get_channel_token_and_page(self, db: Session, channel_id: int) -> Tuple[Optional[str], Optional[str]]:
-        ch = channel_repo.get_by_id(db, channel_id)
-        if not ch:
-            return None, None
-        plat = getattr(ch.platform, "value", ch.platform)
-        if plat != PF.facebook.value:
+        creds = channel_cache.get(db, channel_id)
+        if not creds or creds.platform != PF.facebook.value:
             return None, None
-        return getattr(ch, "access_token", None), getattr(ch, "external_id", None)
+        return creds.access_token, creds.external_id
 
-    async def post_feed(self, page_token: str, page_id: str, *, message: str, schedule_unix: int | None = None, schedule_iso: str | None = None) -> Dict:
-        if not page_token or not page_id:
-            raise HTTPException(status_code=400, detail="Missing page_token or page_id")
-        data: Dict[str, Any] = {"access_token": page_token, "message": message}
+    def _apply_schedule(self, data: Dict[str, Any], schedule_unix: int | None, schedule_iso: str | None) -> Dict[str, Any]:
         if schedule_unix is not None:
             data["scheduled_publish_time"] = schedule_unix; data["published"] = False
         elif schedule_iso:
             ts = self._iso_to_unix(schedule_iso)
             if ts:
                 data["scheduled_publish_time"] = ts; data["published"] = False
-        return await self._make_request("POST", f"{self.base_url}/{page_id}/feed", data=data)
+        return data
+
+    def publish_spec(self, kind: str, page_id: str, *, message: str | None = None, image_url: str | None = None,
+                     file_url: str | None = None, schedule_unix: int | None = None,
+                     schedule_iso: str | None = None) -> Tuple[str, Dict[str, Any]]:
+        """(edge, params) của 1 lần đăng feed/photo/video — dùng chung cho gọi lẻ và batch."""
+        if kind == "photo":
+            edge, data = "photos", {"url": image_url}
+            if message: data["caption"] = message
+        elif kind == "video":
+            edge, data = "videos", {"file_url": file_url}
+            if message: data["description"] = message
+        else:
+            edge, data = "feed", {"message": message or ""}
+        return f"{page_id}/{edge}", self._apply_schedule(data, schedule_unix, schedule_iso)
+
+    async def post_feed(self, page_token: str, page_id: str, *, message: str, schedule_unix: int | None = None, schedule_iso: str | None = None) -> Dict:
+        if not page_token or not page_id:
+            raise HTTPException(status_code=400, detail="Missing page_token or page_id")
+        path, data = self.publish_spec("feed", page_id, message=message, schedule_unix=schedule_unix, schedule_iso=schedule_iso)
+        return await self._make_request("POST", f"{self.base_url}/{path}", endpoint="publish", channel=page_id,
+                                        data={"access_token": page_token, **data})
 
     async def post_photo(self, page_token: str, page_id: str, *, image_url: str, caption: str | None = None, schedule_unix: int | None = None, schedule_iso: str | None = None) -> Dict:
         if not page_token or not page_id:
             raise HTTPException(status_code=400, detail="Missing page_token or page_id")
-        data: Dict[str, Any] = {"access_token": page_token, "url": image_url}
-        if caption: data["caption"] = caption
-        if schedule_unix is not None:
-            data["scheduled_publish_time"] = schedule_unix; data["published"] = False
-        elif schedule_iso:
-            ts = self._iso_to_unix(schedule_iso)
-            if ts:
-                data["scheduled_publish_time"] = ts; data["published"] = False
-        return await self._make_request("POST", f"{self.base_url}/{page_id}/photos", data=data)
+        path, data = self.publish_spec("photo", page_id, message=caption, image_url=image_url,
+                                       schedule_unix=schedule_unix, schedule_iso=schedule_iso)
+        return await self._make_request("POST", f"{self.base_url}/{path}", endpoint="publish", channel=page_id,
+                                        data={"access_token": page_token, **data})
 
     async def post_photos(self, page_token: str, page_id: str, *, image_urls: List[str], message: str | None = None, schedule_unix: int | None = None, schedule_iso: str | None = None) -> Dict:
+        """
+        Upload ảnh (unpublished) + tạo bài feed trong 1 batch: bài feed tham chiếu id ảnh bằng
+        JSONPath {result=photoN:$.id} -> 1 round-trip thay vì N+1. Ảnh lỗi bị bỏ qua (bài feed
+        gửi lại với các ảnh còn lại).
+        """
         if not page_token or not page_id:
             raise HTTPException(status_code=400, detail="Missing page_token or page_id")
-        attached_media = []
-        for url in image_urls:
-            up = await self._make_request("POST", f"{self.base_url}/{page_id}/photos", data={
-                "access_token": page_token, "url": url, "published": False
-            })
-            if up.get("id"):
-                attached_media.append({"media_fbid": up["id"]})
-        payload: Dict[str, Any] = {"access_token": page_token, "attached_media": json.dumps(attached_media)}
-        if message: payload["message"] = message
-        if schedule_unix is not None:
-            payload["scheduled_publish_time"] = schedule_unix; payload["published"] = False
-        elif schedule_iso:
-            ts = self._iso_to_unix(schedule_iso)
-            if ts:
-                payload["scheduled_publish_time"] = ts; payload["published"] = False
-        return await self._make_request("POST", f"{self.base_url}/{page_id}/feed", data=payload)
+        photo_ops = [
+            self.batch_op("POST", f"{page_id}/photos", body={"url": url, "published": False}, name=f"photo{i}")
+            for i, url in enumerate(image_urls)
+        ]
+        feed_data: Dict[str, Any] = {}
+        if message: feed_data["message"] = message
+        self._apply_schedule(feed_data, schedule_unix, schedule_iso)
+
+        feed_res: Optional[Dict[str, Any]] = None
+        if len(photo_ops) < BATCH_LIMIT:
+            refs = [{"media_fbid": f"{{result=photo{i}:$.id}}"} for i in range(len(photo_ops))]
+            feed_op = self.batch_op("POST", f"{page_id}/feed", body={**feed_data, "attached_media": json.dumps(refs)})
+            results = await self.batch(page_token, [*photo_ops, feed_op], channel=page_id, endpoint="publish")
+            photos, feed_res = results[:-1], results[-1]
+        else:
+            photos = await self.batch(page_token, photo_ops, channel=page_id, endpoint="write")
+        attached_media = [{"media_fbid": r["body"]["id"]} for r in photos if r["ok"] and r["body"].get("id")]
+        if feed_res is not None and feed_res["ok"]:
+            return feed_res["body"]
+        if not attached_media:
+            errors = [r["body"] for r in photos if not r["ok"]]
+            return {"error": {"message": "All photo uploads failed", "details": errors[:5]}}
+        # JSONPath không resolve được (có ảnh lỗi) hoặc quá 50 ảnh -> tạo bài với các ảnh đã lên
+        payload: Dict[str, Any] = {"access_token": page_token, "attached_media": json.dumps(attached_media), **feed_data}
+        return await self._make_request("POST", f"{self.base_url}/{page_id}/feed", endpoint="publish", channel=page_id, data=payload)
     
     async def post_video(self, page_token: str, page_id: str, *, file_url: str, description: str | None = None, schedule_unix: int | None = None, schedule_iso: str | None = None) -> Dict:
         if not page_token or not page_id:
             raise HTTPException(status_code=400, detail="Missing page_token or page_id")
-        data: Dict[str, Any] = {"access_token": page_token, "file_url": file_url}
-        if description: data["description"] = description
-        if schedule_unix is not None:
-            data["scheduled_publish_time"] = schedule_unix; data["published"] = False
-        elif schedule_iso:
-            ts = self._iso_to_unix(schedule_iso)
-            if ts:
-                data["scheduled_publish_time"] = ts; data["published"] = False
-        return await self._make_request("POST", f"{self.base_url}/{page_id}/videos", data=data)
\ No newline at end of file
+        path, data = self.publish_spec("video", page_id, message=description, file_url=file_url,
+                                       schedule_unix=schedule_unix, schedule_iso=schedule_iso)
+        return await self._make_request("POST", f"{self.base_url}/{path}", endpoint="publish", channel=page_id,
+                                        data={"access_token": page_token, **data})
+
+    # ---------- Graph batch API ----------
+    @staticmethod
+    def batch_op(method: str, relative_url: str, *, body: Optional[Dict[str, Any]] = None,
+                 name: Optional[str] = None, token: Optional[str] = None) -> Dict[str, Any]:
+        """
+        1 operation của batch. token: access_token riêng của op (vd page token khác nhau),
+        không có thì dùng token của cả batch. name: để op sau tham chiếu {result=name:$.path}.
+        """
+        params = {k: ("true" if v is True else "false" if v is False else v)
+                  for k, v in (body or {}).items() if v is not None}
+        if token:
+            params["access_token"] = token
+        op: Dict[str, Any] = {"method": method, "relative_url": relative_url}
+        if method == "GET":
+            if params:
+                op["relative_url"] += ("&" if "?" in relative_url else "?") + urlencode(params)
+        elif params:
+            op["body"] = urlencode(params)
+        if name:
+            op["name"] = name
+            op["omit_response_on_success"] = False  # vẫn cần kết quả của op được tham chiếu
+        return op
+
+    @staticmethod
+    def _parse_batch(raw: Any, n: int) -> List[Dict[str, Any]]:
+        items = raw if isinstance(raw, list) else []
+        out: List[Dict[str, Any]] = []
+        for i in range(n):
+            it = items[i] if i < len(items) else None
+            if not isinstance(it, dict):
+                # null: op bị bỏ vì op nó phụ thuộc lỗi
+                out.append({"ok": False, "code": None, "body": {"error": {"message": "operation not executed"}}})
+                continue
+            try:
+                body = json.loads(it.get("body") or "null")
+            except ValueError:
+                body = {"raw": it.get("body")}
+            if not isinstance(body, dict):
+                body = {"data": body}
+            code = it.get("code")
+            out.append({"ok": isinstance(code, int) and code < 400 and "error" not in body, "code": code, "body": body})
+        return out
+
+    async def batch(self, token: str, ops: List[Dict[str, Any]], *, channel: Optional[str] = None,
+                    endpoint: str = "write", parallel: int = 1) -> List[Dict[str, Any]]:
+        """
+        Gửi ops qua POST / (batch), chia lô BATCH_LIMIT, tối đa `parallel` lô cùng lúc. Trả kết quả
+        theo đúng thứ tự ops: {"ok", "code", "body"}. Tham chiếu JSONPath chỉ hợp lệ trong cùng 1 lô.
+        """
+        sem = asyncio.Semaphore(max(1, parallel))
+
+        async def send(chunk: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+            async with sem:
+                # mỗi op tính vào rate limit của app như 1 call
+                raw = await self._make_request(
+                    "POST", f"{self.base_url}/", endpoint=endpoint, channel=channel, cost=len(chunk),
+                    data={"access_token": token, "batch": json.dumps(chunk), "include_headers": "false"},
+                )
+                return self._parse_batch(raw, len(chunk))
+
+        chunks = [ops[i:i + BATCH_LIMIT] for i in range(0, len(ops), BATCH_LIMIT)]
+        return [r for part in await asyncio.gather(*(send(c) for c in chunks)) for r in part]
+
+    async def publish_many(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Đăng cùng lúc lên nhiều page trong 1 batch. items: {"page_id", "token", "kind"
+        (feed|photo), message/image_url/schedule_unix/schedule_iso}. Trả {"ok","code","body"} theo thứ tự.
+        """
+        if not items:
+            return []
+        limiter = get_limiter()
+        ops = []
+        for it in items:
+            # giới hạn đăng theo từng page vẫn áp dụng dù gửi chung 1 request
+            await limiter.acquire(self.platform, "publish", it["page_id"])
+            path, data = self.publish_spec(
+                it.get("kind") or "feed", it["page_id"], message=it.get("message"), image_url=it.get("image_url"),
+                schedule_unix=it.get("schedule_unix"), schedule_iso=it.get("schedule_iso"),
+            )
+            ops.append(self.batch_op("POST", path, body=data, token=it["token"]))
+        return await self.batch(items[0]["token"], ops, endpoint="write")
+
+    async def get_objects(self, token: str, lookups: List[Tuple[str, str, Optional[str]]]) -> List[Dict[str, Any]]:
+        """Đọc metadata nhiều object 1 lần: lookups = [(object_id, fields, token riêng|None)]."""
+        ops = [self.batch_op("GET", obj_id, body={"fields": fields}, token=tok) for obj_id, fields, tok in lookups]
+        return await self.batch(token, ops, endpoint="read", parallel=READ_BATCH_CONCURRENCY)
+
+    async def list_pages(self, user_token: str, fields: str = PAGE_FIELDS) -> List[Dict[str, Any]]:
+        """Mọi page user quản lý (/me/accounts), đi hết các trang theo cursor `after`."""
+        pages: List[Dict[str, Any]] = []
+        params: Dict[str, Any] = {"access_token": user_token, "fields": fields, "limit": PAGE_LIMIT}
+        while True:
+            js = await self._make_request("GET", f"{self.base_url}/me/accounts", params=params)
+            pages.extend(js.get("data") or [])
+            paging = js.get("paging") or {}
+            after = (paging.get("cursors") or {}).get("after")
+            if not paging.get("next") or not after:
+                return pages
+            params = {**params, "after": after}
+
+    @staticmethod
+    def page_instagram(page: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """IG account gắn với page (từ field expansion của list_pages), None nếu không có."""
+        ig = page.get("instagram_business_account") or page.get("connected_instagram_account")
+        return ig if isinstance(ig, dict) and ig.get("id") else None
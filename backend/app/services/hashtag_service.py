@@ -0,0 +1,68 @@
+import re
+import unicodedata
+from typing import List, Optional, Dict, Any
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.repositories import hashtag_repo
+from app.models.post_models import Post
+
+# '#' + chữ/số/_ (unicode: giữ nguyên tiếng Việt có dấu, vd #khuyếnmãi)
+HASHTAG_RE = re.compile(r"#(\w{1,100})", re.UNICODE)
+MAX_TAG_LEN = 100
+
+# ký tự không phải chữ/số/_ là ranh giới tag (#a#b, #foo-bar), không phải ký tự bị xoá để nối 2 tag
+_TAG_SPLIT_RE = re.compile(r"\W+", re.UNICODE)
+
+def _valid(tag: str) -> Optional[str]:
+    tag = unicodedata.normalize("NFC", tag).lower()
+    if not tag or len(tag) > MAX_TAG_LEN or tag.isdigit():
+        return None
+    return tag
+
+def split_tags(raw: Optional[str]) -> List[str]:
+    """'#a#b' -> [a, b]; '#foo-bar' -> [foo, bar]; bỏ phần không hợp lệ."""
+    text = unicodedata.normalize("NFC", raw or "")
+    return [t for t in (_valid(p) for p in _TAG_SPLIT_RE.split(text)) if t]
+
+def normalize_tag(raw: str) -> Optional[str]:
+    # 1 tag (prefix autocomplete, tra cứu): lấy tag đầu tiên, không nối các phần lại
+    tags = split_tags(raw)
+    return tags[0] if tags else None
+
+def parse_hashtags(caption: Optional[str], hashtags: Optional[str]) -> List[str]:
+    """
+    - hashtags có '#': chỉ lấy các '#tag' (chữ tự do xen giữa bị bỏ qua)
+    - hashtags không có '#': danh sách phân cách dấu phẩy / khoảng trắng ("sale, summer")
+    - caption: chỉ lấy các '#tag' xuất hiện trong văn bản
+    """
+    found: List[str] = []
+    field = hashtags or ""
+    if "#" in field:
+        found += [t for t in (_valid(m.group(1)) for m in HASHTAG_RE.finditer(field)) if t]
+    else:
+        for tok in re.split(r"[\s,;]+", field):
+            found += split_tags(tok)
+    found += [t for t in (_valid(m.group(1)) for m in HASHTAG_RE.finditer(caption or "")) if t]
+    # giữ thứ tự xuất hiện, bỏ trùng
+    return list(dict.fromkeys(found))
+
+class HashtagService:
+    def sync_post(self, db: Session, post: Post) -> List[str]:
+        tags = parse_hashtags(post.caption, post.hashtags)
+        hashtag_repo.set_post_hashtags(db, post.id, tags)
+        return tags
+
+    def autocomplete(self, db: Session, prefix: str, limit: int = 10) -> List[Dict[str, Any]]:
+        tag = normalize_tag(prefix)
+        if not tag:
+            return []
+        return [{"tag": t, "posts": int(n or 0)} for t, n in hashtag_repo.autocomplete(db, tag, limit)]
+
+    def posts_page(self, db: Session, tag: str, limit: int = 50, cursor: Optional[str] = None) -> Dict[str, Any]:
+        norm = normalize_tag(tag)
+        h = hashtag_repo.get_by_tag(db, norm) if norm else None
+        if not h:
+            raise HTTPException(404, "Hashtag not found")
+        items, next_cursor = hashtag_repo.posts_by_tag_page(db, h.id, limit=limit, cursor=cursor)
+        return {"items": items, "next_cursor": next_cursor, "total_estimate": None}
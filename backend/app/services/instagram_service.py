@@ -1,11 +1,23 @@
+import time
 import httpx
+import asyncio
+from datetime import datetime
 from typing import Optional, Tuple, List, Union, Dict
+from fastapi import HTTPException
 from sqlalchemy.orm import Session
 
 from app.core.settings import get_settings
-from app.repositories import channel_repo
+from app.core import upstream
+from app.core import channel_cache
+from app.services.facebook_service import FacebookService, parse_graph_time
 from app.schemas.common import ChannelPlatformEnum as PF
 
+# GET /?ids= tối đa 50 id / request
+STATUS_IDS_LIMIT = 50
+# container.status_code
+READY, FAILED = "FINISHED", ("ERROR", "EXPIRED")
+
+
 class InstagramService:
     def __init__(self):
         self.settings = get_settings()
@@ -21,38 +33,23 @@ class InstagramService:
         return f"https://www.facebook.com/{self.graph_v}/dialog/oauth?client_id={app_id}&redirect_uri={redirect_uri}&scope={scope}"
 
     async def get_instagram_accounts(self, user_access_token: str) -> List[Dict]:
-        """Lấy Instagram business accounts (async, tránh blocking)"""
-        async with httpx.AsyncClient(timeout=30) as client:
-            pages_url = f"{self.base_url}/me/accounts"
-            pr = await client.get(pages_url, params={"access_token": user_access_token})
-            try:
-                pages = pr.json().get("data", [])
-            except Exception:
-                pages = []
-            instagram_accounts: List[Dict] = []
-            for page in pages:
-                ig_url = f"{self.base_url}/{page['id']}"
-                ir = await client.get(ig_url, params={
-                    "fields": "instagram_business_account",
-                    "access_token": page.get("access_token"),
-                })
-                try:
-                    j = ir.json()
-                except Exception:
-                    j = {}
-                if "instagram_business_account" in j:
-                    instagram_accounts.append({
-                        "page_id": page["id"],
-                        "instagram_id": j["instagram_business_account"]["id"],
-                        "access_token": page.get("access_token"),
-                    })
-        return instagram_accounts
+        """Lấy Instagram business accounts: /me/accounts + field expansion, đi hết các trang"""
+        pages = await FacebookService().list_pages(
+            user_access_token, fields="id,access_token,instagram_business_account{id}",
+        )
+        return [
+            {"page_id": page["id"], "instagram_id": page["instagram_business_account"]["id"],
+             "access_token": page.get("access_token")}
+            for page in pages
+            if (page.get("instagram_business_account") or {}).get("id")
+        ]
     
     async def post_to_instagram(self, instagram_id: str, access_token: str, image_url: str, caption: str) -> Dict:
         """Đăng ảnh lên Instagram (async)"""
         async with httpx.AsyncClient(timeout=60) as client:
             create_url = f"https://graph.facebook.com/{self.graph_v}/{instagram_id}/media"
-            create_resp = await client.post(create_url, data={
+            create_resp = await upstream.request(client, "POST", create_url, platform="instagram",
+                                                 endpoint="write", channel=instagram_id, data={
                 "image_url": image_url,
                 "caption": caption,
                 "access_token": access_token,
@@ -65,7 +62,8 @@ class InstagramService:
                 return {"success": False, "status": create_resp.status_code, "error": cj}
             media_id = cj["id"]
             publish_url = f"https://graph.facebook.com/{self.graph_v}/{instagram_id}/media_publish"
-            publish_resp = await client.post(publish_url, data={
+            publish_resp = await upstream.request(client, "POST", publish_url, platform="instagram",
+                                                  endpoint="publish", channel=instagram_id, data={
                 "creation_id": media_id,
                 "access_token": access_token,
             })
@@ -78,13 +76,10 @@ class InstagramService:
             return {"success": True, "id": pj.get("id")}
         
     def get_channel_token_and_igid(self, db: Session, channel_id: int) -> Tuple[Optional[str], Optional[str]]:
-        ch = channel_repo.get_by_id(db, channel_id)
-        if not ch:
-            return None, None
-        plat = getattr(ch.platform, "value", ch.platform)
-        if plat != PF.instagram.value or not getattr(ch, "access_token", None):
+        creds = channel_cache.get(db, channel_id)
+        if not creds or creds.platform != PF.instagram.value or not creds.access_token:
             return None, None
-        return getattr(ch, "access_token", None), getattr(ch, "external_id", None)
+        return creds.access_token, creds.external_id
 
     async def create_media_container(self, token: str, ig_id: str, **kwargs) -> Tuple[bool, Union[str, dict]]:
         """
@@ -95,8 +90,9 @@ class InstagramService:
         if not token or not ig_id:
             return False, {"status": 400, "error": "Missing token or ig_id"}
         async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(
-                f"https://graph.facebook.com/{self.graph_v}/{ig_id}/media",
+            r = await upstream.request(
+                client, "POST", f"https://graph.facebook.com/{self.graph_v}/{ig_id}/media",
+                platform="instagram", endpoint="write", channel=ig_id,
                 params={"access_token": token},
                 data=kwargs,
             )
@@ -119,8 +115,9 @@ class InstagramService:
         if not token or not ig_id or not creation_id:
             return {"success": False, "status": 400, "error": "Missing token/ig_id/creation_id"}
         async with httpx.AsyncClient(timeout=60) as client:
-            r = await client.post(
-                f"https://graph.facebook.com/{self.graph_v}/{ig_id}/media_publish",
+            r = await upstream.request(
+                client, "POST", f"https://graph.facebook.com/{self.graph_v}/{ig_id}/media_publish",
+                platform="instagram", endpoint="publish", channel=ig_id,
                 params={"access_token": token},
                 data={"creation_id": creation_id},
             )
@@ -132,13 +129,89 @@ class InstagramService:
             return {"success": False, "status": r.status_code, "error": body.get("error") or body}
         return {"success": True, "id": body.get("id")}
 
+    async def find_media(self, token: str, ig_id: str, *, caption: str, since: datetime,
+                         until: datetime) -> Optional[str]:
+        """
+        Đối soát publish bị gián đoạn: id media đăng trong [since, until] có caption đúng, None nếu
+        không có. Caption rỗng không phân biệt được media nào -> không nhận.
+        """
+        text = (caption or "").strip()
+        if not text:
+            return None
+        async with httpx.AsyncClient(timeout=30) as client:
+            r = await upstream.request(
+                client, "GET", f"{self.base_url}/{ig_id}/media", platform="instagram", channel=ig_id,
+                params={"fields": "id,caption,timestamp", "limit": 25, "access_token": token},
+            )
+        if r.status_code >= 400:
+            raise HTTPException(502, {"error": "upstream_error", "detail": r.text})
+        for item in r.json().get("data") or []:
+            ts = parse_graph_time(item.get("timestamp"))
+            if ts and since <= ts <= until and (item.get("caption") or "").strip() == text:
+                return str(item["id"])
+        return None
+
+    async def container_statuses(self, token: str, ig_id: str, container_ids: List[str]) -> Dict[str, Dict]:
+        """status_code của nhiều container trong 1 request (GET /?ids=a,b,c&fields=status_code,status)."""
+        out: Dict[str, Dict] = {}
+        async with httpx.AsyncClient(timeout=30) as client:
+            for i in range(0, len(container_ids), STATUS_IDS_LIMIT):
+                chunk = container_ids[i:i + STATUS_IDS_LIMIT]
+                r = await upstream.request(
+                    client, "GET", f"{self.base_url}/", platform="instagram", endpoint="status", channel=ig_id,
+                    params={"ids": ",".join(chunk), "fields": "status_code,status", "access_token": token},
+                )
+                try:
+                    body = r.json()
+                except Exception:
+                    body = {"raw": r.text}
+                if r.status_code >= 400:
+                    # lỗi cả request: coi như chưa biết, vòng poll sau hỏi lại
+                    continue
+                out.update({cid: body.get(cid) or {} for cid in chunk})
+        return out
+
+    async def wait_until_ready(self, token: str, ig_id: str, container_ids: List[str], *,
+                               first_delay: float = 1.0) -> Tuple[bool, Union[None, dict]]:
+        """
+        Poll tới khi mọi container FINISHED (mỗi vòng 1 query cho tất cả). Backoff thích ứng:
+        bắt đầu first_delay, x1.5 mỗi vòng khi còn container đang xử lý, tối đa 15s.
+        Trả (True, None) hoặc (False, {status, error}) khi có container ERROR/EXPIRED hoặc quá hạn.
+        """
+        pending = list(dict.fromkeys(container_ids))
+        deadline = time.monotonic() + float(self.settings.IG_CONTAINER_TIMEOUT_SECONDS)
+        delay = 0.0  # vòng đầu hỏi ngay: ảnh thường đã FINISHED
+        while pending:
+            if delay:
+                await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+            statuses = await self.container_statuses(token, ig_id, pending)
+            for cid in list(pending):
+                st = statuses.get(cid) or {}
+                code = st.get("status_code")
+                if code == READY:
+                    pending.remove(cid)
+                elif code in FAILED:
+                    return False, {"status": 400, "error": {"container_id": cid, "status_code": code,
+                                                            "status": st.get("status")}}
+            if pending and time.monotonic() >= deadline:
+                return False, {"status": 504, "error": {"message": "Media container processing timed out",
+                                                        "pending": pending}}
+            delay = first_delay if not delay else min(delay * 1.5, 15.0)
+        return True, None
+
+    async def _publish_when_ready(self, token: str, ig_id: str, creation_id: str, first_delay: float) -> dict:
+        ok, err = await self.wait_until_ready(token, ig_id, [creation_id], first_delay=first_delay)
+        if not ok:
+            return {"success": False, **err}
+        return await self.publish_container(token, ig_id, creation_id)
+
     async def post_photo(self, token: str, ig_id: str, image_url: str, caption: Optional[str]):
         if not token or not ig_id:
             return {"success": False, "status": 400, "error": "Missing token or ig_id"}
         ok, res = await self.create_media_container(token, ig_id, image_url=image_url, caption=caption or "")
         if not ok:
             return {"success": False, **res}
-        return await self.publish_container(token, ig_id, res)
+        return await self._publish_when_ready(token, ig_id, res, first_delay=1.0)
 
     async def post_video(self, token: str, ig_id: str, video_url: str, caption: Optional[str], is_reel: bool = True):
         if not token or not ig_id:
@@ -149,20 +222,30 @@ class InstagramService:
         ok, res = await self.create_media_container(token, ig_id, **params)
         if not ok:
             return {"success": False, **res}
-        return await self.publish_container(token, ig_id, res)
+        # video phải xử lý xong (status_code=FINISHED) mới publish được
+        return await self._publish_when_ready(token, ig_id, res, first_delay=3.0)
 
     async def post_carousel(self, token: str, ig_id: str, image_urls: List[str], caption: Optional[str]):
         if not token or not ig_id:
             return {"success": False, "status": 400, "error": "Missing token or ig_id"}
-        child_ids: List[str] = []
-        for u in image_urls:
-            ok, res = await self.create_media_container(token, ig_id, image_url=u, is_carousel_item="true")
+        # tạo các container con song song (giới hạn để không dồn burst vào 1 tài khoản)
+        sem = asyncio.Semaphore(max(1, int(self.settings.IG_CHILD_CONCURRENCY)))
+
+        async def create_child(u: str) -> Tuple[bool, Union[str, dict]]:
+            async with sem:
+                return await self.create_media_container(token, ig_id, image_url=u, is_carousel_item="true")
+
+        children = await asyncio.gather(*(create_child(u) for u in image_urls))
+        for ok, res in children:
             if not ok:
                 return {"success": False, **res}
-            child_ids.append(res)
+        child_ids = [res for _, res in children]
+        ok, err = await self.wait_until_ready(token, ig_id, child_ids, first_delay=1.0)
+        if not ok:
+            return {"success": False, **err}
         ok, parent = await self.create_media_container(
             token, ig_id, caption=caption or "", children=",".join(child_ids), media_type="CAROUSEL"
         )
         if not ok:
             return {"success": False, **parent}
-        return await self.publish_container(token, ig_id, parent)
+        return await self._publish_when_ready(token, ig_id, parent, first_delay=1.0)
@@ -0,0 +1,195 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+
+from app.core.settings import get_settings
+from app.core.storage import get_storage
+from app.core.database import SessionLocal, engine
+from app.repositories import lifecycle_repo
+from app.services.blob_service import BlobService
+from app.services.video_service import UPLOAD_DIR
+from app.services.rendition_service import RENDITION_DIR
+
+logger = logging.getLogger(__name__)
+
+
+def prev_entries(meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """prev_files cũ là list path; bản mới là {"path", "superseded_at"} -> chuẩn hoá về dict."""
+    out = []
+    for e in meta.get("prev_files") or []:
+        if isinstance(e, str):
+            out.append({"path": e, "superseded_at": None})
+        elif isinstance(e, dict) and e.get("path"):
+            out.append(e)
+    return out
+
+
+def video_keys(file_path: Optional[str], thumbnail_path: Optional[str], meta: Dict[str, Any],
+               prev: Iterable[Dict[str, Any]]) -> Set[str]:
+    keys = {file_path, thumbnail_path, meta.get("watermark_path"), (meta.get("preview") or {}).get("path")}
+    keys.update(e["path"] for e in prev)
+    return {k for k in keys if k}
+
+
+class LifecycleService:
+    """
+    Vòng đời file trên storage: file chỉ còn sống khi có row trỏ tới.
+
+    - tham chiếu: videos (file_path, thumbnail, preview, prev_files), video_renditions, media_assets
+      (kể cả asset đang gắn vào post qua post_media), media_blobs, templates
+    - retention: mỗi video giữ STORAGE_KEEP_GENERATIONS bản cũ gần nhất (prev_files) và mọi bản
+      mới bị thay trong STORAGE_GENERATION_RETENTION_DAYS; bản cũ hơn bị bỏ khỏi prev_files
+    - GC: file dưới các prefix do app quản lý mà không ai tham chiếu (và cũ hơn grace period, tránh
+      xoá output đang render dở) bị xoá theo lô; chạy nền định kỳ + advisory lock (1 process/lần)
+    """
+
+    _task: Optional[asyncio.Task] = None
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.storage = get_storage()
+        blobs = BlobService()
+        self.blob_prefix = blobs._rel(blobs.blob_root)
+        self.blob_tmp_prefix = blobs._rel(blobs.tmp_dir) + "/"
+
+    def prefixes(self) -> List[str]:
+        # chỉ các thư mục app tự sinh file; cache derivative/overlay có LRU riêng (core/disk_cache.py)
+        return [p.replace("\\", "/").rstrip("/") for p in (UPLOAD_DIR, RENDITION_DIR, self.blob_prefix)]
+
+    # ---------- retention ----------
+    def _retain(self, prev: List[Dict[str, Any]], now: datetime) -> List[Dict[str, Any]]:
+        keep_n = max(0, int(self.settings.STORAGE_KEEP_GENERATIONS))
+        max_age = timedelta(days=max(0, int(self.settings.STORAGE_GENERATION_RETENTION_DAYS)))
+        kept = []
+        for i, e in enumerate(reversed(prev)):  # mới nhất trước
+            at = e.get("superseded_at")
+            try:
+                recent = bool(at) and now - datetime.fromisoformat(at) <= max_age
+            except (TypeError, ValueError):
+                recent = False
+            if i < keep_n or recent:
+                kept.append(e)
+        return list(reversed(kept))
+
+    # ---------- tham chiếu ----------
+    def live_keys(self, db: Session, dry_run: bool = True) -> Tuple[Set[str], int]:
+        """Tập key đang được tham chiếu, sau khi áp retention. Trả (keys, số generation bị bỏ)."""
+        now = datetime.now(timezone.utc)
+        live: Set[str] = set()
+        pruned: List[Tuple[int, Set[str]]] = []
+        dropped = 0
+        for vid, file_path, thumb, meta in lifecycle_repo.iter_videos(db):
+            prev = prev_entries(meta)
+            kept = self._retain(prev, now)
+            if len(kept) != len(prev):
+                dropped += len(prev) - len(kept)
+                kept_paths = {e["path"] for e in kept}
+                pruned.append((vid, {e["path"] for e in prev} - kept_paths))
+            live |= video_keys(file_path, thumb, meta, kept)
+        live.update(lifecycle_repo.iter_paths(db))
+        # ghi sau khi duyệt xong: commit giữa chừng sẽ đóng cursor của iter_videos.
+        # Chỉ bỏ đúng các path đã quyết định, trên bản metadata mới nhất (row có thể đổi trong lúc quét)
+        if not dry_run:
+            for vid, drop in pruned:
+                lifecycle_repo.prune_prev_files(db, vid, drop)
+        return live, dropped
+
+    def delete_unreferenced(self, db: Session, keys: Iterable[str]) -> int:
+        """Xoá ngay các key không còn ai trỏ tới (vd sau khi xoá video). Lỗi chỉ log, GC dọn sau."""
+        deleted = 0
+        for key in {k for k in keys if k}:
+            if lifecycle_repo.owners(db, key):
+                continue
+            try:
+                self.storage.delete(key)
+                deleted += 1
+            except Exception as e:
+                logger.warning(f"Failed to delete {key}: {e}")
+        return deleted
+
+    def owners(self, db: Session, key: str) -> List[str]:
+        return lifecycle_repo.owners(db, key)
+
+    # ---------- GC ----------
+    def collect(self, dry_run: bool = True) -> Dict[str, Any]:
+        """1 lượt GC (blocking). dry_run=True = báo cáo dung lượng thu hồi được, không xoá gì."""
+        grace = int(self.settings.STORAGE_GC_GRACE_MINUTES) * 60
+        batch_size = max(1, int(self.settings.STORAGE_GC_BATCH_SIZE))
+        with engine.connect() as lock_conn:
+            if not lifecycle_repo.try_gc_lock(lock_conn):
+                return {"skipped": "another storage GC is running"}
+            db = SessionLocal()
+            try:
+                live, dropped = self.live_keys(db, dry_run=dry_run)
+            finally:
+                db.close()
+            try:
+                cutoff = time.time() - grace
+                report = {"dry_run": dry_run, "scanned_files": 0, "total_bytes": 0, "live_bytes": 0,
+                          "reclaimable_files": 0, "reclaimable_bytes": 0, "pruned_generations": dropped,
+                          "deleted_files": 0, "deleted_bytes": 0, "prefixes": self.prefixes()}
+                pending: List[Tuple[str, int]] = []
+                for prefix in self.prefixes():
+                    for key, size, mtime in self.storage.iter_keys(prefix):
+                        report["scanned_files"] += 1
+                        report["total_bytes"] += size
+                        if key in live or key.startswith(self.blob_tmp_prefix):
+                            report["live_bytes"] += size
+                            continue
+                        if mtime > cutoff:
+                            continue  # có thể là output vừa render, chưa kịp ghi DB
+                        report["reclaimable_files"] += 1
+                        report["reclaimable_bytes"] += size
+                        if not dry_run:
+                            pending.append((key, size))
+                            if len(pending) >= batch_size:
+                                self._delete_batch(pending, report)
+                                pending = []
+                if pending:
+                    self._delete_batch(pending, report)
+            finally:
+                lifecycle_repo.release_gc_lock(lock_conn)
+        logger.info(f"Storage GC: {report}")
+        return report
+
+    def _delete_batch(self, items: List[Tuple[str, int]], report: Dict[str, Any]) -> None:
+        try:
+            self.storage.delete_many([k for k, _ in items])
+        except Exception as e:
+            logger.warning(f"Storage GC batch delete failed: {e}")
+            return
+        report["deleted_files"] += len(items)
+        report["deleted_bytes"] += sum(s for _, s in items)
+        time.sleep(0.05)  # nhường IO cho request thật giữa các lô
+
+    async def report(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.collect, True)
+
+    async def run(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self.collect, False)
+
+    # ---------- chạy nền ----------
+    def start_background(self) -> None:
+        interval = int(self.settings.STORAGE_GC_INTERVAL_MINUTES)
+        cls = type(self)
+        if interval <= 0 or cls._task is not None:
+            return
+        cls._task = asyncio.create_task(self._loop(interval * 60), name="storage-gc")
+
+    async def _loop(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.run()
+            except Exception:
+                logger.exception("Storage GC failed")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
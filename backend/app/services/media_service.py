@@ -1,8 +1,5 @@
-import os
-import uuid
-import aiofiles
-from pathlib import Path, PurePosixPath
-from typing import Optional, List, Dict, Any
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Tuple
 from fastapi import UploadFile, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import func
@@ -10,63 +7,62 @@ from sqlalchemy import func
 from app.core.settings import get_settings
 from app.repositories import media_repo
 from app.models.media_models import MediaAsset
+from app.core.pagination import estimate_count
+from app.services.blob_service import BlobService
+from app.core.storage import get_storage
+from app.core import media_delivery
+from app.services.derivative_service import DerivativeService
 
 class MediaService:
     def __init__(self):
         self.settings = get_settings()
         self.media_root = Path(self.settings.MEDIA_ROOT)
         self.media_root.mkdir(parents=True, exist_ok=True)
+        self.blobs = BlobService()
+
+    def _media_type(self, content_type: Optional[str]) -> str:
+        if not content_type or not content_type.startswith(('image/', 'video/', 'audio/')):
+            raise HTTPException(400, "Only image, video and audio files are allowed")
+        return content_type.split("/", 1)[0]
 
     async def upload(self, db: Session, file: UploadFile, 
                     uploaded_by_id: Optional[int] = None) -> MediaAsset:
-        # Validate file type
-        if not file.content_type or not file.content_type.startswith(('image/', 'video/', 'audio/')):
-            raise HTTPException(400, "Only image, video and audio files are allowed")
-        
-        # Generate unique filename
-        file_ext = Path(file.filename or "").suffix
-        unique_name = f"{uuid.uuid4()}{file_ext}"
-        
-        # Determine subdirectory by type
-        if file.content_type.startswith('image/'):
-            subdir = "images"
-            media_type = "image"
-        elif file.content_type.startswith('video/'):
-            subdir = "videos"  
-            media_type = "video"
-        else:
-            subdir = "audio"
-            media_type = "audio"
-            
-        upload_dir = self.media_root / subdir
-        upload_dir.mkdir(exist_ok=True)
-        
-        file_path = upload_dir / unique_name
-        
-        # Save file
-        try:
-            async with aiofiles.open(file_path, 'wb') as f:
-                content = await file.read()
-                await f.write(content)
-        except Exception as e:
-            raise HTTPException(500, f"Failed to save file: {str(e)}")
-        
-        # Create database record
-        file_size = len(content) 
-        relative_path = str(file_path.relative_to(self.media_root.parent))
-        rel_path = PurePosixPath(relative_path).as_posix()  # ✅ "storage/images/xxx.png"
-        
+        media_type = self._media_type(file.content_type)
+
+        # Lưu theo sha256: nội dung trùng chỉ tăng ref_count, không ghi thêm file
+        blob, created = await self.blobs.ingest(db, file)
+
         asset = media_repo.create(
             db,
             type=media_type,
-            path=rel_path,  # ✅ lưu path posix
+            path=blob.path,  # ✅ "storage/blobs/ab/cd/<sha>.png"
             mime_type=file.content_type,
-            size=file_size,
+            size=blob.size,
+            content_hash=blob.sha256,
             uploaded_by_id=uploaded_by_id,
-            media_metadata={}  # ✅ Khởi tạo empty dict
+            media_metadata={"original_filename": file.filename, "deduplicated": not created}
         )
         
         return asset
+
+    async def create_from_hash(self, db: Session, sha256: str, filename: Optional[str] = None,
+                               mime_type: Optional[str] = None, uploaded_by_id: Optional[int] = None) -> MediaAsset:
+        """Client gửi hash trước; nếu nội dung đã có thì tạo asset ngay, khỏi upload."""
+        blob = await self.blobs.acquire(db, sha256)
+        if not blob:
+            raise HTTPException(404, "Content not found, upload the file")
+        mime = mime_type or blob.mime_type
+        asset = media_repo.create(
+            db,
+            type=self._media_type(mime),
+            path=blob.path,
+            mime_type=mime,
+            size=blob.size,
+            content_hash=blob.sha256,
+            uploaded_by_id=uploaded_by_id,
+            media_metadata={"original_filename": filename, "deduplicated": True},
+        )
+        return asset
     
     # ✅ THÊM METHOD LIST - Router đang gọi svc.list()
     async def list(self, db: Session, type_filter: Optional[str] = None, 
@@ -76,6 +72,14 @@ class MediaService:
                                     time_filter=time_filter, 
                                     q=q)
     
+    async def list_page(self, db: Session, type_filter: Optional[str] = None, q: Optional[str] = None,
+                        mime: Optional[str] = None, limit: int = 60, cursor: Optional[str] = None,
+                        with_total: bool = False) -> Dict[str, Any]:
+        items, next_cursor = media_repo.list_assets_page(db, type_filter=type_filter, q=q, mime=mime,
+                                                         limit=limit, cursor=cursor)
+        total = estimate_count(db, MediaAsset.__tablename__) if with_total and not (type_filter or q or mime) else None
+        return {"items": items, "next_cursor": next_cursor, "total_estimate": total}
+
     # ✅ THÊM METHOD STATS - Router đang gọi svc.stats()
     async def stats(self, db: Session) -> Dict[str, Any]:
         # Thống kê tổng quan
@@ -96,6 +100,22 @@ class MediaService:
             "total_size": total_size
         }
     
+    async def thumbnail(self, db: Session, asset_id: int, width: int = 320, fmt: str = "jpg",
+                        version: Optional[str] = None, sig: Optional[str] = None) -> Tuple[Path, bool]:
+        """
+        Thumbnail cho grid Media Library (sinh lười, cache theo hash nguồn) -> (path, current).
+        Chỉ URL có chữ ký hợp lệ (thumb_url) mới được sinh derivative, còn lại chỉ đọc cache.
+        """
+        asset = await self.get(db, asset_id)
+        if asset.type not in ("image", "video"):
+            raise HTTPException(422, "Thumbnails are only available for images and videos")
+        is_video = asset.type == "video"
+        current = version == media_delivery.source_version(asset.path)
+        signed = current and media_delivery.verify(sig, "media", asset_id, version)
+        path = await DerivativeService().get(asset.path, width, fmt, variant="middle" if is_video else "image",
+                                             is_video=is_video, generate=signed)
+        return path, current
+
     async def get(self, db: Session, asset_id: int) -> MediaAsset:
         asset = media_repo.get(db, asset_id)
         if not asset:
@@ -122,13 +142,17 @@ class MediaService:
         if not obj: 
             raise HTTPException(404, "Asset not found")
         
-        # Delete physical file
+        # File dùng chung theo nội dung -> chỉ xoá khi hết tham chiếu
+        content_hash = obj.content_hash
+        if content_hash:
+            media_repo.delete(db, obj)
+            self.blobs.release(db, content_hash)
+            return
+
+        # Delete physical file (asset cũ, trước khi có blob)
         try:
             if obj.path:
-                base = self.media_root.parent
-                abs_path = os.path.join(str(base), obj.path)
-                if os.path.exists(abs_path):
-                    os.remove(abs_path)
+                get_storage().delete(obj.path)
         except Exception: 
             pass
             
@@ -1,10 +1,14 @@
-from typing import List, Optional
+import asyncio
+import hashlib
+import json
+import logging
+from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 
 from app.schemas.post_schemas import PostCreateIn, PostUpdateIn
-from app.repositories import post_repo, channel_repo
+from app.repositories import post_repo, channel_repo, publish_attempt_repo
 from app.models.post_models import Post
 from app.models.channel_models import Channel
 from app.services.facebook_service import FacebookService
@@ -12,7 +16,30 @@ from app.services.instagram_service import InstagramService
 from app.services.tiktok_service import TikTokService
 from app.services.youtube_service import YouTubeService
 from app.schemas.common import ChannelPlatformEnum as PF
-from app.models.post_models import PostTarget, Post
+from app.models.post_models import PostTarget, Post, PublishAttempt
+from app.core.pagination import estimate_count
+from app.core.storage import get_storage
+from app.core.settings import get_settings
+from app.core.database import SessionLocal
+from app.core.circuit_breaker import CircuitOpen, UpstreamUnavailable, backoff
+from app.core import channel_cache
+from app.services.hashtag_service import HashtagService
+from app.services.rendition_service import RenditionService
+
+logger = logging.getLogger(__name__)
+
+# bài do attempt gián đoạn tạo ra có thể hiện created_time trễ hơn heartbeat cuối một chút
+RECONCILE_SLACK = timedelta(minutes=5)
+# field post_metadata đi vào payload gửi nền tảng -> là một phần của idempotency key
+PAYLOAD_META_KEYS = ("file_url", "image_url", "title", "privacy", "schedule_unix", "schedule_time_iso")
+
+
+class _Unreconcilable(Exception):
+    pass
+
+
+def _aware(dt: datetime) -> datetime:
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
 
 
 class PostService:
@@ -64,11 +91,22 @@ class PostService:
             })
 
         post.targets = post_repo.target_bulk_create(db, batch)
+        HashtagService().sync_post(db, post)
+        # transcode trước theo spec từng platform, tới giờ đăng chỉ việc upload
+        if post.video_id:
+            RenditionService().prepare_background(post.video_id, [b["platform"] for b in batch])
         return post
 
     def list(self, db: Session, status: Optional[str] = None, q: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Post]:
         return post_repo.post_list(db, status=status, q=q, limit=limit, offset=offset)
 
+    def list_page(self, db: Session, status: Optional[str] = None, q: Optional[str] = None, limit: int = 50,
+                  cursor: Optional[str] = None, with_total: bool = False) -> Dict[str, Any]:
+        items, next_cursor = post_repo.post_list_page(db, status=status, q=q, limit=limit, cursor=cursor)
+        # ước lượng chỉ có nghĩa khi không lọc (pg_class là thống kê toàn bảng)
+        total = estimate_count(db, Post.__tablename__) if with_total and not (status or q) else None
+        return {"items": items, "next_cursor": next_cursor, "total_estimate": total}
+
     def get(self, db: Session, post_id: int) -> Post:
         post = post_repo.post_get_by_id(db, post_id)
         if not post:
@@ -77,7 +115,12 @@ class PostService:
 
     def update(self, db: Session, post_id: int, payload: PostUpdateIn) -> Post:
         post = self.get(db, post_id)
-        return post_repo.post_update(db, post, payload.model_dump(exclude_unset=True))
+        data = payload.model_dump(exclude_unset=True)
+        post = post_repo.post_update(db, post, data)
+        # chỉ parse lại khi nội dung có thể đổi hashtag
+        if "caption" in data or "hashtags" in data:
+            HashtagService().sync_post(db, post)
+        return post
 
     def delete(self, db: Session, post_id: int) -> None:
         post = self.get(db, post_id)
@@ -92,6 +135,7 @@ class PostService:
         ig = InstagramService()
         tk = TikTokService()
         yt = YouTubeService()
+        renditions = RenditionService()
 
         # helpers
         def _now_utc(): return datetime.now(timezone.utc)
@@ -117,6 +161,8 @@ class PostService:
             dt = getattr(tgt, "scheduled_time", None) or getattr(post, "default_scheduled_time", None) or _parse_iso(pm.get("schedule_time_iso"))
             if dt and dt.tzinfo is None:
                 dt = dt.replace(tzinfo=timezone.utc)
+            if dt and dt <= _now_utc():
+                return None, None, None  # đã tới hạn (dispatcher / lần thử lại) -> đăng ngay
             unix = int(dt.timestamp()) if dt else (pm.get("schedule_unix") if isinstance(pm.get("schedule_unix"), int) else None)
             iso = dt.isoformat() if dt else (pm.get("schedule_time_iso") if isinstance(pm.get("schedule_time_iso"), str) else None)
             return dt, unix, iso
@@ -138,6 +184,10 @@ class PostService:
                 video_path = post.video.file_path
             return {"video_url": video_url, "image_url": image_url, "video_path": video_path}
         
+        def _video_url(video_key: Optional[str]) -> Optional[str]:
+            # video đã nằm trên storage -> URL public / pre-signed để platform tự tải (video_url)
+            return get_storage().url(video_key) if video_key else None
+
         def _ensure_success(res, *, id_keys=("id", "post_id", "video_id")) -> str:
             """Trả về platform_post_id; nếu có lỗi/mất id -> raise HTTPException để gom lỗi chung."""
             if not isinstance(res, dict):
@@ -152,11 +202,53 @@ class PostService:
                     return str(res[k])
             raise HTTPException(400, "Publish succeeded but missing returned id")
         
+        # ===== FACEBOOK MULTI-PAGE: cùng nội dung lên nhiều page -> 1 Graph batch =====
+        fb_batched: Dict[int, Any] = {}
+        # attempt đã ghi ở bước batch, dùng lại ở main loop
+        claimed: Dict[int, PublishAttempt] = {}
+        # target đã được _begin_attempt xử lý (đã đăng / đang giữ / chờ kiểm tra tay) -> main loop bỏ qua
+        settled: set = set()
+        if not post.video_id and not target_only_id:
+            pm = post.post_metadata or {}
+            fb_items, fb_targets = [], []
+            for tgt in (post.targets or []):
+                if tgt.status not in ("ready", "scheduled", "failed"):
+                    continue
+                creds = channel_cache.get(db, tgt.channel_id)
+                if not creds or not creds.is_active or creds.platform != PF.facebook.value:
+                    continue
+                token, page_id = creds.access_token, creds.external_id
+                if not token or not page_id:
+                    continue
+                attempt = await self._begin_attempt(db, post, tgt, PF.facebook.value)
+                if attempt is None:
+                    settled.add(tgt.id)
+                    continue
+                claimed[tgt.id] = attempt
+                _, schedule_unix, schedule_iso = _schedule_tuple(post, tgt)
+                fb_items.append({
+                    "page_id": page_id, "token": token,
+                    "kind": "photo" if pm.get("image_url") else "feed",
+                    "message": post.caption or "", "image_url": pm.get("image_url"),
+                    "schedule_unix": pm.get("schedule_unix") or schedule_unix,
+                    "schedule_iso": pm.get("schedule_time_iso") or schedule_iso,
+                })
+                fb_targets.append(tgt.id)
+            if len(fb_items) >= 2:
+                try:
+                    for tid, r in zip(fb_targets, await fb.publish_many(fb_items)):
+                        fb_batched[tid] = r["body"] if r["ok"] else HTTPException(502, {"error": "upstream_error", "detail": r["body"]})
+                except HTTPException as he:
+                    # lỗi cả batch (rate limit / nền tảng sập) -> mỗi target xử lý như gọi lẻ bị lỗi
+                    fb_batched = {tid: he for tid in fb_targets}
+
         # ===== MAIN LOOP =====
         for tgt in (post.targets or []):
             if target_only_id and tgt.id != target_only_id:
                 continue
-            if tgt.status not in ("ready", "scheduled", "failed"):
+            # queued/posting: target do dispatcher / publish_target nhận và gọi riêng
+            allowed = ("ready", "scheduled", "failed") + (("queued", "posting") if target_only_id else ())
+            if tgt.status not in allowed or tgt.id in settled:
                 continue
 
             ch = channel_repo.get_by_id(db, tgt.channel_id)
@@ -170,17 +262,50 @@ class PostService:
             media = _media_sources(post, ch)
             schedule_dt, schedule_unix, schedule_iso = _schedule_tuple(post, tgt)
             plat = getattr(ch.platform, "value", ch.platform)
+            attempt = claimed.pop(tgt.id, None)
 
+            lease_task = None
             try:
+                # IG / TikTok API không hỗ trợ hẹn giờ -> nếu có lịch tương lai, để scheduler xử lý
+                if plat in (PF.instagram.value, PF.tiktok.value) and schedule_dt and schedule_dt > datetime.now(timezone.utc):
+                    tgt.status = "scheduled"
+                    db.add(tgt)
+                    continue
+
+                # Preflight theo spec platform: file gốc nếu đạt, không thì rendition đã transcode.
+                # Video không thể sửa (quá dài/ngắn) -> fail ngay, không tốn upload.
+                video_key = None
+                if post.video_id and post.video:
+                    video_key = await renditions.ensure_for_publish(db, post.video, plat)
+
+                # Ghi attempt trước khi gọi API: đã đăng / đang đăng ở worker khác -> không gọi lại
+                if attempt is None:
+                    attempt = await self._begin_attempt(db, post, tgt, plat)
+                    if attempt is None:
+                        db.add(tgt)
+                        continue
+                # upload YouTube/TikTok có thể lâu hơn lease -> gia hạn tới khi xong
+                lease_task = self._keep_lease(attempt.id, tgt.id)
+
+                # FACEBOOK (đã đăng trong batch nhiều page)
+                if plat == PF.facebook.value and tgt.id in fb_batched:
+                    res = fb_batched[tgt.id]
+                    if isinstance(res, HTTPException):
+                        raise res
+                    tgt.platform_post_id = res.get("id") or res.get("post_id")
+                    tgt.status = "posted"
+                    tgt.posted_time = datetime.now(timezone.utc)
+
                 # FACEBOOK
-                if plat == PF.facebook.value:
+                elif plat == PF.facebook.value:
                     token, page_id = fb.get_channel_token_and_page(db, ch.id)
                     if not token or not page_id:
                         raise HTTPException(400, "Missing FB token/page id")
 
                     if post.video_id:
                         file_url = (post.post_metadata or {}).get("file_url") \
-                                or (ch.channel_metadata or {}).get("file_url")
+                                or (ch.channel_metadata or {}).get("file_url") \
+                                or _video_url(video_key)
                         if not file_url:
                             raise HTTPException(400, "Missing file_url for Facebook video post")
                         res = await fb.post_video(
@@ -217,16 +342,11 @@ class PostService:
 
                 # INSTAGRAM
                 elif plat == PF.instagram.value:
-                    # IG API không hỗ trợ hẹn giờ -> nếu có lịch tương lai, để scheduler xử lý
-                    if schedule_dt and schedule_dt > datetime.now(timezone.utc):
-                        tgt.status = "scheduled"
-                        db.add(tgt)
-                        continue
                     token, ig_id = ig.get_channel_token_and_igid(db, ch.id)
                     if not token or not ig_id:
                         raise HTTPException(400, "Missing Instagram token/ID")
                     if post.video_id:
-                        file_url = (post.post_metadata or {}).get("file_url")
+                        file_url = (post.post_metadata or {}).get("file_url") or _video_url(video_key)
                         if not file_url:
                             raise HTTPException(400, "Missing file_url for Instagram video post")
                         res = await ig.post_video(
@@ -236,6 +356,8 @@ class PostService:
                             caption=post.caption or "",
                             is_reel=True,
                         )
+                        if not res.get("success"):
+                            raise HTTPException(400, str(res.get("error") or "Instagram reel publish failed"))
                     else:
                         image_url = (post.post_metadata or {}).get("image_url")
                         if not image_url:
@@ -259,11 +381,6 @@ class PostService:
 
                 # TIKTOK
                 elif plat == PF.tiktok.value:
-                    # TikTok API không hỗ trợ hẹn giờ -> nếu có lịch tương lai, để scheduler xử lý
-                    if schedule_dt and schedule_dt > datetime.now(timezone.utc):
-                        tgt.status = "scheduled"
-                        db.add(tgt)
-                        continue
                     if not post.video_id:
                         raise HTTPException(400, "TikTok only supports video posts")
 
@@ -272,6 +389,7 @@ class PostService:
                         channel_id=ch.id,
                         video_id=post.video_id,
                         caption=post.caption or "",
+                        file_path=video_key,
                     )
                     if not ok:
                         raise HTTPException(400, res.get("error") or "TikTok upload failed")
@@ -295,6 +413,7 @@ class PostService:
                         tags=None,
                         privacy_status=privacy,
                         schedule_time_iso=schedule_iso,  # nếu có -> YouTube sẽ hẹn giờ
+                        file_path=video_key,
                     )
                     if not ok:
                         raise HTTPException(400, res.get("error") or "YouTube upload failed")
@@ -308,12 +427,34 @@ class PostService:
                     tgt.status = "failed"
                     tgt.error_message = f"Platform '{ch.platform}' not implemented"
 
+                if attempt is not None:
+                    # commit luôn cùng target: crash sau đây không làm mất kết quả đã đăng
+                    if tgt.status == "posted":
+                        publish_attempt_repo.finish(db, attempt, "succeeded", platform_post_id=tgt.platform_post_id)
+                    else:
+                        publish_attempt_repo.finish(db, attempt, "failed", error_message=tgt.error_message)
+
             except HTTPException as he:
-                tgt.status = "failed"
-                tgt.error_message = f"{he.status_code}: {he.detail}"
+                # RateLimited / UpstreamUnavailable / CircuitOpen mang retry_after -> hoãn, không fail
+                retry_after = getattr(he, "retry_after", None)
+                if retry_after is not None:
+                    self._defer(tgt, f"{he.status_code}: {he.detail}", retry_after)
+                else:
+                    tgt.status = "failed"
+                    tgt.error_message = f"{he.status_code}: {he.detail}"
+                if attempt is not None:
+                    # timeout / 5xx sau khi đã gửi: nền tảng có thể đã tạo bài -> lần sau đối soát trước
+                    sent = isinstance(he, UpstreamUnavailable) and not isinstance(he, CircuitOpen)
+                    publish_attempt_repo.finish(db, attempt, "unknown" if sent else "failed",
+                                                error_message=tgt.error_message)
             except Exception as e:
                 tgt.status = "failed"
                 tgt.error_message = str(e)
+                if attempt is not None:
+                    publish_attempt_repo.finish(db, attempt, "unknown", error_message=str(e))
+            finally:
+                if lease_task is not None:
+                    lease_task.cancel()
 
             db.add(tgt)
 
@@ -321,18 +462,160 @@ class PostService:
         db.refresh(post)
         return post
 
+    def _defer(self, tgt: PostTarget, reason: str, retry_after: float) -> None:
+        """Nền tảng lỗi tạm thời: trả target về 'scheduled' với hạn mới (backoff + jitter) cho dispatcher."""
+        settings = get_settings()
+        tgt.attempts = (tgt.attempts or 0) + 1
+        if tgt.attempts >= settings.PUBLISH_MAX_ATTEMPTS:
+            tgt.status = "failed"
+            tgt.error_message = f"Gave up after {tgt.attempts} attempts: {reason}"
+            return
+        delay = max(retry_after, backoff(tgt.attempts, base=settings.UPSTREAM_DEFER_SECONDS,
+                                         cap=settings.PUBLISH_RETRY_MAX_SECONDS))
+        retry_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        current = tgt.scheduled_time
+        if current and current.tzinfo is None:
+            current = current.replace(tzinfo=timezone.utc)
+        # giữ lịch gốc nếu nó còn xa hơn lần thử lại
+        tgt.scheduled_time = current if current and current > retry_at else retry_at
+        tgt.status = "scheduled"
+        tgt.error_message = f"Deferred (attempt {tgt.attempts}): {reason}"
+
+    @staticmethod
+    def _idempotency_key(post: Post, tgt: PostTarget) -> str:
+        """
+        Cùng target + cùng nội dung -> cùng key (sửa nội dung thì là lần đăng mới). Nội dung = mọi thứ
+        đi vào payload gửi nền tảng: caption, hashtags, video (cả file sau edit), media theo thứ tự,
+        các field post_metadata / channel_metadata mà publish dùng. Lịch của target không tính
+        (_defer đổi scheduled_time mỗi lần hoãn).
+        """
+        pm = post.post_metadata or {}
+        cm = (tgt.channel.channel_metadata if tgt.channel else None) or {}
+        raw = json.dumps({
+            "target": tgt.id, "channel": tgt.channel_id, "caption": post.caption or "",
+            "hashtags": post.hashtags or "",
+            "video": post.video_id, "video_file": post.video.file_path if post.video else None,
+            "media": [m.media_id for m in sorted(post.media or [], key=lambda m: (m.order or 0, m.id))],
+            "meta": {k: pm.get(k) for k in PAYLOAD_META_KEYS},
+            "channel_meta": {k: cm.get(k) for k in ("file_url", "image_url")},
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def _hold(tgt: PostTarget, until: datetime, reason: str) -> None:
+        """Chưa được đăng lúc này (không tính là lần thử lỗi): dispatcher xem lại lúc `until`."""
+        tgt.status = "scheduled"
+        tgt.scheduled_time = until
+        tgt.error_message = reason
+
+    async def _begin_attempt(self, db: Session, post: Post, tgt: PostTarget, plat: str) -> Optional[PublishAttempt]:
+        """
+        Cổng idempotency trước khi gọi API đăng, trả attempt đã commit 'pending'.
+        None = không gọi API lần này: đã đăng (target -> posted) hoặc worker khác đang đăng /
+        chưa đối soát được (target giữ lại cho dispatcher).
+        """
+        settings = get_settings()
+        lease = timedelta(seconds=int(settings.PUBLISH_ATTEMPT_LEASE_SECONDS))
+        now = datetime.now(timezone.utc)
+        key = self._idempotency_key(post, tgt)
+        att = publish_attempt_repo.get_by_key(db, key)
+        if att is not None and att.status == "succeeded":
+            tgt.platform_post_id = att.platform_post_id
+            tgt.status = "posted"
+            tgt.posted_time = tgt.posted_time or att.updated_at
+            return None
+        if att is not None and att.status in ("pending", "unknown"):
+            started = _aware(att.started_at)
+            # updated_at: heartbeat của worker đang upload (_keep_lease) / lúc ghi kết quả 'unknown'
+            last = max(started, _aware(att.updated_at or att.started_at))
+            if att.status == "pending" and last + lease > now:
+                self._hold(tgt, last + lease, f"Publish in progress (attempt {att.id})")
+                return None
+            # worker chết giữa lúc gọi API / lỗi không rõ kết quả -> hỏi nền tảng trước khi đăng lại.
+            # Bài (nếu có) được tạo trong lúc attempt còn chạy -> chỉ nhận bài trong khoảng đó
+            try:
+                found = await self._reconcile(db, att, post, tgt, plat, since=started - timedelta(minutes=1),
+                                              until=last + RECONCILE_SLACK)
+            except _Unreconcilable as e:
+                # không tra được -> không đăng lại (có thể thành bài trùng), để người kiểm tra rồi đăng lại tay
+                publish_attempt_repo.abandon(db, att, f"Needs manual review: {e}")
+                tgt.status = "failed"
+                tgt.error_message = (f"Previous attempt {att.id} may already be published ({e}); "
+                                     "check the channel and publish again manually")
+                return None
+            except Exception as e:
+                self._hold(tgt, now + timedelta(seconds=int(settings.UPSTREAM_DEFER_SECONDS)), f"Reconcile failed: {e}")
+                return None
+            if found:
+                tgt.platform_post_id = found
+                tgt.status = "posted"
+                tgt.posted_time = now
+                publish_attempt_repo.finish(db, att, "succeeded", platform_post_id=found)
+                return None
+            publish_attempt_repo.abandon(db, att, "Not found on platform after interrupted attempt")
+        claimed = publish_attempt_repo.claim(db, key=key, target_id=tgt.id, platform=plat)
+        if claimed is None:
+            self._hold(tgt, now + lease, "Publish in progress on another worker")
+        return claimed
+
+    async def _reconcile(self, db: Session, att: PublishAttempt, post: Post, tgt: PostTarget, plat: str,
+                         *, since: datetime, until: datetime) -> Optional[str]:
+        """
+        id bài mà attempt bị gián đoạn đã tạo trên nền tảng (trong [since, until]), None nếu không có.
+        _Unreconcilable nếu không tra được.
+        """
+        if plat not in (PF.facebook.value, PF.instagram.value):
+            # TikTok / YouTube: chưa có API tra bài theo nội dung
+            raise _Unreconcilable(f"{plat} posts cannot be looked up")
+        if not (post.caption or "").strip():
+            raise _Unreconcilable("empty caption, cannot match the post")
+        creds = channel_cache.get(db, tgt.channel_id)
+        if not creds or not creds.access_token or not creds.external_id:
+            raise _Unreconcilable("channel credentials unavailable")
+        logger.info(f"Reconciling {plat} attempt {att.id} for target {tgt.id}")
+        if plat == PF.facebook.value:
+            return await FacebookService().find_post(creds.access_token, creds.external_id,
+                                                     message=post.caption, since=since, until=until,
+                                                     video=bool(post.video_id))
+        return await InstagramService().find_media(creds.access_token, creds.external_id,
+                                                   caption=post.caption, since=since, until=until)
+
+    @staticmethod
+    def _keep_lease(attempt_id: int, target_id: int) -> asyncio.Task:
+        """Heartbeat attempt + target trong lúc đăng (session riêng, không đụng session của request)."""
+        interval = max(5, int(get_settings().PUBLISH_ATTEMPT_LEASE_SECONDS) / 3)
+
+        def _renew() -> None:
+            db = SessionLocal()
+            try:
+                publish_attempt_repo.renew(db, attempt_id)
+                post_repo.touch_posting(db, target_id)
+            finally:
+                db.close()
+
+        async def _loop() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await asyncio.to_thread(_renew)
+                except Exception as e:
+                    logger.warning(f"Failed to renew publish lease for attempt {attempt_id}: {e}")
+
+        return asyncio.create_task(_loop(), name=f"publish-lease-{attempt_id}")
+
     async def publish_target(self, db: Session, target_id: int) -> dict:
-        """Background job function để đăng 1 target"""
+        """Background job function để đăng 1 target (dispatcher gọi cho target đến hạn)"""
         
         target = db.get(PostTarget, target_id)
         if not target:
             return {"error": "Target not found"}
         
-        if target.status != "scheduled":
+        if target.status not in ("scheduled", "queued"):
             return {"error": f"Target not in scheduled state: {target.status}"}
         
-        # Mark as processing
+        # Mark as processing (updated_at: dispatcher trả target 'posting' quá lâu về 'scheduled')
         target.status = "posting"
+        target.updated_at = datetime.now(timezone.utc)
         db.commit()
         
         try:
@@ -343,22 +626,22 @@ class PostService:
             if not channel or not channel.is_active:
                 raise Exception("Channel not found or inactive")
             
-            await self.publish_now(db, post.id, target_only_id=target.id)  # ensure publish_now accepts target_only_id
+            await self.publish_now(db, post.id, target_only_id=target.id)
             db.refresh(target)
-            result = {"success": True, "post_id": target.platform_post_id} if target.platform_post_id else {"error": "Missing platform_post_id"}
-
-            if result.get("success"):
-                target.status = "posted"
-                target.posted_time = datetime.now(timezone.utc)
-            else:
+            if target.status == "posted":
+                return {"success": True, "post_id": target.platform_post_id}
+            if target.status == "scheduled":
+                # bị hoãn (rate limit / nền tảng lỗi) -> dispatcher thử lại lúc scheduled_time
+                return {"deferred": True, "retry_at": target.scheduled_time.isoformat(), "error": target.error_message}
+            if target.status == "posting":
                 target.status = "failed"
-                target.error_message = result.get("error", "Unknown error")
-            
-            db.add(target)
-            db.commit()
-            return result
+                target.error_message = target.error_message or "Missing platform_post_id"
+                db.commit()
+            return {"error": target.error_message or "Unknown error"}
             
         except Exception as e:
+            db.rollback()
+            target = db.get(PostTarget, target_id)
             target.status = "failed"
             target.error_message = str(e)
             db.add(target)
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+from typing import Any, Dict
+from sqlalchemy.orm import Session
+
+from app.core.media_probe import probe_file
+from app.core.media_delivery import content_hash_from_key
+from app.core.storage import get_storage
+from app.repositories import blob_repo, video_repo
+from app.models.video_models import Video
+
+logger = logging.getLogger(__name__)
+
+# cột trên bảng videos được điền từ ffprobe
+VIDEO_PROBE_FIELDS = ("duration", "width", "height", "resolution", "format",
+                      "video_codec", "audio_codec", "bitrate", "fps", "rotation")
+
+class ProbeService:
+    """ffprobe chạy ngoài event loop; kết quả cache theo sha256 trong media_blobs.metadata.probe."""
+
+    def __init__(self):
+        self.storage = get_storage()
+
+    def _probe_key(self, key: str) -> Dict[str, Any]:
+        with self.storage.local_copy(key) as path:
+            return probe_file(path)
+
+    def _blob(self, db: Session, key: str):
+        sha = content_hash_from_key(key)
+        return blob_repo.get_by_hash(db, sha) if sha else None
+
+    async def probe(self, db: Session, key: str) -> Dict[str, Any]:
+        blob = self._blob(db, key)
+        cached = (blob.blob_metadata or {}).get("probe") if blob else None
+        if cached:
+            return cached
+        info = await asyncio.to_thread(self._probe_key, key)
+        if blob:
+            blob_repo.merge_metadata(db, blob, {"probe": info})
+        return info
+
+    def probe_blocking(self, db: Session, key: str) -> Dict[str, Any]:
+        """Bản đồng bộ cho code đã chạy trong worker thread (video_workers)."""
+        blob = self._blob(db, key)
+        cached = (blob.blob_metadata or {}).get("probe") if blob else None
+        if cached:
+            return cached
+        info = self._probe_key(key)
+        if blob:
+            blob_repo.merge_metadata(db, blob, {"probe": info})
+        return info
+
+    async def apply_to_video(self, db: Session, v: Video) -> Video:
+        """Điền duration/resolution/codec... cho video; lỗi probe không chặn luồng chính."""
+        if not v.file_path:
+            return v
+        try:
+            info = await self.probe(db, v.file_path)
+        except Exception as e:
+            logger.warning(f"Probe failed for video {v.id} ({v.file_path}): {e}")
+            return v
+        return self.apply_info(db, v, info)
+
+    def probe_video_blocking(self, db: Session, v: Video) -> Video:
+        if not v.file_path:
+            return v
+        try:
+            info = self.probe_blocking(db, v.file_path)
+        except Exception as e:
+            logger.warning(f"Probe failed for video {v.id} ({v.file_path}): {e}")
+            return v
+        return self.apply_info(db, v, info)
+
+    def apply_info(self, db: Session, v: Video, info: Dict[str, Any]) -> Video:
+        data = {k: info.get(k) for k in VIDEO_PROBE_FIELDS if info.get(k) is not None}
+        meta = dict(v.video_metadata or {})
+        meta["probe"] = {k: info.get(k) for k in ("pix_fmt", "audio_sample_rate", "audio_channels")}
+        data["video_metadata"] = meta
+        return video_repo.update(db, v, data)
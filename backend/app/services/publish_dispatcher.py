@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from app.core.settings import get_settings
+from app.core.database import SessionLocal
+from app.core.circuit_breaker import open_platforms
+from app.repositories import post_repo
+from app.schemas.common import ChannelPlatformEnum as PF
+from app.services.post_service import PostService
+
+logger = logging.getLogger(__name__)
+
+# target 'queued' lâu hơn mức này mà chưa chuyển 'posting' -> worker nhận đã chết
+STALE_CLAIM_MINUTES = 10
+
+
+class PublishDispatcher:
+    """
+    Đăng nền các target đến hạn: lịch hẹn của nền tảng không tự hẹn giờ (IG/TikTok) và target bị
+    hoãn vì nền tảng lỗi tạm thời (PostService._defer). Mỗi vòng nhận tối đa vài lô target bằng
+    SKIP LOCKED, bỏ qua nền tảng đang open circuit, đăng song song tối đa PUBLISH_CONCURRENCY.
+    """
+
+    _task: Optional[asyncio.Task] = None
+
+    def __init__(self):
+        self.settings = get_settings()
+
+    async def tick(self) -> int:
+        now = datetime.now(timezone.utc)
+        concurrency = max(1, int(self.settings.PUBLISH_CONCURRENCY))
+        # nền tảng đang sập: để target nằm yên trong DB thay vì nhận rồi lại hoãn
+        skip = [PF(p) for p in open_platforms() if p in PF._value2member_map_]
+        db = SessionLocal()
+        try:
+            post_repo.release_stale_claims(db, now - timedelta(minutes=STALE_CLAIM_MINUTES))
+            post_repo.release_stale_publishing(
+                db, now - timedelta(seconds=int(self.settings.PUBLISH_ATTEMPT_LEASE_SECONDS)))
+            ids = post_repo.claim_due_targets(db, now, limit=concurrency * 4, exclude_platforms=skip)
+        finally:
+            db.close()
+        if ids:
+            sem = asyncio.Semaphore(concurrency)
+            await asyncio.gather(*(self._publish(sem, tid) for tid in ids))
+        return len(ids)
+
+    async def _publish(self, sem: asyncio.Semaphore, target_id: int) -> None:
+        async with sem:
+            db = SessionLocal()
+            try:
+                res = await PostService().publish_target(db, target_id)
+                if res.get("deferred"):
+                    logger.info(f"Target {target_id} deferred until {res.get('retry_at')}")
+            except Exception:
+                logger.exception(f"Publishing target {target_id} crashed")
+            finally:
+                db.close()
+
+    # ---------- chạy nền ----------
+    def start_background(self) -> None:
+        interval = int(self.settings.PUBLISH_DISPATCH_INTERVAL_SECONDS)
+        cls = type(self)
+        if interval <= 0 or cls._task is not None:
+            return
+        cls._task = asyncio.create_task(self._loop(interval), name="publish-dispatcher")
+
+    async def _loop(self, interval: int) -> None:
+        while True:
+            try:
+                n = await self.tick()
+            except Exception:
+                logger.exception("Publish dispatcher failed")
+                n = 0
+            # còn nhận đủ lô -> có thể còn target đến hạn, chạy tiếp ngay
+            if n < max(1, int(self.settings.PUBLISH_CONCURRENCY)) * 4:
+                await asyncio.sleep(interval)
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
@@ -0,0 +1,181 @@
+import os
+import asyncio
+import hashlib
+import logging
+import posixpath
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core import video_workers
+from app.core.database import SessionLocal
+from app.core.storage import get_storage
+from app.core.platform_profiles import EncodingProfile, PROFILES, profile_for, check_video, transcode_args
+from app.repositories import video_repo, rendition_repo
+from app.models.video_models import Video
+from app.services.probe_service import ProbeService
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+RENDITION_DIR = os.getenv("VIDEO_RENDITION_DIR", "storage/renditions")
+# rendition chưa xong lúc tới giờ đăng -> target hoãn lại sau chừng này giây
+RENDITION_RETRY_SECONDS = int(os.getenv("RENDITION_RETRY_SECONDS", "60"))
+
+class RenditionPending(HTTPException):
+    """Rendition đang render ở nền -> caller hoãn và thử lại sau retry_after (như UpstreamUnavailable)."""
+
+    def __init__(self, profile: str, retry_after: float = RENDITION_RETRY_SECONDS):
+        self.retry_after = retry_after
+        super().__init__(
+            status_code=409,
+            detail={"error": "rendition_in_progress", "profile": profile, "retry_after": retry_after},
+            headers={"Retry-After": str(max(1, int(retry_after)))},
+        )
+
+
+def _video_meta(v: Video) -> Dict[str, Any]:
+    return {
+        "duration": v.duration, "width": v.width, "height": v.height, "format": v.format,
+        "video_codec": v.video_codec, "audio_codec": v.audio_codec, "bitrate": v.bitrate,
+        "fps": v.fps, "size": v.file_size,
+    }
+
+def _rendition_key(v: Video, profile: EncodingProfile) -> str:
+    # tên gắn với source hiện tại -> edit video thì ra key mới, không ghi đè file đang được phục vụ
+    tag = hashlib.sha1((v.file_path or "").encode()).hexdigest()[:10]
+    return posixpath.join(RENDITION_DIR.replace(os.sep, "/"), str(v.id), f"{profile.name}_{tag}.mp4")
+
+
+class RenditionService:
+    """
+    Preflight video theo spec platform + bản transcode đạt spec, cache theo (video, profile).
+    Render chạy trên video_workers (giới hạn số ffmpeg đồng thời).
+    """
+
+    def __init__(self):
+        self.storage = get_storage()
+        self.probe = ProbeService()
+
+    # ---------- preflight ----------
+    def _check(self, v: Video, profile: EncodingProfile) -> Dict[str, Any]:
+        fixable, fatal = check_video(profile, _video_meta(v))
+        return {
+            "platform": profile.platform,
+            "profile": profile.name,
+            "ok": not fixable and not fatal,
+            "needs_transcode": bool(fixable) and not fatal,
+            "fixable": fixable,
+            "fatal": fatal,
+        }
+
+    async def preflight(self, db: Session, v: Video, platform: str) -> Optional[Dict[str, Any]]:
+        profile = profile_for(platform)
+        if not profile:
+            return None
+        if v.duration is None and v.width is None:
+            v = await self.probe.apply_to_video(db, v)
+        return self._check(v, profile)
+
+    # ---------- render ----------
+    @staticmethod
+    def _current(v: Video, r) -> bool:
+        return bool(r and r.status == "ready" and r.path and r.source_path == v.file_path)
+
+    def _usable(self, v: Video, r) -> bool:
+        return self._current(v, r) and self.storage.exists(r.path)
+
+    @staticmethod
+    def _in_progress(v: Video, r) -> bool:
+        if not (r and r.status == "processing" and r.source_path == v.file_path):
+            return False
+        at = r.updated_at or r.created_at
+        if at is not None and at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+        return at is None or at > datetime.now(timezone.utc) - rendition_repo.STALE_PROCESSING
+
+    def _render(self, db: Session, v: Video, profile: EncodingProfile) -> None:
+        """Transcode blocking; gọi trong worker thread."""
+        r = rendition_repo.claim(db, v.id, profile.name, v.file_path)
+        if r is None:
+            return  # worker khác đang làm đúng việc này
+        out_key = _rendition_key(v, profile)
+        try:
+            with self.storage.local_copy(v.file_path) as src, self.storage.local_output(out_key, "video/mp4") as dst:
+                args = [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-i", src,
+                        *transcode_args(profile, _video_meta(v)), "-y", dst]
+                proc = subprocess.run(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                if proc.returncode != 0:
+                    raise RuntimeError(f"ffmpeg failed: {proc.stdout.decode(errors='ignore')[:2000]}")
+            info = self.probe.probe_blocking(db, out_key)
+            size = self.storage.size(out_key)
+            fixable, fatal = check_video(profile, {**info, "size": size})
+            if fixable or fatal:
+                raise RuntimeError("rendition still out of spec: " + "; ".join(fixable + fatal))
+            rendition_repo.update(db, r, {"path": out_key, "size": size, "status": "ready",
+                                          "error_message": None, "rendition_metadata": {"probe": info}})
+        except Exception as e:
+            logger.error(f"Rendition {profile.name} for video {v.id} failed: {e}")
+            rendition_repo.update(db, r, {"status": "failed", "error_message": str(e)[:2000]})
+
+    def _prepare_job(self, video_id: int, platform: str) -> None:
+        """Job nền: probe nếu thiếu, preflight, render nếu cần. Session riêng cho thread."""
+        db = SessionLocal()
+        try:
+            v = video_repo.get_by_id(db, video_id)
+            profile = profile_for(platform)
+            if not v or not v.file_path or not profile:
+                return
+            if v.duration is None and v.width is None:
+                v = self.probe.probe_video_blocking(db, v)
+            check = self._check(v, profile)
+            if not check["needs_transcode"]:
+                return
+            if self._usable(v, rendition_repo.get(db, v.id, profile.name)):
+                return
+            self._render(db, v, profile)
+        finally:
+            db.close()
+
+    def prepare_background(self, video_id: int, platforms: List[str]) -> None:
+        """Render trước khi tới giờ đăng (gọi khi tạo post / theo yêu cầu)."""
+        for p in dict.fromkeys(getattr(x, "value", x) for x in platforms):
+            if profile_for(p):
+                video_workers.submit_background(self._prepare_job, video_id, p)
+
+    async def ensure_for_publish(self, db: Session, v: Video, platform: str) -> str:
+        """
+        Trả storage key của file sẽ upload cho platform: file gốc nếu đạt spec, ngược lại rendition.
+        Không render trên request path: chưa có rendition -> đẩy job nền + RenditionPending (hoãn target).
+        Không sửa được / render đã lỗi với source này -> HTTPException 422.
+        """
+        check = await self.preflight(db, v, platform)
+        if not check or check["ok"]:
+            return v.file_path
+        if check["fatal"]:
+            raise HTTPException(422, f"Video does not meet {platform} requirements: {'; '.join(check['fatal'])}")
+
+        profile = PROFILES[check["profile"]]
+        r = rendition_repo.get(db, v.id, profile.name)
+        if self._current(v, r) and await asyncio.to_thread(self.storage.exists, r.path):
+            return r.path
+        if r and r.source_path == v.file_path and r.status == "failed":
+            raise HTTPException(422, f"No {profile.name} rendition available: {r.error_message or 'render failed'}")
+        if not self._in_progress(v, r):
+            # chưa có / source đã đổi / file ready bị mất / job treo -> render lại ở nền (claim chặn job trùng)
+            video_workers.submit_background(self._render_job, v.id, profile.name)
+        raise RenditionPending(profile.name)
+
+    def _render_job(self, video_id: int, profile_name: str) -> None:
+        db = SessionLocal()
+        try:
+            v = video_repo.get_by_id(db, video_id)
+            if v:
+                self._render(db, v, PROFILES[profile_name])
+        finally:
+            db.close()
+
+    def list(self, db: Session, video_id: int):
+        return rendition_repo.list_for_video(db, video_id)
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Any
+from fastapi import HTTPException
+
+from app.core.database import SessionLocal
+from app.repositories import search_repo
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TYPES = ["posts", "videos", "media", "channels"]
+
+class SearchService:
+    """Tìm kiếm hợp nhất: mỗi loại entity chạy song song trên session riêng."""
+
+    @staticmethod
+    def _run(kind: str, q: str, limit: int) -> List[Dict[str, Any]]:
+        # Session không thread-safe -> mỗi thread mở session riêng
+        db = SessionLocal()
+        try:
+            return search_repo.SEARCHERS[kind](db, q, limit)
+        finally:
+            db.close()
+
+    async def search(self, q: str, types: Optional[List[str]] = None, limit: int = 20) -> Dict[str, Any]:
+        q = (q or "").strip()
+        if len(q) < 2:
+            raise HTTPException(422, "q must be at least 2 characters")
+        kinds = types or DEFAULT_TYPES
+        unknown = [k for k in kinds if k not in search_repo.SEARCHERS]
+        if unknown:
+            raise HTTPException(422, f"Unsupported search types: {', '.join(unknown)}")
+
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._run, k, q, limit) for k in kinds),
+            return_exceptions=True,
+        )
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for kind, res in zip(kinds, results):
+            if isinstance(res, Exception):
+                logger.error(f"Search '{kind}' failed: {res}")
+                out[kind] = []
+            else:
+                out[kind] = res
+        return {"q": q, "results": out}
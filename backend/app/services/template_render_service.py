@@ -0,0 +1,158 @@
+import os
+import asyncio
+import json
+import uuid
+import hashlib
+import logging
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.core.settings import get_settings
+from app.core.storage import get_storage
+from app.core.disk_cache import KeyedLocks, lru_for
+from app.core.media_probe import probe_file
+from app.core.encoding import EncoderTier, scale_filter, video_args
+from app.repositories import template_repo
+from app.models.template_models import Template
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
+
+# vị trí watermark -> biểu thức overlay (W/H: khung video, w/h: ảnh watermark, m: lề)
+POSITIONS = {
+    "top-left": ("{m}", "{m}"),
+    "top-right": ("W-w-{m}", "{m}"),
+    "bottom-left": ("{m}", "H-h-{m}"),
+    "bottom-right": ("W-w-{m}", "H-h-{m}"),
+    "center": ("(W-w)/2", "(H-h)/2"),
+}
+
+
+def template_spec(t: Template) -> Dict[str, Any]:
+    """Snapshot dữ liệu template cần để render (truyền sang worker thread, không kéo theo ORM session)."""
+    return {
+        "id": t.id, "type": t.type, "content": t.content,
+        "metadata": dict(t.template_metadata or {}),
+        "version": str(t.updated_at or t.created_at or ""),
+    }
+
+
+class TemplateRenderService:
+    """
+    Áp template watermark/frame lên video.
+
+    Template.content = storage key ảnh (PNG có alpha). template_metadata:
+    - watermark: position (top-left|top-right|bottom-left|bottom-right|center), scale (tỉ lệ theo
+      chiều rộng video, mặc định 0.15), margin (tỉ lệ, mặc định 0.03), opacity (0-1)
+    - frame: window [x, y, w, h] (tỉ lệ 0-1 của canvas) + canvas [w, h] -> video được thu vào
+      window, frame vẽ đè lên trên; không có window -> frame kéo phủ kín khung video
+    Overlay được rasterize sẵn đúng kích thước/độ trong suốt và cache trên đĩa theo
+    (template, phiên bản, kích thước khung) -> mỗi video chỉ còn 1 phép overlay rẻ; cache giới hạn
+    OVERLAY_CACHE_MAX_MB theo LRU (core/disk_cache.py) vì mỗi phiên bản / kích thước là 1 file mới.
+    """
+
+    _locks = KeyedLocks()
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.storage = get_storage()
+        self.cache_dir = Path(self.settings.MEDIA_ROOT) / "overlays"
+        self.lru = lru_for(self.cache_dir, int(self.settings.OVERLAY_CACHE_MAX_MB) * 1024 * 1024)
+
+    # ---------- resolve ----------
+    async def resolve(self, db: Session, template_id: Optional[int], type_: str) -> Optional[Dict[str, Any]]:
+        if not template_id:
+            return None
+        t = template_repo.get(db, template_id)
+        if not t or t.type != type_:
+            raise HTTPException(404, f"{type_.capitalize()} template {template_id} not found")
+        if not t.is_active:
+            raise HTTPException(400, f"Template {template_id} is inactive")
+        if not t.content or not await asyncio.to_thread(self.storage.exists, t.content):
+            raise HTTPException(400, f"Template {template_id} image not found: {t.content}")
+        return template_spec(t)
+
+    # ---------- rasterize + cache ----------
+    def _raster(self, spec: Dict[str, Any], width: int, height: int, opacity: float) -> Path:
+        """PNG overlay đã scale + nhân alpha sẵn; height=-1 giữ tỉ lệ ảnh gốc."""
+        sig = json.dumps([spec["id"], spec["version"], spec["content"], width, height, opacity], sort_keys=True)
+        key = hashlib.sha256(sig.encode()).hexdigest()[:32]
+        out = self.cache_dir / key[:2] / f"{key}.png"
+        self.lru.touch(out)  # job sắp đọc file -> LRU không xoá (EVICT_MIN_AGE)
+        if out.exists():
+            return out
+        with self._locks.get(key):
+            if out.exists():
+                return out
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_name(f".{uuid.uuid4().hex}.png")
+            filt = f"scale={width}:{height},format=rgba"
+            if opacity < 1.0:
+                filt += f",colorchannelmixer=aa={opacity}"
+            with self.storage.local_copy(spec["content"]) as src:
+                proc = subprocess.run(
+                    [FFMPEG_BIN, "-hide_banner", "-loglevel", "error", "-i", src, "-vf", filt,
+                     "-frames:v", "1", "-y", str(tmp)],
+                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                )
+            if proc.returncode != 0:
+                tmp.unlink(missing_ok=True)
+                raise RuntimeError(f"ffmpeg failed: {proc.stdout.decode(errors='ignore')[:2000]}")
+            os.replace(tmp, out)  # atomic -> job khác không đọc file dở
+        self.lru.added(out.stat().st_size)
+        return out
+
+    # ---------- ffmpeg args ----------
+    def _frame_layout(self, spec: Dict[str, Any], w: int, h: int) -> Tuple[int, int, Optional[List[int]]]:
+        meta = spec["metadata"]
+        window = meta.get("window")
+        if not window:
+            return w, h, None
+        cw, ch = (meta.get("canvas") or [1080, 1920])[:2]
+        wx, wy, ww, wh = [float(x) for x in window[:4]]
+        # cạnh chẵn cho yuv420p
+        box = [int(wx * cw) // 2 * 2, int(wy * ch) // 2 * 2, int(ww * cw) // 2 * 2, int(wh * ch) // 2 * 2]
+        return int(cw), int(ch), box
+
+    def build_args(self, src: str, width: Optional[int], height: Optional[int],
+                   frame: Optional[Dict[str, Any]], watermark: Optional[Dict[str, Any]],
+                   tier: EncoderTier) -> List[str]:
+        """Tham số ffmpeg (trước output) áp frame rồi watermark trong 1 lần encode. Blocking."""
+        if not width or not height:
+            info = probe_file(src)
+            width, height = info.get("width"), info.get("height")
+        if not width or not height:
+            raise RuntimeError("cannot determine video size")
+
+        inputs = ["-i", src]
+        chains: List[str] = []
+        cur = "[0:v]"
+        cw, ch = width, height
+        if frame:
+            cw, ch, box = self._frame_layout(frame, width, height)
+            inputs += ["-i", str(self._raster(frame, cw, ch, float(frame["metadata"].get("opacity", 1.0))))]
+            if box:
+                wx, wy, ww, wh = box
+                chains.append(f"{cur}scale={ww}:{wh}:force_original_aspect_ratio=decrease:force_divisible_by=2,"
+                              f"pad={cw}:{ch}:{wx}+({ww}-iw)/2:{wy}+({wh}-ih)/2[bg]")
+                cur = "[bg]"
+            chains.append(f"{cur}[{len(inputs) // 2 - 1}:v]overlay=0:0[fr]")
+            cur = "[fr]"
+        if watermark:
+            meta = watermark["metadata"]
+            mw = max(2, int(cw * float(meta.get("scale", 0.15))) // 2 * 2)
+            inputs += ["-i", str(self._raster(watermark, mw, -1, float(meta.get("opacity", 1.0))))]
+            margin = int(cw * float(meta.get("margin", 0.03)))
+            x, y = POSITIONS.get(meta.get("position") or "bottom-right", POSITIONS["bottom-right"])
+            chains.append(f"{cur}[{len(inputs) // 2 - 1}:v]overlay={x.format(m=margin)}:{y.format(m=margin)}[wm]")
+            cur = "[wm]"
+        scale = scale_filter(tier)
+        if scale:
+            chains.append(f"{cur}{scale}[out]")
+            cur = "[out]"
+        return [*inputs, "-filter_complex", ";".join(chains), "-map", cur, "-map", "0:a?",
+                *video_args(tier), "-c:a", "copy"]
@@ -14,7 +14,7 @@ class TemplateService:
             name=payload.name,
             type=payload.type.value,
             content=payload.content,
-            template_metadata=payload.metadata,
+            template_metadata=payload.template_metadata,
         )
 
     async def list(self, db: Session, type_filter: str | None):
@@ -33,7 +33,7 @@ class TemplateService:
         data = payload.model_dump(exclude_unset=True)
         if "metadata" in data:
             data["template_metadata"] = data.pop("metadata")
-        return template_repo.update(db, t, data)
+        return template_repo.update(db, t, data)  # updated_at đổi -> overlay cache cũ tự hết hiệu lực
 
     async def delete(self, db: Session, template_id: int):
         t = template_repo.get(db, template_id)
@@ -1,16 +1,20 @@
 import os
+import asyncio
 import httpx
+from fastapi import HTTPException
 from typing import Tuple, Dict
 from pathlib import Path
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta, timezone
 from app.core.settings import get_settings
+from app.core import upstream
+from app.core import channel_cache
+from app.core.storage import get_storage
 from app.schemas.common import ChannelPlatformEnum as PF
 
 from app.repositories import channel_repo
+from app.services.token_refresh_service import TokenRefreshService
 from app.models.video_models import Video
 
-TIKTOK_TOKEN_URL   = "https://open.tiktokapis.com/v2/oauth/token/"
 TIKTOK_INIT_URL    = "https://open.tiktokapis.com/v2/post/publish/video/init/"
 TIKTOK_PUBLISH_URL = "https://open.tiktokapis.com/v2/post/publish/video/"
 
@@ -35,48 +39,14 @@ class TikTokService:
 
     async def _ensure_access_token(self, db: Session, channel) -> str:
         """
-        Trả về access_token hợp lệ. Nếu hết hạn và có refresh_token thì refresh.
+        Trả về access_token hợp lệ. Token thường đã được TokenRefreshService refresh trước khi
+        hết hạn; chỉ khi đã hết hạn mới refresh tại chỗ (dưới row lock, không refresh trùng).
         """
-        if channel.token_expires_at:
-            exp = channel.token_expires_at
-            if exp.tzinfo is None:
-                exp = exp.replace(tzinfo=timezone.utc)
-            now = datetime.now(timezone.utc)
-            if exp <= now:
-                refresh = (channel.channel_metadata or {}).get("refresh_token")
-                if not refresh:
-                    raise RuntimeError("TikTok token expired and no refresh_token")
-
-                async with httpx.AsyncClient(timeout=20) as client:
-                    r = await client.post(
-                        TIKTOK_TOKEN_URL,
-                        data={
-                            "grant_type": "refresh_token",
-                            "client_key": self.settings.TIKTOK_CLIENT_KEY,
-                            "client_secret": self.settings.TIKTOK_CLIENT_SECRET,
-                            "refresh_token": refresh,
-                        },
-                        headers={"Content-Type": "application/x-www-form-urlencoded"},
-                    )
-                r.raise_for_status()
-                js = r.json()
-
-                new_access  = js["access_token"]
-                expires_in  = int(js.get("expires_in", 3600))
-                expires_at  = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
-
-                # cập nhật lại token vào DB
-                channel_repo.update_tokens(
-                    db, channel,
-                    access_token=new_access,
-                    token_expires_at=expires_at,
-                )
-                return new_access
-
-        return channel.access_token
+        return await TokenRefreshService().ensure_fresh(db, channel)
 
     async def post_video_via_channel(
-        self, db: Session, *, channel_id: int, video_id: int, caption: str
+        self, db: Session, *, channel_id: int, video_id: int, caption: str,
+        file_path: str | None = None,
     ) -> Tuple[bool, dict]:
         """
         Flow TikTok:
@@ -85,31 +55,34 @@ class TikTokService:
         3) PUBLISH -> dùng publish_id + caption
         Yêu cầu scope: `video.upload` (upload) và `video.publish` (publish).
         """
-        ch = channel_repo.get_by_id(db, channel_id)
-        if not ch:
-            return False, {"error": "TikTok channel not found"}
-        plat = getattr(ch.platform, "value", ch.platform)
-        if plat != PF.tiktok.value:
+        ch = channel_cache.get(db, channel_id)
+        if not ch or ch.platform != PF.tiktok.value:
             return False, {"error": "TikTok channel not found"}
 
         try:
-            token = await self._ensure_access_token(db, ch)
+            # token còn hạn (đa số trường hợp) -> dùng luôn từ cache, không đọc lại channels
+            token = ch.access_token if not ch.expired else \
+                await self._ensure_access_token(db, channel_repo.get_by_id(db, channel_id))
+        except HTTPException:
+            raise
         except Exception as e:
             return False, {"error": "ensure_token_failed", "detail": str(e)}
 
         video: Video = db.get(Video, video_id)
         if not video or not getattr(video, "file_path", None):
             return False, {"error": "Video file not found"}
-        file_path = Path(video.file_path)
-        if not file_path.exists():
+        # file_path: rendition đạt spec TikTok (nếu có), mặc định là file gốc
+        key = file_path or video.file_path
+        storage = get_storage()
+        size = await asyncio.to_thread(storage.size, key)
+        if size is None:
             return False, {"error": "Video path missing on disk"}
-        data = file_path.read_bytes()
 
         try:
             async with httpx.AsyncClient(timeout=None) as client:
                 # 1) INIT (TikTok trả upload_url + publish_id)
-                r1 = await client.post(
-                    TIKTOK_INIT_URL,
+                r1 = await upstream.request(
+                    client, "POST", TIKTOK_INIT_URL, platform="tiktok", endpoint="publish", channel=ch.external_id,
                     headers={"Authorization": f"Bearer {token}"},
                     json={"source": "FILE"},  # tuỳ theo app: FILE/URL...
                 )
@@ -120,17 +93,17 @@ class TikTokService:
                 if not upload_url or not publish_id:
                     return False, {"error": "init_failed", "detail": r1.text}
 
-                # 2) UPLOAD file video (PUT raw bytes)
+                # 2) UPLOAD file video (PUT raw bytes): stream từng chunk, không đọc cả file vào RAM
                 r2 = await client.put(
                     upload_url,
-                    content=data,
-                    headers={"Content-Type": "video/mp4"},
+                    content=storage.aiter_bytes(key),
+                    headers={"Content-Type": "video/mp4", "Content-Length": str(size)},
                 )
                 r2.raise_for_status()
 
                 # 3) PUBLISH
-                r3 = await client.post(
-                    TIKTOK_PUBLISH_URL,
+                r3 = await upstream.request(
+                    client, "POST", TIKTOK_PUBLISH_URL, platform="tiktok", endpoint="publish", channel=ch.external_id,
                     headers={"Authorization": f"Bearer {token}"},
                     json={"publish_id": publish_id, "caption": caption or ""},
                 )
@@ -139,6 +112,8 @@ class TikTokService:
 
             return True, {"video_id": out.get("video_id"), "publish_id": publish_id}
 
+        except HTTPException:
+            raise  # rate limit / nền tảng lỗi tạm thời -> caller hoãn target
         except httpx.HTTPStatusError as e:
             # trả body lỗi của TikTok để dễ debug (thường 403 do thiếu scope video.publish)
             body = e.response.text if e.response is not None else str(e)
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.core import upstream
+from app.core.settings import get_settings
+from app.core.database import SessionLocal
+from app.models.channel_models import Channel
+from app.repositories import channel_repo
+
+logger = logging.getLogger(__name__)
+
+TIKTOK_TOKEN_URL = "https://open.tiktokapis.com/v2/oauth/token/"
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+# refresh lỗi: thử lại sau (lỗi tạm thời) / sau 1 giờ (refresh_token hỏng, cần user kết nối lại)
+RETRY_SECONDS = 300
+REAUTH_RETRY_SECONDS = 3600
+
+
+class TokenRefreshError(Exception):
+    def __init__(self, message: str, permanent: bool = False):
+        super().__init__(message)
+        self.permanent = permanent
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class TokenRefreshService:
+    """
+    Refresh access token trước khi hết hạn, chạy nền -> publish không phải refresh trên hot path.
+
+    - quét channels.token_expires_at (index ix_channels_token_expires_at) lấy channel sắp hết hạn
+      trong TOKEN_REFRESH_LEAD_MINUTES, refresh song song tối đa TOKEN_REFRESH_CONCURRENCY
+    - mỗi channel refresh trong transaction giữ row lock (FOR UPDATE SKIP LOCKED): worker khác
+      đang refresh channel đó thì bỏ qua, không refresh trùng (refresh_token TikTok xoay vòng)
+    - Facebook/Instagram dùng page token không hết hạn -> không cần refresh
+    """
+
+    _task: Optional[asyncio.Task] = None
+    # channel_id -> monotonic time được thử lại (refresh lỗi gần đây)
+    _retry_at: Dict[int, float] = {}
+
+    def __init__(self):
+        self.settings = get_settings()
+        self.refreshers: Dict[str, Callable[[httpx.AsyncClient, Channel], Awaitable[Dict[str, Any]]]] = {
+            "tiktok": self._refresh_tiktok,
+            "youtube": self._refresh_youtube,
+        }
+
+    def lead(self) -> timedelta:
+        return timedelta(minutes=int(self.settings.TOKEN_REFRESH_LEAD_MINUTES))
+
+    # ---------- gọi nền tảng ----------
+    async def _token_request(self, client: httpx.AsyncClient, platform: str, url: str, data: Dict[str, str]) -> Dict[str, Any]:
+        r = await upstream.request(
+            client, "POST", url, platform=platform, endpoint="auth", cost=0, data=data,
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        try:
+            js = r.json()
+        except ValueError:
+            js = {"raw": r.text}
+        if r.status_code >= 400 or js.get("error") or not js.get("access_token"):
+            err = js.get("error")
+            # invalid_grant: refresh_token bị thu hồi / hết hạn
+            raise TokenRefreshError(f"{platform} token refresh failed ({r.status_code}): {js}",
+                                    permanent=err == "invalid_grant" or r.status_code in (400, 401))
+        return js
+
+    async def _refresh_tiktok(self, client: httpx.AsyncClient, ch: Channel) -> Dict[str, Any]:
+        refresh = (ch.channel_metadata or {}).get("refresh_token")
+        if not refresh:
+            raise TokenRefreshError("TikTok channel has no refresh_token", permanent=True)
+        return await self._token_request(client, "tiktok", TIKTOK_TOKEN_URL, {
+            "grant_type": "refresh_token",
+            "client_key": self.settings.TIKTOK_CLIENT_KEY,
+            "client_secret": self.settings.TIKTOK_CLIENT_SECRET,
+            "refresh_token": refresh,
+        })
+
+    async def _refresh_youtube(self, client: httpx.AsyncClient, ch: Channel) -> Dict[str, Any]:
+        refresh = (ch.channel_metadata or {}).get("refresh_token")
+        if not refresh:
+            raise TokenRefreshError("YouTube channel has no refresh_token", permanent=True)
+        return await self._token_request(client, "youtube", GOOGLE_TOKEN_URL, {
+            "grant_type": "refresh_token",
+            "client_id": self.settings.YOUTUBE_CLIENT_ID,
+            "client_secret": self.settings.YOUTUBE_CLIENT_SECRET,
+            "refresh_token": refresh,
+        })
+
+    # ---------- refresh 1 channel ----------
+    async def refresh(self, db: Session, channel_id: int, *, force: bool = False,
+                      skip_locked: bool = True) -> Optional[Channel]:
+        """
+        Refresh token của 1 channel dưới row lock. Trả None nếu không cần / worker khác đang làm.
+        force=True: refresh kể cả khi token còn hạn (endpoint /oauth/{provider}/refresh).
+        skip_locked=False: chờ worker kia xong rồi kiểm tra lại hạn thay vì bỏ qua.
+        """
+        before = None if force else _now() + self.lead()
+        ch = channel_repo.lock_for_refresh(db, channel_id, before=before, skip_locked=skip_locked)
+        if ch is None:
+            db.rollback()
+            return None
+        plat = getattr(ch.platform, "value", ch.platform)
+        refresher = self.refreshers.get(plat)
+        if refresher is None:
+            db.rollback()
+            return None
+        try:
+            async with httpx.AsyncClient(timeout=20) as client:
+                js = await refresher(client, ch)
+        except Exception:
+            db.rollback()
+            raise
+        expires_in = int(js.get("expires_in") or 3600)
+        meta: Dict[str, Any] = {"token_refreshed_at": _now().isoformat(), "token_refresh_error": None}
+        if js.get("refresh_expires_in"):
+            meta["refresh_expires_at"] = (_now() + timedelta(seconds=int(js["refresh_expires_in"]))).isoformat()
+        ch = channel_repo.update_tokens(
+            db, ch,
+            access_token=js["access_token"],
+            # TikTok xoay vòng refresh_token; Google chỉ trả khi đổi
+            refresh_token=js.get("refresh_token") or (ch.channel_metadata or {}).get("refresh_token"),
+            token_expires_at=_now() + timedelta(seconds=expires_in),
+            channel_metadata=meta,
+        )
+        type(self)._retry_at.pop(channel_id, None)
+        return ch
+
+    async def ensure_fresh(self, db: Session, ch: Channel) -> str:
+        """
+        Fallback cho publish khi daemon chưa kịp refresh (vd vừa khởi động): token đã hết hạn thì
+        refresh (chờ lock nếu daemon đang refresh channel này). Bình thường chỉ trả token hiện tại.
+        """
+        exp = ch.token_expires_at
+        if exp is not None and exp.tzinfo is None:
+            exp = exp.replace(tzinfo=timezone.utc)
+        if exp is None or exp > _now():
+            return ch.access_token
+        logger.warning(f"Channel {ch.id} token expired before background refresh, refreshing inline")
+        db.commit()  # đóng transaction đang mở trước khi lấy row lock
+        refreshed = await self.refresh(db, ch.id, skip_locked=False)
+        if refreshed is None:
+            db.refresh(ch)
+            return ch.access_token
+        return refreshed.access_token
+
+    # ---------- daemon ----------
+    async def tick(self) -> int:
+        cls = type(self)
+        now_mono = time.monotonic()
+        for cid, at in list(cls._retry_at.items()):
+            if at <= now_mono:
+                cls._retry_at.pop(cid, None)
+        db = SessionLocal()
+        try:
+            ids = channel_repo.list_expiring_ids(
+                db, before=_now() + self.lead(), platforms=list(self.refreshers),
+                limit=int(self.settings.TOKEN_REFRESH_BATCH_SIZE), exclude_ids=list(cls._retry_at),
+            )
+        finally:
+            db.close()
+        if not ids:
+            return 0
+        sem = asyncio.Semaphore(max(1, int(self.settings.TOKEN_REFRESH_CONCURRENCY)))
+        done = await asyncio.gather(*(self._refresh_one(sem, cid) for cid in ids))
+        return sum(done)
+
+    async def _refresh_one(self, sem: asyncio.Semaphore, channel_id: int) -> int:
+        async with sem:
+            db = SessionLocal()
+            try:
+                return 1 if await self.refresh(db, channel_id) is not None else 0
+            except Exception as e:
+                permanent = isinstance(e, TokenRefreshError) and e.permanent
+                type(self)._retry_at[channel_id] = time.monotonic() + (REAUTH_RETRY_SECONDS if permanent else RETRY_SECONDS)
+                logger.warning(f"Token refresh for channel {channel_id} failed: {e}")
+                ch = channel_repo.get_by_id(db, channel_id)
+                if ch is not None:
+                    channel_repo.update_tokens(db, ch, channel_metadata={
+                        "token_refresh_error": str(e)[:500],
+                        "token_refresh_failed_at": _now().isoformat(),
+                        "reauth_required": permanent,
+                    })
+                return 0
+            finally:
+                db.close()
+
+    def start_background(self) -> None:
+        interval = int(self.settings.TOKEN_REFRESH_INTERVAL_SECONDS)
+        cls = type(self)
+        if interval <= 0 or cls._task is not None:
+            return
+        cls._task = asyncio.create_task(self._loop(interval), name="token-refresh")
+
+    async def _loop(self, interval: int) -> None:
+        while True:
+            try:
+                n = await self.tick()
+                if n:
+                    logger.info(f"Refreshed {n} channel tokens")
+            except Exception:
+                logger.exception("Token refresh daemon failed")
+            await asyncio.sleep(interval)
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
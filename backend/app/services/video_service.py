@@ -2,14 +2,38 @@
 
 from fastapi import HTTPException, UploadFile
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Dict, Any, Callable, Tuple
+from contextlib import ExitStack
 from sqlalchemy import func, or_
 import os
+import asyncio
+import posixpath
+import uuid
+import logging
+from datetime import datetime, timedelta, timezone
 import subprocess
+from pathlib import Path
 
-from app.repositories import video_repo, media_repo
+from app.repositories import video_repo, media_repo, rendition_repo
 from app.schemas.video_schemas import VideoImportIn, VideoProcessIn, VideoUpdateIn, TrimIn, CropIn, WatermarkIn, ThumbnailIn
+from app.schemas.video_schemas import EncodeOptions
 from app.models.video_models import Video
+from app.core.pagination import estimate_count
+from app.core.settings import get_settings
+from app.core import text_search, media_delivery
+from app.services.blob_service import BlobService
+from app.core.storage import get_storage
+from app.services.derivative_service import DerivativeService
+from app.services.probe_service import ProbeService
+from app.services.download_service import DownloadService
+from app.core import video_workers
+from app.core.database import SessionLocal
+from app.core.encoding import EncoderTier, tier_for, scale_filter
+from app.core.encoding import video_args as encode_video_args, audio_args as encode_audio_args
+from app.core.smart_trim import smart_trim
+from app.services.template_render_service import TemplateRenderService
+
+logger = logging.getLogger(__name__)
 
 UPLOAD_DIR = os.getenv("VIDEO_UPLOAD_DIR", "storage/videos")
 FFMPEG_BIN = os.getenv("FFMPEG_BIN", "ffmpeg")
@@ -20,11 +44,13 @@ def _safe_filename(name: str) -> str:
     base = re.sub(r"[^A-Za-z0-9._-]+", "_", base) or f"out_{uuid.uuid4().hex}.mp4"
     return base
 
-def _derive_output_path(src: str, suffix: str, ext: str = "mp4") -> str:
+def _derive_output_path(video_id: int, src: str, suffix: str, ext: str = "mp4") -> str:
+    # trả storage key (posix), không phải path local.
+    # src có thể là blob dùng chung (dedup theo nội dung) -> key phải có video id + uuid,
+    # không thì 2 video / 2 job cùng thao tác ghi đè file của nhau
     root, _ = os.path.splitext(os.path.basename(src))
-    out_name = _safe_filename(f"{root}_{suffix}.{ext}")
-    os.makedirs(UPLOAD_DIR, exist_ok=True)
-    return os.path.join(UPLOAD_DIR, out_name)
+    out_name = _safe_filename(f"v{video_id}_{root}_{suffix}_{uuid.uuid4().hex[:8]}.{ext}")
+    return posixpath.join(UPLOAD_DIR.replace(os.sep, "/"), out_name)
 
 def _run_ffmpeg(args: list[str]) -> None:
     # raise nếu ffmpeg trả mã lỗi
@@ -33,8 +59,76 @@ def _run_ffmpeg(args: list[str]) -> None:
         raise RuntimeError(f"ffmpeg failed: {proc.stdout.decode(errors='ignore')[:2000]}")
 
 class VideoService:
+    """
+    Edit nền (final, background=True / template): video -> processing, job chạy trên video_workers.
+    Worker giữ edit heartbeat updated_at; quá VIDEO_EDIT_LEASE_SECONDS không có (restart, job bị huỷ
+    khỏi pool, worker chết) thì video được trả về ready với last_edit = failed.
+    """
+
+    _edits: Dict[int, str] = {}  # video_id -> out_key của edit nền worker này đang giữ
+    _task: Optional[asyncio.Task] = None  # heartbeat + dọn edit không còn ai giữ
+
+    def __init__(self):
+        self.probe = ProbeService()
+
+    # ---------- lease edit nền ----------
+    def start_background(self) -> int:
+        """Gọi lúc startup: trả về ready các edit dở của lần chạy trước rồi chạy heartbeat định kỳ."""
+        n = self._reset_stale_edits()
+        cls = type(self)
+        if cls._task is None:
+            cls._task = asyncio.create_task(self._lease_loop(), name="video-edit-lease")
+        return n
+
+    def _lease(self) -> int:
+        return max(30, int(get_settings().VIDEO_EDIT_LEASE_SECONDS))
+
+    def _reset_stale_edits(self) -> int:
+        db = SessionLocal()
+        try:
+            stale_before = datetime.now(timezone.utc) - timedelta(seconds=self._lease())
+            ids = video_repo.reset_stale_edits(db, stale_before)
+        finally:
+            db.close()
+        if ids:
+            logger.warning(f"Reset {len(ids)} interrupted video edits: {ids[:20]}")
+        return len(ids)
+
+    async def _lease_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self._lease() / 3)
+            try:
+                db = SessionLocal()
+                try:
+                    video_repo.touch_edits(db, list(type(self)._edits))
+                finally:
+                    db.close()
+                self._reset_stale_edits()
+            except Exception:
+                logger.exception("Video edit heartbeat failed")
+
+    @classmethod
+    async def shutdown(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            await asyncio.gather(cls._task, return_exceptions=True)
+            cls._task = None
+
+    def _submit_final(self, v: Video, src_key: str, extra_keys: List[str], out_key: str,
+                      render: Callable[[str, List[str], str], None], op: str,
+                      meta_update: Dict[str, Any], pool: str) -> None:
+        # ghi nhận trước khi xếp hàng: job chờ trong pool cũng được heartbeat
+        type(self)._edits[v.id] = out_key
+        try:
+            video_workers.submit_background(self._final_job, v.id, src_key, extra_keys, out_key,
+                                            render, op, meta_update, pool=pool)
+        except Exception:
+            type(self)._edits.pop(v.id, None)
+            raise
+
     async def import_urls(self, db: Session, payload: VideoImportIn) -> List[Video]:
         videos: List[Video] = []
+        checksums = payload.checksums or {}
         for url in payload.urls:
             v = video_repo.create(
                 db,
@@ -44,44 +138,61 @@ class VideoService:
                 source_platform=payload.source_platform,
                 file_path="",
                 status="processing",
-                video_metadata={"remove_watermark": payload.remove_watermark, "use_proxy": payload.use_proxy},
+                video_metadata={"remove_watermark": payload.remove_watermark, "use_proxy": payload.use_proxy,
+                                "checksum": checksums.get(url), "download": {"status": "queued"}},
             )
             videos.append(v)
+        # tải nền; tiến độ từng video nằm ở video_metadata.download
+        DownloadService().enqueue([v.id for v in videos])
         return videos
 
-    async def upload(self, db: Session, files: List[UploadFile], remove_watermark: bool = False) -> List[Video]:
-        os.makedirs(UPLOAD_DIR, exist_ok=True)
+    async def retry_import(self, db: Session, video_id: int) -> Video:
+        v = video_repo.get_by_id(db, video_id)
+        if not v:
+            raise HTTPException(404, "Video not found")
+        if v.file_path or not v.original_url:
+            raise HTTPException(400, "Video is not a pending URL import")
+        meta = dict(v.video_metadata or {})
+        meta["download"] = {**(meta.get("download") or {}), "status": "queued", "error": None}
+        v = video_repo.update(db, v, {"status": "processing", "video_metadata": meta})
+        DownloadService().enqueue([v.id])
+        return v
+
+    async def upload(self, db: Session, files: List[UploadFile], title: Optional[str] = None,
+                     channel_id: Optional[int] = None, remove_watermark: bool = False) -> List[Video]:
+        blobs = BlobService()
         out: List[Video] = []
         for f in files:
-            # ghi file thực
-            dest = os.path.join(UPLOAD_DIR, f.filename)
-            size = 0
-            with open(dest, "wb") as w:
-                while True:
-                    chunk = await f.read(1024 * 1024)
-                    if not chunk: break
-                    w.write(chunk)
-                    size += len(chunk)
+            # lưu theo sha256 -> tên trùng không còn ghi đè nhau, nội dung trùng không lưu 2 lần
+            mime = getattr(f, "content_type", None) or "video/mp4"
+            blob, created = await blobs.ingest(db, f, mime_type=mime)
 
             v = video_repo.create(
                 db,
-                title=f.filename,
+                title=(title if title and len(files) == 1 else f.filename),
                 description=None,
                 original_url=None,
                 source_platform=None,
-                file_path=dest,
-                file_size=size,
+                file_path=blob.path,
+                file_size=blob.size,
+                content_hash=blob.sha256,
                 status="ready" if not remove_watermark else "processing",
-                video_metadata={"original_filename": f.filename, "remove_watermark": remove_watermark},
+                video_metadata={"original_filename": f.filename, "remove_watermark": remove_watermark,
+                                "channel_id": channel_id, "deduplicated": not created},
             )
+            # duration/resolution/codec... (blob trùng thì lấy từ cache, không chạy lại ffprobe)
+            v = await self.probe.apply_to_video(db, v)
             out.append(v)
 
+            # asset trong Media Library giữ tham chiếu riêng tới cùng blob
+            await blobs.acquire(db, blob.sha256)
             media_repo.create(
                 db,
                 type="video",
-                path=str(dest),                              
-                mime_type=(getattr(f, "content_type", None) or "video/mp4"),
-                size=size,                                  
+                path=blob.path,
+                mime_type=mime,
+                size=blob.size,
+                content_hash=blob.sha256,
                 media_metadata={"source": "upload", "video_id": v.id}, 
                 uploaded_by_id=None,
             )
@@ -116,14 +227,27 @@ class VideoService:
             else:
                 query = query.filter(Video.source_platform.ilike(source))
         if q:
-            like = f"%{q.strip()}%"
-            query = query.filter(or_(Video.title.ilike(like), Video.description.ilike(like)))
+            query = query.filter(or_(text_search.contains(Video.title, q), text_search.contains(Video.description, q)))
         return (
             query.order_by(Video.created_at.desc(), Video.id.desc())
                 .offset(offset).limit(limit)
                 .all()
         )
     
+    async def list_page(
+                self,
+                db: Session,
+                status: Optional[str] = None,
+                source: Optional[str] = None,
+                q: Optional[str] = None,
+                limit: int = 24,
+                cursor: Optional[str] = None,
+                with_total: bool = False,
+                ) -> Dict[str, Any]:
+        items, next_cursor = video_repo.list_page(db, status=status, source=source, q=q, limit=limit, cursor=cursor)
+        total = estimate_count(db, Video.__tablename__) if with_total and not (status or source or q) else None
+        return {"items": items, "next_cursor": next_cursor, "total_estimate": total}
+
     async def queue(self, db: Session) -> List[Video]:
         return video_repo.list_queue(db)
 
@@ -133,27 +257,83 @@ class VideoService:
             raise HTTPException(404, "Video not found")
         return v
 
-    async def process(self, db: Session, payload: VideoProcessIn) -> List[Video]:
-        out: List[Video] = []
-        for vid in payload.ids:
+    async def process(self, db: Session, payload: VideoProcessIn) -> List[Dict[str, Any]]:
+        """
+        Áp template watermark/frame cho nhiều video: resolve template 1 lần, mỗi video thành 1 job
+        trên video_workers (chạy song song tới VIDEO_WORKERS), trả về ngay kết quả từng video:
+        queued (đã xếp job) | recorded (không có template để render, chỉ ghi template id) | skipped.
+        """
+        engine = TemplateRenderService()
+        wm = await engine.resolve(db, payload.add_watermark_template_id, "watermark")
+        frame = await engine.resolve(db, payload.add_frame_template_id, "frame")
+        tier = tier_for("final", payload.platform)
+        meta_update = {k: val for k, val in (("watermark_template_id", payload.add_watermark_template_id),
+                                             ("frame_template_id", payload.add_frame_template_id)) if val}
+        # edit không còn heartbeat (restart / worker chết) được trả về ready trước -> không bị báo busy oan
+        self._reset_stale_edits()
+        out: List[Dict[str, Any]] = []
+        for vid in dict.fromkeys(payload.ids):
             v = video_repo.get_by_id(db, vid)
             if not v:
+                out.append({"video_id": vid, "status": "skipped", "reason": "not found"})
+                continue
+            if not (wm or frame):
+                # không có gì để render -> chỉ ghi nhận template như trước
+                meta = dict(v.video_metadata or {})
+                meta.update(meta_update)
+                out.append({"video_id": vid, "status": "recorded",
+                            "video": video_repo.update(db, v, {"video_metadata": meta})})
+                continue
+            if not v.file_path:
+                out.append({"video_id": vid, "status": "skipped", "reason": "no file", "video": v})
                 continue
+            w, h = v.width, v.height
+
+            def render(src: str, _extras: List[str], dst: str, w=w, h=h) -> None:
+                _run_ffmpeg([*engine.build_args(src, w, h, frame, wm, tier), "-y", dst])
+
             meta = dict(v.video_metadata or {})
-            if payload.add_watermark_template_id:
-                meta["watermark_template_id"] = payload.add_watermark_template_id
-            if payload.add_frame_template_id:
-                meta["frame_template_id"] = payload.add_frame_template_id
-            v = video_repo.update(db, v, {"video_metadata": meta, "status": "ready"})
-            out.append(v)
+            meta["last_edit"] = {"op": "template", "status": "processing", "tier": tier.name}
+            # đang có edit nền khác giữ video (begin_processing kiểm tra có điều kiện trong DB)
+            if video_repo.is_editing(v) or not video_repo.begin_processing(db, v, meta):
+                out.append({"video_id": vid, "status": "skipped", "reason": "busy", "video": v})
+                continue
+            out_key = _derive_output_path(v.id, v.file_path, f"tpl_{'_'.join(str(x) for x in meta_update.values())}")
+            self._submit_final(v, v.file_path, [], out_key, render, "template", meta_update, tier.pool)
+            out.append({"video_id": vid, "status": "queued", "video": v})
         return out
 
+    async def thumbnail(self, db: Session, video_id: int, width: int = 320, fmt: str = "jpg",
+                        method: str = "middle", version: Optional[str] = None,
+                        sig: Optional[str] = None) -> Tuple[Path, bool]:
+        """
+        (path, current): current = URL mang đúng version file hiện tại (cache immutable được).
+        Chỉ URL có chữ ký hợp lệ (thumb_url) mới được sinh derivative, còn lại chỉ đọc cache.
+        """
+        v = await self.get(db, video_id)
+        if not v.file_path:
+            raise HTTPException(404, "Video file not found")
+        current = version == media_delivery.source_version(v.file_path)
+        signed = current and media_delivery.verify(sig, "videos", video_id, version)
+        path = await DerivativeService().get(v.file_path, width, fmt, variant=method, is_video=True,
+                                             generate=signed)
+        return path, current
+
     async def delete(self, db: Session, video_id: int) -> None:
         v = video_repo.get_by_id(db, video_id)
         if not v:
             raise HTTPException(404, "Video not found")
-        # TODO: xóa file storage nếu có
+        from app.services.lifecycle_service import LifecycleService, prev_entries, video_keys
+        content_hash = v.content_hash
+        meta = dict(v.video_metadata or {})
+        # bản edit / bản cũ / preview / rendition của video này
+        keys = video_keys(v.file_path, v.thumbnail_path, meta, prev_entries(meta))
+        keys.update(r.path for r in rendition_repo.list_for_video(db, v.id) if r.path)
         video_repo.delete(db, v)
+        # file gốc chỉ bị xoá khi không còn video/asset nào trỏ tới
+        BlobService().release(db, content_hash)
+        # phần còn lại: xoá ngay những file không còn ai tham chiếu (GC nền dọn nốt nếu lỗi)
+        LifecycleService().delete_unreferenced(db, keys)
     
     async def stats(self, db: Session) -> dict:
         total = db.query(func.count(Video.id)).scalar() or 0
@@ -165,78 +345,224 @@ class VideoService:
         storage_gb = round(size_bytes / (1024**3), 2)
         return {"total": total, "ready": ready, "processing": processing, "error": error, "storage_gb": storage_gb}    
 
+    # ---------- edit: preview / final ----------
+    @staticmethod
+    def _ffmpeg_job(src_key: str, extra_keys: List[str], out_key: str,
+                    render: Callable[[str, List[str], str], None]) -> None:
+        """Blocking, chạy trên video_workers: kéo input về local, render(src, extras, dst), đẩy output lên storage."""
+        storage = get_storage()
+        with ExitStack() as stack:
+            src = stack.enter_context(storage.local_copy(src_key))
+            extras = [stack.enter_context(storage.local_copy(k)) for k in extra_keys]
+            dst = stack.enter_context(storage.local_output(out_key))
+            render(src, extras, dst)
+
+    def _commit_edit(self, db: Session, v: Video, out_key: str, op: str, meta_update: Dict[str, Any]) -> Video:
+        # cập nhật file_path (giữ path cũ trong metadata)
+        meta = dict(v.video_metadata or {})
+        # lifecycle_service dọn bản cũ theo retention dựa trên superseded_at
+        meta.setdefault("prev_files", []).append(
+            {"path": v.file_path, "superseded_at": datetime.now(timezone.utc).isoformat()})
+        meta.update(meta_update)
+        meta["last_edit"] = {"op": op, "status": "done"}
+        meta.pop("preview", None)  # preview dựng trên file cũ
+        return video_repo.update(db, v, {"file_path": out_key, "file_size": get_storage().size(out_key),
+                                         "video_metadata": meta, "status": "ready"})
+
+    def _final_job(self, video_id: int, src_key: str, extra_keys: List[str], out_key: str,
+                   render: Callable[[str, List[str], str], None], op: str, meta_update: Dict[str, Any]) -> None:
+        db = SessionLocal()
+        try:
+            try:
+                self._ffmpeg_job(src_key, extra_keys, out_key, render)
+            except Exception as e:
+                # file gốc vẫn nguyên -> trả về ready, ghi lỗi để staff thấy
+                v = video_repo.get_by_id(db, video_id)
+                if v:
+                    meta = dict(v.video_metadata or {})
+                    meta["last_edit"] = {"op": op, "status": "failed", "error": str(e)[:2000]}
+                    video_repo.update(db, v, {"status": "ready", "video_metadata": meta})
+                raise
+            v = video_repo.get_by_id(db, video_id)
+            if v and v.file_path == src_key:
+                v = self._commit_edit(db, v, out_key, op, meta_update)
+                self.probe.probe_video_blocking(db, v)
+                return
+            # file nguồn bị thay / video bị xoá trong lúc render -> output không còn dùng được
+            self._discard_output(out_key)
+            if v:
+                meta = dict(v.video_metadata or {})
+                meta["last_edit"] = {"op": op, "status": "failed", "error": "source file changed while rendering"}
+                video_repo.update(db, v, {"status": "ready" if v.file_path else v.status, "video_metadata": meta})
+        finally:
+            db.close()
+            # chỉ bỏ đúng edit này (edit mới của cùng video có out_key khác)
+            if type(self)._edits.get(video_id) == out_key:
+                type(self)._edits.pop(video_id, None)
+
+    @staticmethod
+    def _discard_output(out_key: str) -> None:
+        try:
+            get_storage().delete(out_key)
+        except Exception as e:
+            logger.warning(f"Failed to delete orphaned edit output {out_key}: {e}")
+
+    async def _edit(self, db: Session, v: Video, op: str, suffix: str, opts: EncodeOptions,
+                    build: Callable[[str, List[str], Optional[EncoderTier]], List[str]],
+                    extra_keys: Optional[List[str]] = None, meta_update: Optional[Dict[str, Any]] = None,
+                    stream_copy: bool = False,
+                    render: Optional[Callable[[str, List[str], str, EncoderTier], None]] = None) -> Video:
+        """
+        preview: encode nhanh bản thu nhỏ vào metadata.preview, file gốc giữ nguyên.
+        final: thay file_path; background=True thì trả về ngay và render trên worker.
+        build(src, extras, tier) -> tham số ffmpeg trước output; tier=None nghĩa là copy stream.
+        render(src, extras, dst, tier): thay build cho bản final khi cần nhiều lệnh ffmpeg (smart trim).
+        """
+        if video_repo.is_editing(v):
+            raise HTTPException(409, "Video is being processed, try again when it is ready")
+        extra_keys = extra_keys or []
+        meta_update = meta_update or {}
+        tier = tier_for(opts.tier, opts.platform)
+
+        src_key = v.file_path
+        if tier.name == "preview":
+            out_key = _derive_output_path(v.id, src_key, f"{suffix}_preview")
+            # đóng transaction trước khi chờ ffmpeg: không giữ connection của pool DB suốt lúc encode
+            db.commit()
+            await video_workers.run(self._ffmpeg_job, src_key, extra_keys, out_key,
+                                    lambda src, extras, dst: _run_ffmpeg([*build(src, extras, tier), "-y", dst]),
+                                    pool=tier.pool)
+            meta = dict(v.video_metadata or {})
+            meta["preview"] = {"op": op, "path": out_key, "source": src_key}
+            return video_repo.update(db, v, {"video_metadata": meta})
+
+        out_key = _derive_output_path(v.id, src_key, suffix)
+        enc = None if stream_copy else tier
+        if render:
+            job = lambda src, extras, dst: render(src, extras, dst, tier)
+        else:
+            job = lambda src, extras, dst: _run_ffmpeg([*build(src, extras, enc), "-y", dst])
+        if opts.background:
+            meta = dict(v.video_metadata or {})
+            meta["last_edit"] = {"op": op, "status": "processing", "tier": tier.name}
+            if not video_repo.begin_processing(db, v, meta):
+                raise HTTPException(409, "Video is being processed, try again when it is ready")
+            self._submit_final(v, src_key, extra_keys, out_key, job, op, meta_update, tier.pool)
+            return v
+        db.commit()
+        await video_workers.run(self._ffmpeg_job, src_key, extra_keys, out_key, job, pool=tier.pool)
+        db.refresh(v)
+        if v.file_path != src_key or video_repo.is_editing(v):
+            # edit khác đã thay / đang thay file trong lúc encode -> không ghi đè, bỏ output
+            self._discard_output(out_key)
+            raise HTTPException(409, "Video changed while editing, try again")
+        v = self._commit_edit(db, v, out_key, op, meta_update)
+        return await self.probe.apply_to_video(db, v)
+
     async def trim(self, db: Session, body: TrimIn) -> Video:
         v = video_repo.get_by_id(db, body.video_id)
         if not v: raise HTTPException(404, "Video not found")
-        out_path = _derive_output_path(v.file_path, f"trim_{int(body.start)}_{'' if body.end is None else int(body.end)}")
-        # chọn copy stream (nhanh) hay re-encode
-        if body.reencode:
-            ff = ["-ss", str(body.start)]
-            if body.end is not None: ff += ["-to", str(body.end)]
-            ff += ["-i", v.file_path, "-c:v", "libx264", "-c:a", "aac", "-y", out_path]
-        else:
+        # duration đã có từ probe -> chặn sớm, không phải chạy ffmpeg mới biết lỗi
+        if v.duration and body.start >= v.duration:
+            raise HTTPException(422, f"start must be < duration ({v.duration}s)")
+        if body.end is not None and body.end <= body.start:
+            raise HTTPException(422, "end must be > start")
+
+        def build(src: str, _extras: List[str], tier: Optional[EncoderTier]) -> List[str]:
             ff = ["-ss", str(body.start)]
             if body.end is not None: ff += ["-to", str(body.end)]
-            ff += ["-i", v.file_path, "-c", "copy", "-y", out_path]
-        _run_ffmpeg(ff)
-        size = os.path.getsize(out_path)
-        # cập nhật file_path (giữ path cũ trong metadata)
-        meta = dict(v.video_metadata or {})
-        meta.setdefault("prev_files", []).append(v.file_path)
-        v = video_repo.update(db, v, {"file_path": out_path, "file_size": size, "video_metadata": meta, "status": "ready"})
-        return v
+            ff += ["-i", src]
+            if tier is None:
+                return ff + ["-c", "copy"]
+            vf = scale_filter(tier)
+            return ff + (["-vf", vf] if vf else []) + encode_video_args(tier) + encode_audio_args(tier)
+
+        duration = v.duration
+
+        def smart(src: str, extras: List[str], dst: str, tier: EncoderTier) -> None:
+            # nguồn không phải H.264 / khoảng quá ngắn -> re-encode cả đoạn như mode reencode
+            if not smart_trim(src, dst, body.start, body.end, duration, tier):
+                _run_ffmpeg([*build(src, extras, tier), "-y", dst])
+
+        # copy: nhanh nhưng cắt theo keyframe; reencode: chính xác nhưng chậm; smart: chính xác, ~ tốc độ copy
+        mode = body.mode or ("reencode" if body.reencode else "copy")
+        return await self._edit(db, v, "trim", f"trim_{int(body.start)}_{'' if body.end is None else int(body.end)}",
+                                body, build, stream_copy=mode == "copy",
+                                render=smart if mode == "smart" else None)
 
     async def crop(self, db: Session, body: CropIn) -> Video:
         v = video_repo.get_by_id(db, body.video_id)
         if not v: raise HTTPException(404, "Video not found")
-        out_path = _derive_output_path(v.file_path, f"crop_{body.width}x{body.height}_{body.x}_{body.y}")
-        filt = f"crop={body.width}:{body.height}:{body.x}:{body.y}"
-        _run_ffmpeg(["-i", v.file_path, "-vf", filt, "-c:v", "libx264", "-c:a", "copy", "-y", out_path])
-        size = os.path.getsize(out_path)
-        meta = dict(v.video_metadata or {})
-        meta.setdefault("prev_files", []).append(v.file_path)
-        v = video_repo.update(db, v, {"file_path": out_path, "file_size": size, "video_metadata": meta, "status": "ready"})
-        return v
+
+        def build(src: str, _extras: List[str], tier: Optional[EncoderTier]) -> List[str]:
+            filt = ",".join(f for f in [f"crop={body.width}:{body.height}:{body.x}:{body.y}", scale_filter(tier)] if f)
+            return ["-i", src, "-vf", filt, *encode_video_args(tier), "-c:a", "copy"]
+
+        return await self._edit(db, v, "crop", f"crop_{body.width}x{body.height}_{body.x}_{body.y}", body, build)
 
     async def watermark(self, db: Session, body: WatermarkIn) -> Video:
         v = video_repo.get_by_id(db, body.video_id)
         if not v: raise HTTPException(404, "Video not found")
+        if body.template_id:
+            # template: vị trí/kích thước/opacity lấy từ template, overlay đã rasterize sẵn
+            engine = TemplateRenderService()
+            spec = await engine.resolve(db, body.template_id, "watermark")
+            w, h = v.width, v.height
+            return await self._edit(
+                db, v, "watermark", f"wm{body.template_id}", body,
+                lambda src, _extras, tier: engine.build_args(src, w, h, None, spec, tier),
+                meta_update={"watermark_template_id": body.template_id},
+            )
         mark = body.watermark_path
-        if not os.path.isfile(mark):
+        if not mark:
+            raise HTTPException(422, "watermark_path or template_id is required")
+        if not await asyncio.to_thread(get_storage().exists, mark):
             raise HTTPException(400, "watermark_path not found")
-        out_path = _derive_output_path(v.file_path, "wm")
-        # nếu cần opacity < 1: chuyển watermark sang alpha bằng filter
-        overlay = f"overlay={body.x}:{body.y}"
-        if body.opacity < 1.0:
-            filt = f"[1]format=rgba,colorchannelmixer=aa={body.opacity}[wm];[0][wm]{overlay}"
-            _run_ffmpeg(["-i", v.file_path, "-i", mark, "-filter_complex", filt, "-c:v", "libx264", "-c:a", "copy", "-y", out_path])
-        else:
-            _run_ffmpeg(["-i", v.file_path, "-i", mark, "-filter_complex", overlay, "-c:v", "libx264", "-c:a", "copy", "-y", out_path])
-        size = os.path.getsize(out_path)
-        meta = dict(v.video_metadata or {})
-        meta.setdefault("prev_files", []).append(v.file_path)
-        meta["watermark_path"] = mark
-        v = video_repo.update(db, v, {"file_path": out_path, "file_size": size, "video_metadata": meta, "status": "ready"})
-        return v
+
+        def build(src: str, extras: List[str], tier: Optional[EncoderTier]) -> List[str]:
+            # nếu cần opacity < 1: chuyển watermark sang alpha bằng filter
+            overlay = f"overlay={body.x}:{body.y}"
+            if body.opacity < 1.0:
+                filt = f"[1]format=rgba,colorchannelmixer=aa={body.opacity}[wm];[0][wm]{overlay}"
+            else:
+                filt = overlay
+            scale = scale_filter(tier)
+            if scale:
+                filt += f",{scale}"
+            return ["-i", src, "-i", extras[0], "-filter_complex", filt, *encode_video_args(tier), "-c:a", "copy"]
+
+        return await self._edit(db, v, "watermark", "wm", body, build, extra_keys=[mark],
+                                meta_update={"watermark_path": mark})
 
     async def thumbnail_auto(self, db: Session, body: ThumbnailIn) -> Video:
         v = video_repo.get_by_id(db, body.video_id)
         if not v: raise HTTPException(404, "Video not found")
         # xuất 1 ảnh thumbnail
-        out_jpg = _derive_output_path(v.file_path, "thumb", ext="jpg")
-        if body.method == "scene":
-            # chọn khung có scene-change lớn (thường là khung rõ nhất)
-            _run_ffmpeg(["-i", v.file_path, "-vf", "select=gt(scene\\,0.4),thumbnail,scale=640:-1", "-frames:v", "1", "-y", out_jpg])
-        else:
-            # lấy khung giữa video
-            _run_ffmpeg(["-i", v.file_path, "-vf", "thumbnail,scale=640:-1", "-frames:v", "1", "-y", out_jpg])
+        src_key = v.file_path
+        out_jpg = _derive_output_path(v.id, src_key, "thumb", ext="jpg")
+        storage = get_storage()
+        db.commit()  # không giữ connection DB trong lúc chờ ffmpeg
+        # scene: khung có scene-change lớn (thường rõ nhất); middle: khung đại diện
+        # lấy từ derivative cache -> gọi lại không chạy ffmpeg lần nữa
+        derivatives = DerivativeService()
+        for attempt in range(2):
+            src = await derivatives.get(src_key, 640, "jpg", variant=body.method, is_video=True)
+            try:
+                size = src.stat().st_size
+                # put_file blocking (S3 upload) -> chạy ngoài event loop
+                await asyncio.to_thread(storage.put_file, str(src), out_jpg, "image/jpeg")
+                break
+            except FileNotFoundError:
+                # LRU cache vừa xoá bản derivative -> sinh lại 1 lần
+                if attempt:
+                    raise HTTPException(503, "Thumbnail cache busy, try again")
         meta = dict(v.video_metadata or {})
         meta["thumbnail_generated"] = True
         v = video_repo.update(db, v, {"thumbnail_path": out_jpg, "video_metadata": meta})
         # lưu vào Media Library
         try:
             from app.repositories import media_repo
-            media_repo.create(db, type="image", path=out_jpg, mime_type="image/jpeg", size=os.path.getsize(out_jpg),
+            media_repo.create(db, type="image", path=out_jpg, mime_type="image/jpeg", size=size,
                     media_metadata={"source": "thumbnail", "video_id": v.id}, uploaded_by_id=None)
         except Exception:
             pass
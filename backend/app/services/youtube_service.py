@@ -1,11 +1,16 @@
 from typing import Tuple, Dict, List, Optional
 import os
+import asyncio
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 
 from app.schemas.common import ChannelPlatformEnum as PF
 from app.repositories import channel_repo
 from app.models.video_models import Video
+from app.core.storage import get_storage
+from app.core.rate_limit import get_limiter, YOUTUBE_COSTS
+from app.core import channel_cache
+from app.services.token_refresh_service import TokenRefreshService
 
 class YouTubeService:
     async def upload_video(
@@ -18,6 +23,8 @@ class YouTubeService:
         privacy_status: str,
         publish_at_iso: Optional[str] = None,
     ) -> Dict:
+        # videos.insert tốn 1600 unit quota/ngày của project
+        await get_limiter().acquire("youtube", "upload", cost=YOUTUBE_COSTS["upload"])
         # TODO: Implement YouTube Data API v3 (resumable upload). Đây là mock.
         resp = {"id": "dummy_id"}
         if publish_at_iso:
@@ -28,17 +35,24 @@ class YouTubeService:
         self, db: Session, *, channel_id: int, video_id: int, title: str,
         description: str, tags: Optional[List[str]], privacy_status: str,
         schedule_time_iso: Optional[str],
+        file_path: Optional[str] = None,
     ) -> Tuple[bool, Dict]:
-        ch = channel_repo.get_by_id(db, channel_id)
-        if not ch:
+        ch = channel_cache.get(db, channel_id)
+        if not ch or ch.platform != PF.youtube.value:
             return False, {"error": "YouTube channel not found"}
-        plat = getattr(ch.platform, "value", ch.platform)
-        if plat != PF.youtube.value:
-            return False, {"error": "YouTube channel not found"}
-        if not getattr(ch, "access_token", None):
+        if not ch.access_token:
             return False, {"error": "YouTube access_token missing"}
+        access_token = ch.access_token
+        if ch.expired:
+            # daemon chưa kịp refresh -> refresh tại chỗ
+            access_token = await TokenRefreshService().ensure_fresh(db, channel_repo.get_by_id(db, channel_id))
         video: Video = db.get(Video, video_id)
-        if not video or not getattr(video, "file_path", None) or not os.path.exists(video.file_path):
+        storage = get_storage()
+        if not video or not getattr(video, "file_path", None):
+            return False, {"error": "Video file not found"}
+        # file_path: rendition đạt spec YouTube (nếu có), mặc định là file gốc
+        key = file_path or video.file_path
+        if not await asyncio.to_thread(storage.exists, key):
             return False, {"error": "Video file not found"}
         
         
@@ -52,15 +66,17 @@ class YouTubeService:
             except Exception:
                 publish_at_iso = None
 
-        resp = await self.upload_video(
-            access_token=ch.access_token,
-            video_path=video.file_path,
-            title=title or "Untitled",
-            description=description or "",
-            tags=tags or [],
-            privacy_status=privacy_status or ("private" if publish_at_iso else "public"),
-            publish_at_iso=publish_at_iso,
-        )
+        # S3: tải về file tạm trong lúc upload; local: dùng thẳng file
+        async with storage.alocal_copy(key) as video_path:
+            resp = await self.upload_video(
+                access_token=access_token,
+                video_path=video_path,
+                title=title or "Untitled",
+                description=description or "",
+                tags=tags or [],
+                privacy_status=privacy_status or ("private" if publish_at_iso else "public"),
+                publish_at_iso=publish_at_iso,
+            )
         if isinstance(resp, dict) and resp.get("id"):
             out = {"id": resp["id"]}
             if publish_at_iso:
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+# Thêm backend vào sys.path
+backend_path = Path(__file__).parent.parent
+sys.path.insert(0, str(backend_path))
+
+from app.core.database import SessionLocal
+from app.models.post_models import Post
+from app.services.hashtag_service import HashtagService
+
+BATCH_SIZE = 500
+
+
+def backfill():
+    """Parse lại hashtag cho toàn bộ post cũ (chạy 1 lần sau khi deploy bảng hashtags)"""
+    db = SessionLocal()
+    svc = HashtagService()
+    last_id = 0
+    total = 0
+    try:
+        while True:
+            posts = (
+                db.query(Post)
+                .filter(Post.id > last_id)
+                .order_by(Post.id.asc())
+                .limit(BATCH_SIZE)
+                .all()
+            )
+            if not posts:
+                break
+            for post in posts:
+                svc.sync_post(db, post)
+            last_id = posts[-1].id
+            total += len(posts)
+            print(f"Đã xử lý {total} post (id <= {last_id})")
+    finally:
+        db.close()
+    print(f"✅ Hoàn tất: {total} post")
+
+
+if __name__ == "__main__":
+    backfill()
@@ -0,0 +1,27 @@
+# Regression: ký tự ngăn cách trong hashtag không được nối 2 tag thành 1
+from app.services.hashtag_service import normalize_tag, parse_hashtags, split_tags
+
+
+def test_split_tags_keeps_boundaries():
+    assert split_tags("#a#b") == ["a", "b"]
+    assert split_tags("#foo-bar") == ["foo", "bar"]
+    assert split_tags("#Khuyến_Mãi") == ["khuyến_mãi"]
+
+
+def test_normalize_tag_does_not_merge():
+    assert normalize_tag("#foo-bar") == "foo"
+    assert normalize_tag("  #Sale ") == "sale"
+    assert normalize_tag("#123") is None
+    assert normalize_tag("#") is None
+
+
+def test_parse_hashtags_field():
+    assert parse_hashtags(None, "#sale #summer") == ["sale", "summer"]
+    assert parse_hashtags(None, "sale, summer;deal") == ["sale", "summer", "deal"]
+    assert parse_hashtags(None, "#a#b") == ["a", "b"]
+    # có '#' -> chữ tự do xen giữa không thành tag
+    assert parse_hashtags(None, "mua ngay #sale giảm giá") == ["sale"]
+
+
+def test_parse_hashtags_caption():
+    assert parse_hashtags("Hot #deal-of-day, #Sale!", "sale") == ["sale", "deal"]
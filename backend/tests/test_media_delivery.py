@@ -0,0 +1,51 @@
+# Regression: /storage/... không được đọc file ngoài thư mục media (vd ../.env)
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+
+from app.api import storage_routers
+from app.core import media_delivery
+from app.core.storage import LocalStorage
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    (tmp_path / ".env").write_text("JWT_SECRET=leak")
+    (tmp_path / "storage" / "videos").mkdir(parents=True)
+    (tmp_path / "storage" / "videos" / "a.mp4").write_bytes(b"video")
+    monkeypatch.setattr(media_delivery, "get_storage", lambda: LocalStorage(root=str(tmp_path)))
+    app = FastAPI()
+    app.include_router(storage_routers.router)
+    return TestClient(app)
+
+
+def test_serves_file_under_storage(client):
+    r = client.get("/storage/videos/a.mp4")
+    assert r.status_code == 200
+    assert r.content == b"video"
+
+
+@pytest.mark.parametrize("url", [
+    "/storage/%2e%2e/.env",
+    "/storage/%2E%2E/.env",
+    "/storage/videos/%2e%2e/%2e%2e/.env",
+    "/storage/..%2f.env",
+    "/storage/%2e%2e%2f.env",
+    "/storage/%2e%2e",
+])
+def test_rejects_encoded_parent_segments(client, url):
+    r = client.get(url)
+    assert r.status_code == 404
+    assert b"leak" not in r.content
+
+
+def test_rejects_symlink_out_of_storage(client, tmp_path):
+    (tmp_path / "storage" / "env").symlink_to(tmp_path / ".env")
+    assert client.get("/storage/env").status_code == 404
+
+
+def test_safe_key_requires_mount_prefix():
+    assert media_delivery.safe_key("storage/videos/../a.mp4") == "storage/a.mp4"
+    for key in ("storage/../.env", "storage/../../etc/passwd", "/etc/passwd", "storage", "app/core/settings.py"):
+        with pytest.raises(HTTPException):
+            media_delivery.safe_key(key)